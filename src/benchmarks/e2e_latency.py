@@ -0,0 +1,575 @@
+"""
+e2e_latency.py
+~~~~~~~~~~~~~~
+Offline latency benchmark of the whole HomeMatch pipeline: no API key, no
+network, no model download.
+
+    python -m src.benchmarks.e2e_latency --listings 2000 --queries 100 --llm-latency 0.3
+
+The chat model is `StubChatModel` (fixed, configurable latency per call and
+per streamed token) and the embeddings default to the hashing backend; a real
+model can be used with --embedding-backend torch / onnx-int8 and
+EMBEDDING_MODEL_NAME. The corpus is synthetic, `--listings` rows long.
+
+  chroma_store    index build (cold sync), retriever open (no-op sync), retrieve()
+  query_cleaner   invoke_clean_query for free-form and sidebar-form queries
+  rag             rag chain on cleaned queries, per stage and total
+  rerank          (--rerank-candidates) retrieval + cross-encoder reranking at
+                  each candidate depth N: latency, budget fallbacks, cached
+                  rerank latency and agreement with the deepest N that
+                  kept within the budget
+  pipeline_modes  (--modes) invoke_full_chain in each pipeline mode (full,
+                  direct, local-clean): end to end and cleaning latency, llm
+                  calls and prompt / completion tokens per query
+  home_match      invoke_full_chain end to end and per stage (the tracer's
+                  spans: clean_query, embed_query, vector_search,
+                  assemble_prompt, generate_answer, ...); stream_full_chain
+                  time to context and to first token; abatch throughput;
+                  with --speculative, how often the speculative search of
+                  the raw query was reused, and the mean raw / cleaned
+                  query similarity it is reused above
+
+Every latency is reported as p50 / p95 / p99 in a JSON file that can be diffed
+between commits; --baseline prints the p50 / p95 changes against an older one.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# settings require a Groq key at import; the stub model never uses it
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+from loguru import logger
+
+from src.benchmarks.stats import environment, peak_rss_bytes, summarize, write_results
+from src.benchmarks.stub_llm import StubChatModel
+from src.benchmarks.stub_reranker import StubCrossEncoder
+from src.benchmarks.synthetic import synthetic_queries, write_synthetic_listings
+from src.config import settings
+from src.tools.rerank.cross_encoder_reranker import CrossEncoderReranker, listing_key
+from src.tools.tracing.metrics_sinks import InMemorySink
+from src.tools.tracing.spans import tracer
+
+# pipeline stages, as the tracer names its spans (src/tools/tracing/spans.py)
+STAGES = (
+    "clean_query",
+    "answer_cache",
+    "speculative_search",
+    "embed_query",
+    "vector_search",
+    "lexical_search",
+    "assemble_prompt",
+    "build_context",
+    "generate_answer",
+)
+
+
+def stage_latencies(sink: InMemorySink) -> Dict[str, Dict]:
+    """Latency summary of every stage the tracer recorded into `sink`."""
+    return {
+        stage: summarize(sink.durations(stage))
+        for stage in STAGES
+        if sink.durations(stage)
+    }
+
+
+def span_counts(sink: InMemorySink, stage: str, name: str) -> Dict[str, float]:
+    """Mean / p50 / p95 of the count `name` (e.g. prompt_tokens) on `stage` spans."""
+    values = [
+        span.counts[name]
+        for span in sink.spans
+        if span.name == stage and name in span.counts
+    ]
+    if not values:
+        return {"count": 0}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {
+        "count": len(values),
+        "mean": round(float(np.mean(values)), 1),
+        "p50": round(float(p50), 1),
+        "p95": round(float(p95), 1),
+    }
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def bench_chroma_store(store_cls, cleaned: List[dict], repeats: int) -> Dict:
+    store = store_cls()
+    build_seconds = timed(store.sync_index)
+    opens = [timed(store_cls().build_retriever) for _ in range(repeats)]
+
+    retriever = store.build_retriever()
+    latencies = [
+        timed(retriever.retrieve, query["input"], query.get("preferences"))
+        for query in cleaned
+    ]
+    return {
+        "index_build_seconds": round(build_seconds, 3),
+        "retriever_open": summarize(opens),
+        "retrieve": summarize(latencies),
+    }
+
+
+def bench_query_cleaner(cleaner, queries: List[dict]) -> tuple:
+    cleaned, free_form, form = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        cleaned.append(
+            cleaner.invoke_clean_query(query["raw_query"], query.get("form"))
+        )
+        (form if "form" in query else free_form).append(time.perf_counter() - start)
+    return cleaned, {
+        "free_form": summarize(free_form),
+        "form": summarize(form),
+        "all": summarize(free_form + form),
+    }
+
+
+def bench_rag(rag, cleaned: List[dict], sink: InMemorySink) -> Dict:
+    start = time.perf_counter()
+    chain = rag.get_rag_chain()
+    chain_build = time.perf_counter() - start
+
+    sink.clear()
+    totals = []
+    for query in cleaned:
+        with tracer.trace():
+            totals.append(timed(chain.invoke, query))
+    results = stage_latencies(sink)
+    results["total"] = summarize(totals)
+    results["chain_build_seconds"] = round(chain_build, 4)
+    return results
+
+
+def bench_home_match(
+    home_match, queries: List[dict], concurrency: int, sink: InMemorySink
+) -> Dict:
+    sink.clear()
+    totals = [timed(home_match.invoke_full_chain, query) for query in queries]
+    results = stage_latencies(sink)
+    results["end_to_end"] = summarize(totals)
+    results["prompt_tokens"] = span_counts(sink, "generate_answer", "prompt_tokens")
+    results["context_tokens"] = span_counts(sink, "build_context", "context_tokens")
+    results["context_saved_tokens"] = span_counts(sink, "build_context", "saved_tokens")
+    if settings.SPECULATIVE_RETRIEVAL:
+        # mean = share of the free-form queries that reused the speculative search
+        results["speculation_reused"] = span_counts(
+            sink, "vector_search", "reused_speculation"
+        )
+        # raw / cleaned query cosine, to compare with --reuse-similarity
+        similarities = [
+            span.counts["speculation_similarity"]
+            for span in sink.spans
+            if span.name == "vector_search" and "speculation_similarity" in span.counts
+        ]
+        results["speculation_similarity"] = {
+            "mean": round(float(np.mean(similarities)), 3) if similarities else None,
+            "threshold": settings.SPECULATIVE_REUSE_SIMILARITY,
+        }
+
+    to_context, to_first_token, stream_totals = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        first_token = None
+        for chunk in home_match.stream_full_chain(query):
+            if "context" in chunk:
+                to_context.append(time.perf_counter() - start)
+            if "answer" in chunk and first_token is None:
+                first_token = time.perf_counter() - start
+        to_first_token.append(first_token)
+        stream_totals.append(time.perf_counter() - start)
+    results["stream_time_to_context"] = summarize(to_context)
+    results["stream_time_to_first_token"] = summarize(to_first_token)
+    results["stream_total"] = summarize(stream_totals)
+
+    start = time.perf_counter()
+    asyncio.run(home_match.abatch(queries, max_concurrency=concurrency))
+    seconds = time.perf_counter() - start
+    results["concurrent"] = {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "queries_per_second": round(len(queries) / seconds, 2),
+    }
+    return results
+
+
+def bench_pipeline_modes(
+    make_home_match, queries: List[dict], warmup: List[dict], modes, sink
+) -> Dict:
+    """End-to-end latency and llm cost of the same queries in every pipeline mode."""
+    results = {}
+    for mode in modes:
+        home_match = make_home_match(mode)
+        # one cache for every mode: answers of the previous mode must not be reused
+        home_match.answer_cache.invalidate()
+        for query in warmup:
+            home_match.invoke_full_chain(query)
+
+        sink.clear()
+        totals = [timed(home_match.invoke_full_chain, query) for query in queries]
+        results[mode] = {
+            "end_to_end": summarize(totals),
+            "clean_query": summarize(sink.durations("clean_query")),
+            **{
+                name: span_counts(sink, "end_to_end", name)
+                for name in ("llm_calls", "prompt_tokens", "completion_tokens")
+            },
+        }
+    return results
+
+
+def bench_rerank(
+    store, cleaned: List[dict], depths: List[int], make_model, budget_ms, sink
+) -> Dict:
+    """
+    Retrieval with reranking at each candidate depth N, to weigh N against its cost.
+    The reference ranking is the deepest N that never fell back to the dense order:
+    `agreement_with_reference` is the share of its top-k that another N (or no
+    reranking, "none") also returns.
+    """
+    dense = store.build_retriever()
+    results, rankings = {}, {}
+    for depth in sorted(depths, reverse=True) + [None]:
+        name = "none" if depth is None else str(depth)
+        retriever, reranker = dense, None
+        if depth is not None:
+            reranker = CrossEncoderReranker(make_model(), budget_ms=budget_ms)
+            retriever = dense.model_copy(
+                update={"reranker": reranker, "rerank_candidates": depth}
+            )
+
+        sink.clear()
+        latencies, rankings[name] = [], []
+        for query in cleaned:
+            start = time.perf_counter()
+            docs = retriever.retrieve(query["input"], query.get("preferences"))
+            latencies.append(time.perf_counter() - start)
+            rankings[name].append({listing_key(doc) for doc in docs})
+        case = results[name] = {"retrieve": summarize(latencies)}
+        if reranker is not None:
+            case["rerank"] = summarize(sink.durations("rerank"))
+            case["fallback_rate"] = round(reranker.fallbacks / len(cleaned), 4)
+            # the same queries again: every (query, listing) score is now cached
+            sink.clear()
+            for query in cleaned:
+                retriever.retrieve(query["input"], query.get("preferences"))
+            case["rerank_cached"] = summarize(sink.durations("rerank"))
+
+    reference = next(
+        (name for name, case in results.items() if case.get("fallback_rate") == 0),
+        next(iter(results)),
+    )
+    for name, case in results.items():
+        agreement = [
+            len(found & expected) / len(expected)
+            for found, expected in zip(rankings[name], rankings[reference])
+            if expected
+        ]
+        case["agreement_with_reference"] = round(sum(agreement) / len(agreement), 4)
+    results["reference"] = reference
+    return results
+
+
+def percentile_changes(results: Dict, baseline: Dict, path: str = "") -> List[str]:
+    """One line per latency summary present in both runs: p50 / p95 old -> new."""
+    lines = []
+    for key, value in results.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if not isinstance(value, dict) or not isinstance(old, dict):
+            continue
+        name = f"{path}.{key}" if path else key
+        if "p50_ms" in value and "p50_ms" in old:
+            lines.append(
+                f"{name:<48}"
+                + "".join(
+                    f"{p}: {old[p]:>9.2f} -> {value[p]:>9.2f} ms "
+                    f"({(value[p] - old[p]) / old[p] * 100 if old[p] else 0:+6.1f}%)   "
+                    for p in ("p50_ms", "p95_ms")
+                )
+            )
+        else:
+            lines.extend(percentile_changes(value, old, name))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--listings", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--form-share", type=float, default=0.5)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.3, help="seconds per LLM call"
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="seconds per streamed token"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument(
+        "--embedding-backend",
+        choices=["hashing", "torch", "onnx-int8"],
+        default="hashing",
+    )
+    parser.add_argument(
+        "--vector-backend", choices=["chroma", "numpy"], default=settings.VECTOR_BACKEND
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["none", "float16", "int8"],
+        default=settings.VECTOR_QUANTIZATION,
+    )
+    parser.add_argument(
+        "--answer-cache",
+        action="store_true",
+        help="turn the semantic answer cache on (off by default, and repeated "
+        "synthetic queries would be served from it)",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        default=settings.SPECULATIVE_RETRIEVAL,
+        help="search the raw query while the cleaning call is in flight",
+    )
+    parser.add_argument(
+        "--reuse-similarity",
+        type=float,
+        default=settings.SPECULATIVE_REUSE_SIMILARITY,
+        help="raw / cleaned query cosine above which the speculative search is "
+        "reused; the hashing embeddings score these pairs around 0.5-0.6, far "
+        "below a real model, so lower it for offline runs",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["full", "direct", "local-clean"],
+        default=None,
+        help="pipeline modes to compare (the home_match suite runs PIPELINE_MODE)",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=settings.RAG_CONTEXT_TOKEN_BUDGET,
+        help="RAG_CONTEXT_TOKEN_BUDGET (0: full listing texts)",
+    )
+    parser.add_argument(
+        "--rerank-candidates",
+        type=int,
+        nargs="*",
+        default=[],
+        help="candidate depths N to benchmark the reranker at, e.g. 10 20 40",
+    )
+    parser.add_argument(
+        "--rerank-model",
+        default=None,
+        help="cross-encoder to load (default: a stub with --rerank-pair-latency)",
+    )
+    parser.add_argument(
+        "--rerank-pair-latency",
+        type=float,
+        default=0.002,
+        help="seconds per pair of the stub cross-encoder",
+    )
+    parser.add_argument(
+        "--rerank-budget-ms", type=float, default=settings.RERANK_BUDGET_MS
+    )
+    parser.add_argument("--workdir", default=None, help="default: a temp directory")
+    parser.add_argument("--output", default="./src/benchmarks/results/e2e_latency.json")
+    parser.add_argument("--baseline", default=None, help="results file to compare to")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="e2e-latency-")
+    listings_dir = os.path.join(workdir, "listings")
+    write_synthetic_listings(
+        os.path.join(listings_dir, "listings.jsonl"), args.listings, args.seed
+    )
+
+    # the chain modules build their embedding model at import: configure first
+    settings.EMBEDDING_BACKEND = args.embedding_backend
+    settings.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embedding_cache.sqlite3")
+    settings.VECTOR_BACKEND = args.vector_backend
+    settings.VECTOR_QUANTIZATION = args.quantization
+    settings.ANSWER_CACHE_ENABLED = args.answer_cache
+    settings.RAG_CONTEXT_TOKEN_BUDGET = args.context_budget
+    settings.SPECULATIVE_RETRIEVAL = args.speculative
+    settings.SPECULATIVE_REUSE_SIMILARITY = args.reuse_similarity
+    sink = InMemorySink()
+    tracer.enabled = True
+    tracer.sinks.append(sink)
+
+    from src.chains.full_chain import HomeMatch
+    from src.chains.query_cleaning import QueryCleaner
+    from src.chains.rag_chain import Rag
+    from src.tools.chromadb.chroma_store import ChromaStore
+
+    ChromaStore.listings_dir = listings_dir
+    ChromaStore.persist_dir = os.path.join(workdir, "index")
+
+    llm = StubChatModel(
+        latency=args.llm_latency,
+        token_latency=args.token_latency,
+        jitter=args.jitter,
+        answer_words=args.answer_words,
+        seed=args.seed,
+    )
+    queries = synthetic_queries(args.queries, args.form_share, args.seed)
+    warmup = synthetic_queries(args.warmup, args.form_share, args.seed + 1)
+
+    try:
+        suites = {}
+        print("⏱️ query_cleaner", file=sys.stderr)
+        cleaner = QueryCleaner(llm)
+        warm_cleaned, _ = bench_query_cleaner(cleaner, warmup)
+        cleaned, suites["query_cleaner"] = bench_query_cleaner(cleaner, queries)
+
+        # the cleaner never touches the index, so this build is still a cold one
+        print(f"⏱️ chroma_store ({args.listings} listings)", file=sys.stderr)
+        suites["chroma_store"] = bench_chroma_store(ChromaStore, cleaned, repeats=5)
+
+        if args.rerank_candidates:
+            print(f"⏱️ rerank (N = {args.rerank_candidates})", file=sys.stderr)
+            if args.rerank_model:
+                from sentence_transformers import CrossEncoder
+
+                model = CrossEncoder(args.rerank_model, device="cpu")
+                make_model = lambda: model
+            else:
+                make_model = lambda: StubCrossEncoder(
+                    pair_latency=args.rerank_pair_latency
+                )
+            suites["rerank"] = bench_rerank(
+                ChromaStore(),
+                cleaned,
+                args.rerank_candidates,
+                make_model,
+                args.rerank_budget_ms,
+                sink,
+            )
+
+        print("⏱️ rag", file=sys.stderr)
+        rag = Rag(llm)
+        bench_rag(rag, warm_cleaned, sink)
+        suites["rag"] = bench_rag(rag, cleaned, sink)
+
+        if args.modes:
+            print(f"⏱️ pipeline_modes ({', '.join(args.modes)})", file=sys.stderr)
+            suites["pipeline_modes"] = bench_pipeline_modes(
+                lambda mode: HomeMatch(llm, mode=mode),
+                queries,
+                warmup,
+                args.modes,
+                sink,
+            )
+
+        print("⏱️ home_match", file=sys.stderr)
+        home_match = HomeMatch(llm)
+        for query in warmup:
+            home_match.invoke_full_chain(query)
+        suites["home_match"] = bench_home_match(
+            home_match, queries, args.concurrency, sink
+        )
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "baseline", "workdir", "verbose")
+    }
+    results = {
+        "environment": environment(),
+        "config": config,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "suites": suites,
+    }
+    write_results(args.output, results)
+
+    home = suites["home_match"]
+    print(f"{'stage':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [(stage, home[stage]) for stage in STAGES if stage in home]
+    for name, summary in rows + [
+        ("end_to_end", home["end_to_end"]),
+        ("stream first token", home["stream_time_to_first_token"]),
+        ("retrieve() only", suites["chroma_store"]["retrieve"]),
+    ]:
+        print(
+            f"{name:<28}{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}"
+            f"{summary['p99_ms']:>10.1f}"
+        )
+    print(
+        f"prompt tokens: mean {home['prompt_tokens'].get('mean', 0):.0f}, "
+        f"context saved per request: mean "
+        f"{home['context_saved_tokens'].get('mean', 0):.0f}"
+    )
+    if "speculation_reused" in home:
+        similarity = home["speculation_similarity"]
+        print(
+            f"speculative search reused for "
+            f"{home['speculation_reused'].get('mean', 0):.0%} of free-form queries "
+            f"(raw / cleaned similarity mean {similarity['mean'] or 0:.3f}, "
+            f"threshold {similarity['threshold']:.2f})"
+        )
+    if "pipeline_modes" in suites:
+        print(
+            f"\n{'mode':<14}{'p50 ms':>10}{'p95 ms':>10}{'llm calls':>11}"
+            f"{'prompt tok':>12}{'compl. tok':>12}"
+        )
+        for mode, case in suites["pipeline_modes"].items():
+            print(
+                f"{mode:<14}{case['end_to_end']['p50_ms']:>10.1f}"
+                f"{case['end_to_end']['p95_ms']:>10.1f}"
+                f"{case['llm_calls'].get('mean', 0):>11.2f}"
+                f"{case['prompt_tokens'].get('mean', 0):>12.0f}"
+                f"{case['completion_tokens'].get('mean', 0):>12.0f}"
+            )
+    if "rerank" in suites:
+        print(
+            f"\n{'rerank N':<10}{'retrieve p50':>14}{'p95 ms':>10}"
+            f"{'fallbacks':>11}{'agreement':>11}"
+        )
+        for depth, case in suites["rerank"].items():
+            if depth == "reference":
+                continue
+            print(
+                f"{depth:<10}{case['retrieve']['p50_ms']:>14.1f}"
+                f"{case['retrieve']['p95_ms']:>10.1f}"
+                f"{case.get('fallback_rate', 0):>11.2f}"
+                f"{case['agreement_with_reference']:>11.2f}"
+            )
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(
+            f"\nchanges against {args.baseline} ({baseline['environment']['commit']}):"
+        )
+        for line in percentile_changes(suites, baseline.get("suites", {})):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
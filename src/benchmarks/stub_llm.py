@@ -0,0 +1,156 @@
+"""
+stub_llm.py
+~~~~~~~~~~~
+Deterministic offline chat model for the benchmarks: no API key, no network,
+a configurable latency per call and per streamed token.
+
+• `with_structured_output(BuyerPreferences)` extracts the preferences from
+  the buyer's query with the local extractor (text_parser.py), and
+  summarizes them the way the sidebar form does, after the same simulated
+  latency.
+• Answers are a fixed number of words, streamed word by word.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.llm_parsers.form_parser import preferences_from_form
+from src.llm_parsers.text_parser import preferences_from_text
+from src.tools.filters.listing_filter import parse_sqft
+
+_ANSWER_WORDS = (
+    "Listing 1 is the best match thanks to its spacious layout, quiet street and "
+    "large backyard, while listing 2 offers a modern kitchen close to public "
+    "transit and listing 3 suits remote work with a bright home office"
+).split()
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that sleeps instead of calling a provider."""
+
+    latency: float = 0.3  # seconds before each response (or its first token)
+    token_latency: float = 0.0  # seconds between streamed tokens
+    jitter: float = 0.0  # relative spread of the latency, e.g. 0.2 for ±20%
+    answer_words: int = 60  # length of every answer
+    seed: int = 0
+    model_name: str = "stub-chat"
+
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def delay(self) -> float:
+        return max(0.0, self.latency * (1 + self.jitter * self._rng.uniform(-1, 1)))
+
+    def _tokens(self) -> List[str]:
+        words = [
+            _ANSWER_WORDS[i % len(_ANSWER_WORDS)] for i in range(self.answer_words)
+        ]
+        return [words[0]] + [f" {word}" for word in words[1:]]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if kwargs.get("structured"):
+            time.sleep(self.delay())
+            return self._preferences_result(messages)
+        time.sleep(self.delay() + self.token_latency * self.answer_words)
+        message = AIMessage(content="".join(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if kwargs.get("structured"):
+            await asyncio.sleep(self.delay())
+            return self._preferences_result(messages)
+        await asyncio.sleep(self.delay() + self.token_latency * self.answer_words)
+        message = AIMessage(content="".join(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if kwargs.get("structured"):
+            message = self._generate(messages, **kwargs).generations[0].message
+            yield ChatGenerationChunk(message=AIMessageChunk(content=message.content))
+            return
+        time.sleep(self.delay())
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if kwargs.get("structured"):
+            result = await self._agenerate(messages, **kwargs)
+            content = result.generations[0].message.content
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content))
+            return
+        await asyncio.sleep(self.delay())
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        if schema is not BuyerPreferences:
+            raise NotImplementedError("the stub only extracts BuyerPreferences")
+
+        # a chat model call (so callbacks see its tokens) answering in json
+        return self.bind(structured=True) | RunnableLambda(
+            lambda message: BuyerPreferences.model_validate_json(message.content)
+        )
+
+    @staticmethod
+    def _preferences_result(messages: List[BaseMessage]) -> ChatResult:
+        prefs = preferences_from_text(messages[-1].content)
+        # a summary sentence instead of the buyer's own words, like the llm writes
+        fields = {**prefs.model_dump(), "house_size": parse_sqft(prefs.house_size)}
+        prefs.query = preferences_from_form(fields).query
+        message = AIMessage(content=prefs.model_dump_json(exclude_none=True))
+        return ChatResult(generations=[ChatGeneration(message=message)])
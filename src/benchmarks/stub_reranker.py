@@ -0,0 +1,35 @@
+"""
+stub_reranker.py
+~~~~~~~~~~~~~~~~
+Deterministic offline stand-in for a cross-encoder: sleeps like one batched
+forward pass (a fixed cost plus a cost per pair) and scores each pair by
+word overlap, so reranking latency and ordering can be benchmarked without a
+model download.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from typing import List, Sequence, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class StubCrossEncoder:
+    """`predict` compatible with sentence_transformers' CrossEncoder."""
+
+    def __init__(self, batch_latency: float = 0.005, pair_latency: float = 0.002):
+        self.batch_latency = batch_latency  # seconds per forward pass
+        self.pair_latency = pair_latency  # seconds per (query, listing) pair
+
+    def predict(
+        self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs
+    ) -> List[float]:
+        time.sleep(self.batch_latency + self.pair_latency * len(pairs))
+        scores = []
+        for query, text in pairs:
+            query_words = set(_WORD.findall(query.lower()))
+            text_words = set(_WORD.findall(text.lower()))
+            scores.append(len(query_words & text_words) / (len(query_words) or 1))
+        return scores
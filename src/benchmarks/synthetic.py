@@ -0,0 +1,180 @@
+"""
+synthetic.py
+~~~~~~~~~~~~
+Deterministic synthetic data for the benchmarks: the same seed always gives
+the same corpus, so results can be compared between commits.
+
+• `synthetic_listing` / `write_synthetic_listings`: Listing-shaped dicts with
+  varied descriptions, written as a JSONL listings file.
+• `synthetic_queries`: buyer queries, a mix of free-form text (LLM cleaner)
+  and sidebar-form inputs (parsed locally).
+• `synthetic_vector_batches`: clustered unit vectors with listing metadata,
+  generated batch by batch so a 1M x 768 corpus never sits in memory at once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from src.llm_parsers.form_parser import build_form_query
+
+NEIGHBORHOODS = [
+    f"{prefix} {suffix}"
+    for prefix in ("Maple", "Cedar", "River", "Oak", "Harbor", "Sunny", "Pine", "Elm")
+    for suffix in ("Heights", "Park", "Grove", "Village", "Commons", "Point")
+]
+STYLES = ["modern", "craftsman", "colonial", "ranch", "victorian", "mid-century"]
+AMENITIES = [
+    "backyard",
+    "solar panels",
+    "pool",
+    "garage",
+    "home office",
+    "fireplace",
+    "chef's kitchen",
+    "walk-in closet",
+    "deck",
+    "finished basement",
+]
+TRAITS = ["quiet", "walkable", "family-friendly", "vibrant", "green", "safe"]
+TRANSPORT = ["public transit", "bike paths", "highway access", "train station"]
+LIFESTYLES = ["remote work", "young family", "retirement", "outdoor enthusiast"]
+
+
+def synthetic_listing(i: int, seed: int = 0) -> Dict:
+    """The i-th listing of the corpus for `seed`."""
+    rng = random.Random(f"{seed}:{i}")
+    bedrooms = rng.randint(1, 6)
+    bathrooms = rng.randint(1, min(4, bedrooms + 1))
+    size = rng.randrange(600, 4800, 50)
+    style = rng.choice(STYLES)
+    amenities = rng.sample(AMENITIES, 3)
+    neighborhood = f"{rng.choice(NEIGHBORHOODS)} {i}"
+    traits = rng.sample(TRAITS, 2)
+    return {
+        "neighborhood": neighborhood,
+        "price": rng.randrange(150_000, 2_500_000, 5_000),
+        "bedrooms": bedrooms,
+        "bathrooms": bathrooms,
+        "house_size": f"{size} sqft",
+        # as long as generated listings: 5-6 sentences, then 3-4 sentences
+        "description": (
+            f"This {style} {bedrooms}-bedroom, {bathrooms}-bathroom home offers "
+            f"{size} sqft of living space. Highlights include a {amenities[0]}, a "
+            f"{amenities[1]} and a {amenities[2]}. The open living area flows into "
+            f"a bright kitchen with generous counter space and plenty of storage. "
+            f"The primary suite has large windows, a walk-through closet and an "
+            f"updated bathroom. Listing number {i} was updated recently and is "
+            f"ready to move in."
+        ),
+        "neighborhood_description": (
+            f"{neighborhood} is a {traits[0]}, {traits[1]} neighborhood close to "
+            f"{rng.choice(TRANSPORT)}, popular with buyers looking for "
+            f"{rng.choice(LIFESTYLES)}. Tree-lined streets lead to a small park, "
+            f"a weekend farmers market and a few independent cafes. Local schools "
+            f"are well regarded and daily errands can be done within a few minutes."
+        ),
+    }
+
+
+def write_synthetic_listings(path: str, n: int, seed: int = 0) -> str:
+    """Write `n` synthetic listings to the JSONL file `path`."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps(synthetic_listing(i, seed)) + "\n")
+    return path
+
+
+def synthetic_form(rng: random.Random) -> Dict:
+    """Sidebar values, as the Streamlit form produces them."""
+    return {
+        "bedrooms": rng.randint(1, 5),
+        "bathrooms": rng.randint(1, 3),
+        "house_size": rng.randrange(800, 4000, 100),
+        "price_range": f"${rng.randrange(200, 2000, 50)}k",
+        "amenities": rng.sample(AMENITIES, 2),
+        "transportation": rng.sample(TRANSPORT, 1),
+        "neighborhood_traits": rng.sample(TRAITS, 2),
+        "lifestyle": rng.choice(LIFESTYLES),
+    }
+
+
+def synthetic_queries(n: int, form_share: float = 0.5, seed: int = 0) -> List[Dict]:
+    """Chain inputs: {"raw_query"} for free-form text, plus "form" for sidebar queries."""
+    rng = random.Random(f"queries:{seed}")
+    queries = []
+    for _ in range(n):
+        if rng.random() < form_share:
+            form = synthetic_form(rng)
+            queries.append({"raw_query": build_form_query(form), "form": form})
+        else:
+            queries.append(
+                {
+                    "raw_query": (
+                        f"I'd like a {rng.choice(STYLES)} {rng.randint(1, 5)}-bedroom "
+                        f"house with a {rng.choice(AMENITIES)} in a "
+                        f"{rng.choice(TRAITS)} area near {rng.choice(TRANSPORT)}, "
+                        f"under ${rng.randrange(300, 2000, 50)}k"
+                    )
+                }
+            )
+    return queries
+
+
+def listing_id(i: int, seed: int = 0) -> str:
+    return hashlib.sha256(f"{seed}:{i}".encode("utf-8")).hexdigest()
+
+
+def cluster_centers(dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    centers = np.random.default_rng([seed, 0]).normal(size=(clusters, dim))
+    return (centers / np.linalg.norm(centers, axis=1, keepdims=True)).astype(np.float32)
+
+
+VECTOR_BATCH = 1024  # rows per generated batch (each batch has its own seed)
+
+
+def synthetic_vector_batches(
+    n: int, dim: int, seed: int = 0, noise: float = 0.6
+) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict]]]:
+    """(ids, unit vectors, documents, metadatas) batches of a clustered corpus."""
+    centers = cluster_centers(dim, seed=seed)
+    for start in range(0, n, VECTOR_BATCH):
+        stop = min(n, start + VECTOR_BATCH)
+        rng = np.random.default_rng([seed, 1, start])
+        labels = rng.integers(0, len(centers), stop - start)
+        vectors = centers[labels] + noise * rng.normal(size=(stop - start, dim)).astype(
+            np.float32
+        ) / np.sqrt(dim)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        ids = [listing_id(i, seed) for i in range(start, stop)]
+        metadatas = [
+            {
+                "price": int(rng.integers(150, 2500)) * 1000,
+                "bedrooms": int(rng.integers(1, 7)),
+                "bathrooms": int(rng.integers(1, 5)),
+                "house_size_sqft": int(rng.integers(600, 4800)),
+                "neighborhood": f"Neighborhood {label}",
+                "content_hash": doc_id,
+            }
+            for doc_id, label in zip(ids, labels)
+        ]
+        documents = [f"Synthetic listing {i}" for i in range(start, stop)]
+        yield ids, vectors, documents, metadatas
+
+
+def synthetic_query_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Query vectors near the corpus clusters (not copies of corpus points)."""
+    centers = cluster_centers(dim, seed=seed)
+    rng = np.random.default_rng([seed, 2])
+    queries = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.normal(
+        size=(n, dim)
+    ).astype(np.float32) / np.sqrt(dim)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
@@ -0,0 +1,258 @@
+"""
+vector_backends.py
+~~~~~~~~~~~~~~~~~~
+Loads the same synthetic corpus into every vector backend, at several corpus
+sizes, and reports what it takes to choose between them:
+
+    python -m src.benchmarks.vector_backends --sizes 10000 100000 1000000
+
+  build time      upserting the corpus (precomputed vectors) and persisting it
+  disk size       of the backend's directory
+  RSS             of a fresh process that opened the index and ran the queries
+  latency         p50 / p95 / p99 of filtered and unfiltered top-k queries
+  recall@k        against exact float32 search with the same filters
+
+Each build and each query run happens in its own process, so the memory
+numbers of one backend are not inflated by another.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.benchmarks.stats import (
+    directory_bytes,
+    environment,
+    peak_rss_bytes,
+    rss_bytes,
+    summarize,
+    write_results,
+)
+from src.benchmarks.synthetic import synthetic_query_vectors, synthetic_vector_batches
+from src.tools.embeddings.hashing_embeddings import HashingEmbeddings
+from src.tools.vectorindex.backend import open_backend
+
+
+def parse_backend(spec: str) -> Tuple[str, str]:
+    """Split a backend spec: numpy:int8 -> ("numpy", "int8"), chroma -> ("chroma", "none")."""
+    name, _, quantization = spec.partition(":")
+    return name, quantization or "none"
+
+
+def query_filters(n_queries: int, seed: int = 0) -> List[Optional[Dict]]:
+    """Every other query carries a price / bedrooms filter, like the retriever sends."""
+    rng = np.random.default_rng([seed, 3])
+    filters = []
+    for i in range(n_queries):
+        if i % 2 == 0:
+            filters.append(None)
+            continue
+        filters.append(
+            {
+                "$and": [
+                    {"price": {"$lte": int(rng.integers(400, 2500)) * 1000}},
+                    {"bedrooms": {"$gte": int(rng.integers(1, 5))}},
+                ]
+            }
+        )
+    return filters
+
+
+def _matches(where: Dict, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Rows matching a `query_filters` clause ($and of $lte / $gte bounds)."""
+    mask = np.ones(len(next(iter(columns.values()))), dtype=bool)
+    for clause in where["$and"]:
+        ((field, condition),) = clause.items()
+        for operator, operand in condition.items():
+            if operator == "$lte":
+                mask &= columns[field] <= operand
+            else:
+                mask &= columns[field] >= operand
+    return mask
+
+
+def exact_neighbors(
+    n: int, dim: int, queries: np.ndarray, filters: List, k: int, seed: int
+) -> List[List[str]]:
+    """Ground truth: exact top-k ids per query, streaming over the corpus batches."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), "", dtype=object)
+    for ids, vectors, _, metadatas in synthetic_vector_batches(n, dim, seed=seed):
+        scores = queries @ vectors.T
+        columns = {
+            field: np.array([metadata[field] for metadata in metadatas])
+            for field in ("price", "bedrooms")
+        }
+        for q, where in enumerate(filters):
+            if where is not None:
+                scores[q, ~_matches(where, columns)] = -np.inf
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate(
+            [best_ids, np.array(ids, dtype=object)[None, :].repeat(len(queries), 0)],
+            axis=1,
+        )
+        top = np.argsort(-merged_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_ids = np.take_along_axis(merged_ids, top, axis=1)
+    return [
+        [doc_id for doc_id, score in zip(row_ids, row_scores) if score > -np.inf]
+        for row_ids, row_scores in zip(best_ids, best_scores)
+    ]
+
+
+def build_index(spec: str, directory: str, n: int, dim: int, seed: int) -> Dict:
+    """(child process) Load the corpus into a fresh backend and persist it."""
+    name, quantization = parse_backend(spec)
+    start = time.perf_counter()
+    backend = open_backend(
+        name, directory, HashingEmbeddings(dim), quantization=quantization
+    )
+    for ids, vectors, documents, metadatas in synthetic_vector_batches(n, dim, seed):
+        backend.upsert(ids, vectors, documents, metadatas)
+    backend.persist()
+    return {
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "build_peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def query_index(
+    spec: str,
+    directory: str,
+    dim: int,
+    queries: np.ndarray,
+    filters: List,
+    k: int,
+    truth: List[List[str]],
+) -> Dict:
+    """(child process) Open the persisted index and time the queries."""
+    name, quantization = parse_backend(spec)
+    start = time.perf_counter()
+    backend = open_backend(
+        name, directory, HashingEmbeddings(dim), quantization=quantization
+    )
+    open_seconds = time.perf_counter() - start
+
+    # the first filtered query may build lazy structures: reported on its own
+    first = time.perf_counter()
+    backend.search(queries[1 % len(queries)], k, filters[1 % len(filters)])
+    first_query = time.perf_counter() - first
+
+    latencies, recalls = [], []
+    for query, where, expected in zip(queries, filters, truth):
+        start = time.perf_counter()
+        docs = backend.search(query, k, where)
+        latencies.append(time.perf_counter() - start)
+        if expected:
+            found = {doc.id for doc in docs}
+            recalls.append(len(found.intersection(expected)) / len(expected))
+
+    return {
+        "open_seconds": round(open_seconds, 4),
+        "first_query_ms": round(first_query * 1000, 3),
+        "latency": summarize(latencies),
+        "latency_filtered": summarize(latencies[1::2]),
+        "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else None,
+        "serve_rss_bytes": rss_bytes(),
+        "serve_peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def in_child(function, *args):
+    """Run `function` in a fresh (spawned) process and return its result."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(function, *args).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["chroma", "numpy", "numpy:float16", "numpy:int8"],
+        help="backend[:quantization] specs",
+    )
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="default: a temp directory")
+    parser.add_argument(
+        "--output", default="./src/benchmarks/results/vector_backends.json"
+    )
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="vector-backends-")
+    queries = synthetic_query_vectors(args.queries, args.dim, args.seed)
+    filters = query_filters(args.queries, args.seed)
+    cases = []
+    try:
+        for n in args.sizes:
+            logger.info(f"🎯 exact top-{args.k} ground truth for {n} listings")
+            truth = exact_neighbors(n, args.dim, queries, filters, args.k, args.seed)
+            for spec in args.backends:
+                directory = os.path.join(workdir, f"{spec.replace(':', '-')}-{n}")
+                shutil.rmtree(directory, ignore_errors=True)
+                logger.info(f"🏗️ {spec}: loading {n} listings")
+                case = {"backend": spec, "listings": n, "dim": args.dim, "k": args.k}
+                case.update(
+                    in_child(
+                        build_index,
+                        spec,
+                        directory,
+                        n,
+                        args.dim,
+                        args.seed,
+                    )
+                )
+                case["disk_bytes"] = directory_bytes(directory)
+                case.update(
+                    in_child(
+                        query_index,
+                        spec,
+                        directory,
+                        args.dim,
+                        queries,
+                        filters,
+                        args.k,
+                        truth,
+                    )
+                )
+                cases.append(case)
+                shutil.rmtree(directory, ignore_errors=True)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    write_results(args.output, {"environment": environment(), "cases": cases})
+
+    print(
+        f"{'backend':<15}{'listings':>10}{'build s':>10}{'disk MiB':>10}"
+        f"{'RSS MiB':>10}{'p50 ms':>9}{'p99 ms':>9}{'recall@k':>10}"
+    )
+    for case in cases:
+        print(
+            f"{case['backend']:<15}{case['listings']:>10}{case['build_seconds']:>10.1f}"
+            f"{case['disk_bytes'] / 2**20:>10.1f}{case['serve_rss_bytes'] / 2**20:>10.1f}"
+            f"{case['latency']['p50_ms']:>9.2f}{case['latency']['p99_ms']:>9.2f}"
+            f"{case['recall_at_k'] or 0:>10.3f}"
+        )
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
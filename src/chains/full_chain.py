@@ -1,10 +1,18 @@
+import asyncio
+import time
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
 from loguru import logger
 from IPython.display import display, Markdown
+from langchain_core.runnables import RunnableLambda, RunnableParallel
 from langchain_groq import ChatGroq
 
 from src.chains.query_cleaning import QueryCleaner
 from src.chains.rag_chain import Rag
 from src.config import settings
+from src.tools.cache.semantic_cache import SemanticAnswerCache
+from src.tools.filters.listing_filter import relaxation_ladder
+from src.tools.tracing.spans import tracer
 
 
 class HomeMatch:
@@ -12,35 +20,90 @@ class HomeMatch:
     This is a class is responsible of builing and running the full home match chain
     """
 
-    def __init__(self, model):
+    # class attributes
+    # process-wide, so every session (and every Streamlit rerun) shares the cached answers
+    answer_cache = SemanticAnswerCache(
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    )
+
+    def __init__(self, model, mode: str = None):
 
         self.query_cleaner = QueryCleaner(model)
         self.rag = Rag(model)
+        # "full", "direct" or "local-clean" (see QueryCleaner.query_cleaning_chain)
+        self.mode = mode or settings.PIPELINE_MODE
+
+    def _speculates(self) -> bool:
+        """
+        This method will tell whether the raw query is searched speculatively: only with
+        SPECULATIVE_RETRIEVAL, in "full" mode (the only one with a cleaning llm call to
+        overlap) and with the dense retriever (the only one that reuses the speculation)
+        """
+        return (
+            settings.SPECULATIVE_RETRIEVAL
+            and self.mode == "full"
+            and settings.RETRIEVER_MODE == "dense"
+        )
+
+    def _speculation_retriever(self):
+        """
+        This method will build the retriever up front when the speculation needs it, so
+        the speculation and the rag chain share one retriever (and one index sync)
+        """
+        return self.rag.chroma_store.build_retriever() if self._speculates() else None
+
+    def get_cleaning_chain(self, retriever=None):
+        """
+        This method will build the query cleaning chain for the pipeline mode. When
+        speculating, the raw query is also searched while the cleaning llm call is in
+        flight, and the cleaned query carries that "speculation"
+        """
+        query_cleaning_chain = self.query_cleaner.query_cleaning_chain(self.mode)
+        if not self._speculates():
+            return query_cleaning_chain
+
+        # both branches run concurrently (worker threads, or tasks when awaited)
+        return RunnableParallel(
+            cleaned=query_cleaning_chain,
+            speculation=self.rag.get_speculation_chain(retriever),
+        ) | RunnableLambda(
+            lambda result: {**result["cleaned"], "speculation": result["speculation"]}
+        )
 
     def get_full_chain(self):
         """
-        This method will build the full chain
+        This method will build the full chain for the pipeline mode
         """
-        query_cleaning_chain = self.query_cleaner.query_cleaning_chain()
-        rag_chain = self.rag.get_rag_chain()
+        retriever = self.rag.chroma_store.build_retriever()
+        query_cleaning_chain = self.get_cleaning_chain(retriever)
+        rag_chain = self.rag.get_rag_chain(retriever)
 
         # defining the full chain
         full_chain = query_cleaning_chain | rag_chain
 
         return full_chain
 
-    def invoke_full_chain(self, raw_query: str):
+    def invoke_full_chain(self, raw_query: Union[str, dict]):
         """
-        This method will run the full chain
+        This method will run the full chain. `raw_query` is either the query text or
+        the chain inputs, e.g. {"raw_query": ..., "form": <sidebar values>}
         """
+        inputs = raw_query if isinstance(raw_query, dict) else {"raw_query": raw_query}
 
         try:
             logger.info(
                 f" cleaning user raw query, retrieving similar listings and generating suggestions : {raw_query}"
             )
-            home_match = self.get_full_chain().invoke({"raw_query": raw_query})
+            with tracer.trace(mode=self.mode) as trace:
+                if settings.ANSWER_CACHE_ENABLED:
+                    home_match = self.invoke_cached_chain(inputs)
+                else:
+                    home_match = self.get_full_chain().invoke(inputs)
+                trace.add(documents=len(home_match["context"]))
             logger.info(
-                f"✅ listing documents sucessfully retrieved and an answer has been generated: {home_match}"
+                f"✅ {len(home_match['context'])} listing documents sucessfully retrieved and an answer has been generated"
             )
 
         except Exception as e:
@@ -62,6 +125,197 @@ class HomeMatch:
 
         return home_match
 
+    def invoke_cached_chain(self, inputs: dict):
+        """
+        This method will clean the query, then answer it from the semantic answer cache
+        when a close enough cleaned query was answered before, or run the rag chain
+        """
+        retriever = self._speculation_retriever()
+        cleaned_query = self.get_cleaning_chain(retriever).invoke(inputs)
+        speculation = cleaned_query.pop("speculation", None)
+
+        cache_args = self._answer_cache_args(cleaned_query)
+        cached = self.answer_cache.lookup(*cache_args)
+        if cached is not None:
+            return {**cleaned_query, **cached}
+
+        start = time.perf_counter()
+        home_match = self.rag.get_rag_chain(retriever).invoke(
+            {**cleaned_query, "speculation": speculation}
+        )
+        self._store_answer(cache_args, home_match, time.perf_counter() - start)
+
+        return home_match
+
+    async def ainvoke_full_chain(self, raw_query: Union[str, dict]):
+        """
+        This method is the async counterpart of invoke_full_chain: the llm calls are
+        awaited and the blocking retrieval / cache work runs in worker threads
+        """
+        try:
+            logger.info(
+                f" cleaning user raw query, retrieving similar listings and generating suggestions : {raw_query}"
+            )
+            home_match = await self._ainvoke(raw_query)
+            logger.info(
+                f"✅ {len(home_match['context'])} listing documents sucessfully retrieved and an answer has been generated"
+            )
+
+        except Exception as e:
+            # one failed query must not take the event loop (and every other query
+            # in flight) down with it: log, and let the caller handle the error
+            if "403" in str(e) and "Access denied" in str(e):
+                logger.error(
+                    "🚫 API Access Denied - Please check your API key and network settings"
+                )
+            else:
+                logger.error(f"❌ Unexpected error: {str(e)}")
+            raise
+
+        return home_match
+
+    async def abatch(
+        self,
+        raw_queries: List[Union[str, dict]],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """
+        This method will run many buyer queries concurrently, at most `max_concurrency`
+        at a time, and return their results in the order of `raw_queries`.
+        With `return_exceptions=True` a failed query returns its exception instead of
+        cancelling the whole batch
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or settings.ASYNC_MAX_CONCURRENCY)
+
+        async def run(raw_query):
+            async with semaphore:
+                return await self._ainvoke(raw_query)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run(raw_query) for raw_query in raw_queries),
+            return_exceptions=return_exceptions,
+        )
+        elapsed = time.perf_counter() - start
+        failed = sum(isinstance(result, BaseException) for result in results)
+        logger.info(
+            f"✅ answered {len(results) - failed}/{len(results)} queries in {elapsed:.2f}s"
+        )
+
+        return results
+
+    async def _ainvoke(self, raw_query: Union[str, dict]) -> dict:
+        # each query of a batch runs in its own task, hence in its own trace
+        with tracer.trace(mode=self.mode) as trace:
+            home_match = await self._ainvoke_traced(raw_query)
+            trace.add(documents=len(home_match["context"]))
+        return home_match
+
+    async def _ainvoke_traced(self, raw_query: Union[str, dict]) -> dict:
+        inputs = raw_query if isinstance(raw_query, dict) else {"raw_query": raw_query}
+        # building the retriever syncs the index, which touches the disk
+        retriever = await asyncio.to_thread(self._speculation_retriever)
+        cleaning_chain = self.get_cleaning_chain(retriever)
+        cleaned_query = await cleaning_chain.ainvoke(inputs)
+        speculation = cleaned_query.pop("speculation", None)
+
+        cache_args = None
+        if settings.ANSWER_CACHE_ENABLED:
+            cache_args = await asyncio.to_thread(self._answer_cache_args, cleaned_query)
+            cached = self.answer_cache.lookup(*cache_args)
+            if cached is not None:
+                return {**cleaned_query, **cached}
+
+        rag_chain = await asyncio.to_thread(self.rag.get_rag_chain, retriever)
+        start = time.perf_counter()
+        home_match = await rag_chain.ainvoke(
+            {**cleaned_query, "speculation": speculation}
+        )
+        if cache_args is not None:
+            self._store_answer(cache_args, home_match, time.perf_counter() - start)
+
+        return home_match
+
+    def stream_full_chain(self, raw_query: Union[str, dict]) -> Iterator[dict]:
+        """
+        This method will run the full chain and yield its output as it is produced:
+        first the cleaned query ({"input", "preferences"}), then {"context": docs} as soon
+        as retrieval finishes, then {"answer": token} chunks while the llm generates
+        """
+        inputs = raw_query if isinstance(raw_query, dict) else {"raw_query": raw_query}
+        logger.info(f" streaming suggestions for user raw query : {raw_query}")
+
+        with tracer.trace(mode=self.mode) as trace:
+            yield from self._stream_traced(inputs, trace)
+        logger.info("✅ suggestions have been streamed")
+
+    def _stream_traced(self, inputs: dict, trace) -> Iterator[dict]:
+        retriever = self._speculation_retriever()
+        cleaned_query = self.get_cleaning_chain(retriever).invoke(inputs)
+        speculation = cleaned_query.pop("speculation", None)
+        yield cleaned_query
+
+        cache_args = None
+        if settings.ANSWER_CACHE_ENABLED:
+            cache_args = self._answer_cache_args(cleaned_query)
+            cached = self.answer_cache.lookup(*cache_args)
+            if cached is not None:
+                trace.add(documents=len(cached["context"]))
+                yield {"context": cached["context"]}
+                yield {"answer": cached["answer"]}
+                return
+
+        start = time.perf_counter()
+        home_match = {"context": [], "answer": ""}
+        rag_inputs = {**cleaned_query, "speculation": speculation}
+        for chunk in self.rag.get_rag_chain(retriever).stream(rag_inputs):
+            # the rag chain also echoes its inputs, which were already yielded above
+            if "context" in chunk:
+                home_match["context"] = chunk["context"]
+                trace.add(documents=len(chunk["context"]))
+                yield {"context": chunk["context"]}
+            if "answer" in chunk:
+                home_match["answer"] += chunk["answer"]
+                yield {"answer": chunk["answer"]}
+
+        if cache_args is not None:
+            self._store_answer(cache_args, home_match, time.perf_counter() - start)
+
+    def _answer_cache_args(self, cleaned_query: dict) -> Tuple[List[float], tuple, str]:
+        """
+        This method will return the (query vector, cache key, index version) used to
+        look up and store answers for a cleaned query
+        """
+        chroma_store = self.rag.chroma_store
+        with tracer.span("answer_cache"):
+            # answers are only valid for the listings they were retrieved from; a hit
+            # skips the retriever (and its sync), so the version is read from the
+            # listing file stats on every lookup
+            index_version = chroma_store.current_index_version()
+            query_vector = self.rag.embedding_model.embed_query(cleaned_query["input"])
+
+        # only reuse answers produced by the same model, in the same pipeline mode,
+        # under the same hard filters
+        cache_key = (
+            getattr(self.rag.llm, "model_name", type(self.rag.llm).__name__),
+            self.mode,
+            relaxation_ladder(cleaned_query.get("preferences"))[0],
+        )
+        return query_vector, cache_key, index_version
+
+    def _store_answer(self, cache_args: tuple, home_match: dict, latency: float):
+        query_vector, cache_key, _ = cache_args
+        self.answer_cache.store(
+            query_vector,
+            cache_key,
+            {"context": home_match["context"], "answer": home_match["answer"]},
+            latency=latency,
+            # the listings the answer was just retrieved from
+            index_version=self.rag.chroma_store.current_index_version(),
+        )
+        logger.info(f"📊 answer cache: {self.answer_cache.stats()}")
+
 
 if __name__ == "__main__":
 
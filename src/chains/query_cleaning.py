@@ -3,6 +3,8 @@ from langchain.schema.runnable import RunnableLambda
 from loguru import logger
 
 from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.llm_parsers.form_parser import local_preferences, preferences_from_form
+from src.llm_parsers.text_parser import preferences_from_text
 from src.prompt_templates.query_cleaning_prompt import query_cleaner_prompt
 from src.config import settings
 
@@ -19,34 +21,76 @@ class QueryCleaner:
 
         self.llm = model
 
-    def query_cleaning_chain(self):
+    def query_cleaning_chain(self, mode: str = None):
         """
-        This method will build and return the query cleaning chain
+        This method will build and return the query cleaning chain of the pipeline `mode`
+        (settings.PIPELINE_MODE by default):
+        - "full": free-form queries are cleaned by the llm
+        - "local-clean": free-form queries are parsed locally with regexes
+        - "direct": no cleaning, the raw query is embedded as it was typed
         """
+        mode = mode or settings.PIPELINE_MODE
+
+        if mode == "direct":
+            # the sidebar values are already structured: keep them as filters
+            def direct_inputs(inputs):
+                form = inputs.get("form")
+                return {
+                    "input": inputs["raw_query"],
+                    "preferences": preferences_from_form(form) if form else None,
+                }
+
+            return RunnableLambda(direct_inputs).with_config(
+                run_name="parse_preferences"
+            )
 
         # Bind the parser to the LLM
         cleaning_llm = self.llm.with_structured_output(BuyerPreferences)
 
-        # create a RunnableLambda to extract the query attribute from the BuyerPreference object
-        extract_query = RunnableLambda(lambda prefs: {"input": prefs.query})
+        # create a RunnableLambda to extract the query attribute from the BuyerPreference object,
+        # keeping the structured preferences around so the retriever can filter on them
+        extract_query = RunnableLambda(
+            lambda prefs: {"input": prefs.query, "preferences": prefs}
+        )
+
+        llm_cleaning_chain = self.cleaning_prompt | cleaning_llm
+
+        # sidebar queries (the structured `form` values, or text that matches the form
+        # template) are parsed locally; only free-form queries go through the llm.
+        # returning a runnable from a RunnableLambda makes langchain invoke it with the same input
+        def route(inputs):
+            prefs = local_preferences(inputs)
+            if prefs is not None:
+                logger.info("⚡ form query parsed locally, skipping the llm cleaner")
+                return prefs
+            if mode == "local-clean":
+                logger.info("⚡ free-form query parsed locally (local-clean mode)")
+                return preferences_from_text(inputs["raw_query"])
+            return llm_cleaning_chain
 
         # defining the user query cleaning chain
-        query_cleaning_chain = self.cleaning_prompt | cleaning_llm | extract_query
+        query_cleaning_chain = (
+            RunnableLambda(route).with_config(run_name="parse_preferences")
+            | extract_query
+        )
 
         return query_cleaning_chain
 
-    def invoke_clean_query(self, raw_query: str):
+    def invoke_clean_query(self, raw_query: str, form: dict = None, mode: str = None):
         """
-        This method will take in the user raw query and clean it before it goes to the llm
+        This method will take in the user raw query and clean it before it goes to the llm.
+        `form` holds the sidebar values when the query was generated from them
         """
 
         # defining the user query cleaning chain
-        query_cleaning_chain = self.query_cleaning_chain()
+        query_cleaning_chain = self.query_cleaning_chain(mode)
 
         # invocation
         try:
             logger.info(f" cleaning user raw query : {raw_query}")
-            cleaned_query = query_cleaning_chain.invoke({"raw_query": raw_query})
+            cleaned_query = query_cleaning_chain.invoke(
+                {"raw_query": raw_query, "form": form}
+            )
 
         except Exception as e:
             # Check if it's a 403 access denied error
@@ -71,6 +115,36 @@ class QueryCleaner:
 
         return cleaned_query
 
+    async def ainvoke_clean_query(
+        self, raw_query: str, form: dict = None, mode: str = None
+    ):
+        """
+        This method is the async counterpart of invoke_clean_query
+        """
+        query_cleaning_chain = self.query_cleaning_chain(mode)
+
+        try:
+            logger.info(f" cleaning user raw query : {raw_query}")
+            cleaned_query = await query_cleaning_chain.ainvoke(
+                {"raw_query": raw_query, "form": form}
+            )
+
+        except Exception as e:
+            # re-raised for the caller, which may be serving other queries
+            if "403" in str(e) and "Access denied" in str(e):
+                logger.error(
+                    "🚫 API Access Denied - Please check your API key and network settings"
+                )
+            else:
+                logger.error(f"❌ Unexpected error: {str(e)}")
+            raise
+
+        logger.info(
+            f"✅ user raw query has successfully been cleaned : {cleaned_query}"
+        )
+
+        return cleaned_query
+
 
 if __name__ == "__main__":
 
@@ -1,13 +1,18 @@
+import asyncio
+
 from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
+from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
+from langchain_core.output_parsers import StrOutputParser
 from loguru import logger
 
 # from src.llms import groqllm
-from src.prompt_templates.rag_prompt import rag_prompt
+from src.prompt_templates.rag_prompt import compact_context_format, rag_prompt
 from src.config import settings
+from src.llm_parsers.form_parser import local_preferences
 from src.tools.chromadb.chroma_store import ChromaStore
+from src.tools.context.context_builder import build_context
+from src.tools.embeddings.embedding_model import get_embedding_model
+from src.tools.tracing.spans import tracer
 from src.chains.query_cleaning import QueryCleaner
 
 
@@ -17,10 +22,7 @@ class Rag:
     """
 
     # class attributes
-    embedding_model = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        model_kwargs={"device": "cpu"},  # or "cuda" if GPU is available
-    )
+    embedding_model = get_embedding_model()  # shared, cache-backed bge model
 
     rag_prompt = rag_prompt
 
@@ -29,30 +31,105 @@ class Rag:
         self.llm = model
         self.chroma_store = ChromaStore()
 
-    def get_rag_chain(self):
+    def get_rag_chain(self, retriever=None):
         """
-        This method is responsible of building and returning the rag_chain
+        This method is responsible of building and returning the rag_chain. A
+        `retriever` already built for this query (e.g. by the speculation) is reused
         """
 
-        # 1️⃣  combine the retrieved docs + prompt + model
-        combine_docs_chain = create_stuff_documents_chain(
-            llm=self.llm, prompt=rag_prompt
+        # 1️⃣  combine the retrieved docs (rendered within the token budget) + prompt + model
+        prompt = rag_prompt
+        if settings.RAG_CONTEXT_TOKEN_BUDGET > 0:
+            # tell the llm how the compact context builder lays out each listing
+            prompt = rag_prompt.partial(context_format=compact_context_format)
+        combine_docs_chain = (
+            RunnablePassthrough.assign(context=RunnableLambda(self.listings_context))
+            | prompt
+            | self.llm
+            | StrOutputParser()
+        ).with_config(run_name="stuff_documents_chain")
+
+        # 2️⃣  retrieve listings, filtered on the buyer preferences when the cleaner parsed any
+        # (and reusing the speculative search of the raw query, when one was started)
+        if retriever is None:
+            retriever = self.chroma_store.build_retriever()
+        retrieve_docs = RunnableLambda(
+            lambda inputs: retriever.retrieve(
+                inputs["input"], inputs.get("preferences"), inputs.get("speculation")
+            ),
+            afunc=lambda inputs: retriever.aretrieve(
+                inputs["input"], inputs.get("preferences"), inputs.get("speculation")
+            ),
+        ).with_config(run_name="retrieve_documents")
+
+        # 3️⃣  wire the retriever and the doc-combining chain together
+        # (the speculation is only an input of the retrieval, not part of the output)
+        rag_chain = (
+            RunnablePassthrough.assign(context=retrieve_docs)
+            .assign(answer=combine_docs_chain)
+            .pick(["input", "preferences", "context", "answer"])
         )
 
-        # 2️⃣  wire the retriever and the doc-combining chain together
-        rag_chain = create_retrieval_chain(
-            retriever=self.chroma_store.build_retriever(),
-            combine_docs_chain=combine_docs_chain,
+        return rag_chain
+
+    def get_speculation_chain(self, retriever=None):
+        """
+        This method will build the speculative retrieval step: the raw query is embedded
+        and searched while the cleaning llm call is still in flight. Sidebar queries are
+        cleaned locally, with nothing to overlap, so they are not speculated on
+        """
+        if retriever is None:
+            retriever = self.chroma_store.build_retriever()
+
+        def speculate(inputs):
+            if local_preferences(inputs) is not None:
+                return None
+            return retriever.speculate(inputs["raw_query"])
+
+        async def aspeculate(inputs):
+            if local_preferences(inputs) is not None:
+                return None
+            return await retriever.aspeculate(inputs["raw_query"])
+
+        return RunnableLambda(speculate, afunc=aspeculate).with_config(
+            run_name="speculative_retrieval"
         )
 
-        return rag_chain
+    @staticmethod
+    def listings_context(inputs: dict) -> str:
+        """
+        This method will render the retrieved listings for the prompt: compact structured
+        lines plus query-relevant excerpts within RAG_CONTEXT_TOKEN_BUDGET tokens
+        """
+        docs = inputs["context"]
+        if settings.RAG_CONTEXT_TOKEN_BUDGET <= 0:
+            return "\n\n".join(doc.page_content for doc in docs)
+
+        with tracer.span("build_context") as span:
+            context, stats = build_context(
+                docs,
+                inputs["input"],
+                inputs.get("preferences"),
+                token_budget=settings.RAG_CONTEXT_TOKEN_BUDGET,
+            )
+            span.add(
+                documents=stats.listings,
+                context_tokens=stats.tokens,
+                saved_tokens=stats.saved_tokens,
+            )
+        logger.info(
+            f"✂️ prompt context: {stats.listings} listings in ~{stats.tokens} tokens, "
+            f"{stats.saved_tokens} saved against the full text"
+            + (f" ({stats.dropped} dropped)" if stats.dropped else "")
+        )
+        return context
 
     def invoke_rag_chain(self, raw_query):
         """
         This method will be used to invoke the rag_chain
         """
         # instantiate a QueryCleaner object
-        query_cleaner = QueryCleaner()
+        query_cleaner = QueryCleaner(self.llm)
         query_cleaner_chain = query_cleaner.query_cleaning_chain()
 
         chain = query_cleaner_chain | self.get_rag_chain()
@@ -85,6 +162,39 @@ class Rag:
 
         return rag_answer
 
+    async def ainvoke_rag_chain(self, raw_query):
+        """
+        This method is the async counterpart of invoke_rag_chain: the llm calls are
+        awaited and retrieval runs in a worker thread, so the event loop is never blocked
+        """
+        query_cleaner = QueryCleaner(self.llm)
+        query_cleaner_chain = query_cleaner.query_cleaning_chain()
+
+        # building the rag chain syncs the index, which touches the disk
+        rag_chain = await asyncio.to_thread(self.get_rag_chain)
+        chain = query_cleaner_chain | rag_chain
+
+        try:
+            logger.info(
+                f" cleaning user raw query, retrieving similar listings and generating suggestions : {raw_query}"
+            )
+            rag_answer = await chain.ainvoke({"raw_query": raw_query})
+            logger.info(
+                f"✅ listing documents sucessfully retrieved and an answer has been generated: {rag_answer}"
+            )
+
+        except Exception as e:
+            # logged and re-raised: exiting here would stop the whole event loop
+            if "403" in str(e) and "Access denied" in str(e):
+                logger.error(
+                    "🚫 API Access Denied - Please check your API key and network settings"
+                )
+            else:
+                logger.error(f"❌ Unexpected error: {str(e)}")
+            raise
+
+        return rag_answer
+
 
 if __name__ == "__main__":
 
@@ -4,6 +4,9 @@ from loguru import logger
 # Import Pydantic's Field for metadata and field customization, and field_validator for validation
 from pydantic import Field, field_validator
 
+# Import Literal to restrict settings to a fixed set of choices
+from typing import Literal, Optional
+
 # Import BaseSettings for environment-based configuration, and SettingsConfigDict for model config
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -38,6 +41,162 @@ class Settings(BaseSettings):
             )  # Raise validation error
         return value  # Return the valid (non-empty) value
 
+    # --- Pipeline Configuration ---
+    # How the buyer query is cleaned before retrieval: trades answer quality for llm calls
+    PIPELINE_MODE: Literal["full", "direct", "local-clean"] = Field(
+        default="full",
+        description="'full' (llm cleaning + answer), 'direct' (raw query, answer call only) or 'local-clean' (regex cleaning + answer).",
+    )
+
+    # --- Embedding Configuration ---
+    # HuggingFace model used for both listings and buyer queries
+    EMBEDDING_MODEL_NAME: str = Field(
+        default="BAAI/bge-base-en-v1.5",
+        description="HuggingFace embedding model used for listings and queries.",
+    )
+
+    # Embedding backend: fp32 PyTorch (sentence-transformers) or int8-quantized ONNX
+    EMBEDDING_BACKEND: Literal["torch", "onnx-int8", "hashing"] = Field(
+        default="torch",
+        description="Embedding runtime: 'torch' (fp32), 'onnx-int8' (quantized onnxruntime) or 'hashing' (offline, for benchmarks).",
+    )
+    ONNX_MODEL_DIR: str = Field(
+        default="./src/tools/embeddings/onnx/bge-base-en-v1.5-int8",
+        description="Where the exported int8 ONNX embedding model is stored.",
+    )
+
+    # Disk-backed embedding cache shared by ingestion and queries
+    EMBEDDING_CACHE_PATH: str = Field(
+        default="./src/tools/embeddings/cache/embeddings.sqlite3",
+        description="SQLite file holding cached embedding vectors.",
+    )
+    EMBEDDING_CACHE_MAX_BYTES: int = Field(
+        default=512 * 1024 * 1024,
+        description="Size budget of the on-disk embedding cache before LRU eviction.",
+    )
+    EMBEDDING_CACHE_LRU_SIZE: int = Field(
+        default=10_000,
+        description="Number of vectors kept in the in-memory LRU in front of the disk cache.",
+    )
+
+    # --- Retrieval Configuration ---
+    # Dense-only vector search, or dense + BM25 fused with reciprocal rank fusion
+    RETRIEVER_MODE: Literal["dense", "hybrid"] = Field(
+        default="dense",
+        description="Listing retrieval mode: 'dense' or 'hybrid' (dense + BM25).",
+    )
+    # Where the dense search runs: the Chroma collection, or an in-process NumPy matrix
+    VECTOR_BACKEND: Literal["chroma", "numpy"] = Field(
+        default="chroma",
+        description="Dense search backend: 'chroma' or 'numpy' (exact, in-process).",
+    )
+    VECTOR_QUANTIZATION: Literal["none", "float16", "int8"] = Field(
+        default="none",
+        description="Storage of the NumPy backend's vectors: 'none' (float32), 'float16' or 'int8'.",
+    )
+
+    # --- Speculative Retrieval Configuration ---
+    # "full" mode: search on the raw query while the cleaning llm call is in flight
+    SPECULATIVE_RETRIEVAL: bool = Field(
+        default=False,
+        description="Start embedding and vector search on the raw query in parallel with query cleaning.",
+    )
+    SPECULATIVE_CANDIDATES: int = Field(
+        default=50,
+        description="Unfiltered listings fetched for the raw query, filtered once the preferences are known.",
+    )
+    SPECULATIVE_REUSE_SIMILARITY: float = Field(
+        default=0.9,
+        description="Cosine similarity between the raw and cleaned query embeddings above which the speculative listings are reused.",
+    )
+
+    # --- Rerank Configuration ---
+    # Optional cross-encoder pass over the top-N retrieved candidates
+    RERANK_ENABLED: bool = Field(
+        default=False,
+        description="Rerank the retrieved candidates with a local cross-encoder.",
+    )
+    RERANK_MODEL_NAME: str = Field(
+        default="cross-encoder/ms-marco-MiniLM-L-6-v2",
+        description="HuggingFace cross-encoder used for reranking (runs on CPU).",
+    )
+    RERANK_MAX_LENGTH: int = Field(
+        default=512,
+        description="Tokens of each (query, listing) pair the cross-encoder reads.",
+    )
+    RERANK_CANDIDATES: int = Field(
+        default=20,
+        description="Candidates retrieved per query and scored by the reranker (top-N).",
+    )
+    RERANK_BUDGET_MS: float = Field(
+        default=300,
+        description="Reranking time budget; past it the dense order is kept.",
+    )
+    RERANK_CACHE_SIZE: int = Field(
+        default=20_000,
+        description="(query, listing) scores kept in the reranker's LRU cache.",
+    )
+
+    # --- Prompt Context Configuration ---
+    # Listings are rendered as structured lines + query-relevant excerpts within a budget
+    RAG_CONTEXT_TOKEN_BUDGET: int = Field(
+        default=600,
+        description="Estimated tokens of listings context in the RAG prompt (0 pastes the full texts).",
+    )
+
+    # --- Answer Cache Configuration ---
+    # Semantic cache of (context, answer) keyed on the cleaned-query embedding; off by
+    # default: a hit serves the answer of a *similar* query, which is a product decision
+    ANSWER_CACHE_ENABLED: bool = Field(
+        default=False,
+        description="Serve near-identical cleaned queries from the answer cache.",
+    )
+    ANSWER_CACHE_THRESHOLD: float = Field(
+        default=0.97,
+        description="Minimum cosine similarity between cleaned queries for a cache hit.",
+    )
+    ANSWER_CACHE_TTL_SECONDS: float = Field(
+        default=3600,
+        description="How long a cached answer stays valid.",
+    )
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(
+        default=512,
+        description="Cached answers kept before least-recently-used eviction.",
+    )
+
+    # --- Async Configuration ---
+    # Upper bound on buyer queries in flight at once in HomeMatch.abatch
+    ASYNC_MAX_CONCURRENCY: int = Field(
+        default=16,
+        description="Maximum number of queries HomeMatch.abatch runs concurrently.",
+    )
+
+    # --- Tracing Configuration ---
+    # Per-stage timing spans (cleaning, embedding, search, prompt, generation)
+    TRACING_ENABLED: bool = Field(
+        default=True,
+        description="Time every pipeline stage and export the spans as histograms.",
+    )
+    TRACING_PROMETHEUS_PATH: Optional[str] = Field(
+        default=None,
+        description="File rewritten with the stage histograms (Prometheus text format) after each query.",
+    )
+
+    # --- Listing Generation Configuration ---
+    # Provider quota the concurrent listing generator paces itself against
+    LISTINGS_REQUESTS_PER_MINUTE: int = Field(
+        default=30,
+        description="Requests per minute allowed for listing generation.",
+    )
+    LISTINGS_TOKENS_PER_MINUTE: int = Field(
+        default=15_000,
+        description="Tokens per minute (prompt + completion) allowed for listing generation.",
+    )
+    LISTINGS_MAX_CONCURRENCY: int = Field(
+        default=8,
+        description="Maximum number of listing generation calls in flight at once.",
+    )
+
 
 # Try to instantiate the settings from environment and defaults
 try:
@@ -5,15 +5,15 @@ Main Streamlit page for HomeMatch — renders the UI, passes user input to the
 LangChain pipeline, and displays matching home listings with a summary.
 """
 
+from contextlib import closing
+
 import streamlit as st
 from langchain_groq import ChatGroq
 
 from src.config import settings
-from src.llms.groqllm import GroqLLM
 from src.frontend.streamlit.load_streamlit_ui import LoadStreamlitUI
-from src.chains.full_chain import (
-    HomeMatch,
-)  # <-- your composed LangChain pipeline (cleaner → RAG)
+from src.frontend.streamlit.resources import get_home_match
+from src.llm_parsers.form_parser import FORM_FIELDS, build_form_query
 
 
 class HomeMatchDisplay:
@@ -24,7 +24,8 @@ class HomeMatchDisplay:
         # Load sidebar and store user inputs
         self.ui = LoadStreamlitUI()
         self.user_inputs = self.ui.load_streamlit_ui()
-        self.home_match = HomeMatch(self.get_selected_model(self.user_inputs))
+        # built once per process and shared across reruns (see resources.py)
+        self.home_match = get_home_match(self.user_inputs)
 
     def render(self):
         """Render the main page content and trigger the query/search."""
@@ -34,61 +35,58 @@ class HomeMatchDisplay:
         if st.button(
             "✨ Search Listings", use_container_width=True, key="search_btn_top"
         ):
-            with st.spinner("Running AI search based on your preferences..."):
-
-                # Build the query
-                query = self._build_query()
-
-                # Invoke LangChain pipeline
-                results = self.home_match.invoke_full_chain({"raw_query": query})
-
-                # Show results
-                # self._render_summary(results)
-                self.render_results(results)
-
-    def get_selected_model(self, user_controls: dict):
-        """
-        Build a GroqLLM instance from Streamlit sidebar inputs and
-        return the underlying model object if it’s usable.
-
-        If the model cannot be initialized (missing or bad API key),
-        shows a Streamlit error and returns None.
-
-        """
-        llm = GroqLLM(user_controls)
-        model = llm.get_llm_model()
-
-        if model is None:
-            st.error("❌ LLM model could not be initialized (check your GROQ API key)")
-            return None
-
-        return model
+            if self.home_match is None:
+                return
+
+            # Build the query
+            query = self._build_query()
+
+            # Invoke LangChain pipeline, handing over the sidebar values when the
+            # query was generated from them so it can be parsed without the llm
+            inputs = {"raw_query": query}
+            if not self.ui.user_controls.get("summary"):
+                inputs["form"] = {k: self.user_inputs[k] for k in FORM_FIELDS}
+            # closed on every way out, so a stream left unfinished (no listings, or
+            # an error while rendering) still ends its pipeline and trace
+            with closing(self.home_match.stream_full_chain(inputs)) as stream:
+
+                # Show the listings as soon as retrieval is done ...
+                docs = []
+                with st.spinner("Running AI search based on your preferences..."):
+                    for chunk in stream:
+                        if "context" in chunk:
+                            docs = chunk["context"]
+                            break
+
+                if not self.render_listings(docs):
+                    return
+
+                # ... then stream the answer into the summary block while it is generated
+                self.render_summary(
+                    chunk["answer"] for chunk in stream if "answer" in chunk
+                )
 
     def _build_query(self) -> str:
         """Generate a natural language query from user inputs."""
-        return self.ui.user_controls.get("summary") or (
-            f"Looking for a {self.user_inputs['bedrooms']}-bedroom, "
-            f"{self.user_inputs['bathrooms']}-bathroom home, "
-            f"around {self.user_inputs['house_size']} sqft, "
-            f"priced at {self.user_inputs['price_range']}, "
-            f"with amenities like {', '.join(self.user_inputs['amenities'])}, "
-            f"in a {', '.join(self.user_inputs['neighborhood_traits'])} neighborhood, "
-            f"near {', '.join(self.user_inputs['transportation'])}. "
-            f"Ideal for someone with a {self.user_inputs['lifestyle']} lifestyle."
+        return self.ui.user_controls.get("summary") or build_form_query(
+            self.user_inputs
         )
 
     def render_results(self, results):
         """
         Display matching listings and the LLM-generated summary in a clean, interactive UI.
         """
+        if self.render_listings(results.get("context", [])):
+            self.render_summary([results.get("answer", "No summary returned.")])
 
-        st.markdown("### 🏘 Top Matching Listings")
+    def render_listings(self, docs) -> bool:
+        """Display the matching listings; returns False when there are none."""
 
-        docs = results.get("context", [])
+        st.markdown("### 🏘 Top Matching Listings")
 
         if not docs:
             st.warning("No matching listings found.")
-            return
+            return False
 
         for i, doc in enumerate(docs, 1):
             meta = doc.metadata
@@ -104,18 +102,38 @@ class HomeMatchDisplay:
                     """
                 )
 
-        # Summary block
+        return True
+
+    def render_summary(self, tokens) -> str:
+        """
+        Display the LLM-generated summary, redrawing the block as each token of
+        `tokens` arrives. Returns the full answer.
+        """
         st.markdown("---")
         st.markdown("### 🤖 AI Summary")
-        st.markdown(
-            f"""
-            <div style="background-color:#f5f5f5;padding:15px;border-radius:10px;">
-            {results.get('answer', 'No summary returned.')}
-            </div>
-            """,
+
+        placeholder = st.empty()
+        answer = ""
+        for token in tokens:
+            answer += token
+            placeholder.markdown(
+                self._summary_block(answer + "▌"), unsafe_allow_html=True
+            )
+        placeholder.markdown(
+            self._summary_block(answer or "No summary returned."),
             unsafe_allow_html=True,
         )
 
+        return answer
+
+    @staticmethod
+    def _summary_block(text: str) -> str:
+        return f"""
+            <div style="background-color:#f5f5f5;padding:15px;border-radius:10px;">
+            {text}
+            </div>
+            """
+
     # def _render_listings(self, results):
     #     """Display listings from the RAG context using shared render_results."""
     #     st.markdown("---")
@@ -175,6 +175,3 @@ class LoadStreamlitUI:
                 value="Looking for a modern sustainable family home.",
                 key="summary",
             )
-
-
-ui = LoadStreamlitUI()
@@ -0,0 +1,79 @@
+"""
+resources.py
+~~~~~~~~~~~~
+Process-wide resources of the HomeMatch Streamlit app.
+
+Streamlit re-executes the script on every widget interaction. The heavy
+objects (the Groq chat model, and HomeMatch with its query cleaner, rag
+chain and ChromaStore) are built once per process instead, in
+`st.cache_resource`, and shared by every rerun and every session.
+
+• The cache key is (model name, API key hash, index version): changing the
+  model or the key, or editing the listing files, builds a new HomeMatch.
+  The API key itself is never part of the key.
+• The ChromaStore is cached on its own, per index version, and shared by
+  every HomeMatch. It is opened when it is built: the index is synced and
+  the vector store, listing table and BM25 index are loaded, so the first
+  search of a session does not pay for it.
+• The embedding model and the reranker are already process-wide
+  (`get_embedding_model`, `get_reranker`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+import streamlit as st
+from loguru import logger
+
+from src.chains.full_chain import HomeMatch
+from src.llms.groqllm import GroqLLM
+from src.tools.chromadb.chroma_store import ChromaStore
+
+
+def api_key_hash(api_key: str) -> str:
+    """Short fingerprint of an API key, safe to use as a cache key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_home_match(user_controls: Dict[str, Any]) -> Optional[HomeMatch]:
+    """
+    The shared HomeMatch for the sidebar's model and API key, or None (with an error
+    on the page) when no API key was entered or configured.
+    """
+    api_key = user_controls.get("GROQ_API_KEY") or os.environ.get("GROQ_API_KEY", "")
+    if not api_key:
+        st.error("❌ LLM model could not be initialized (check your GROQ API key)")
+        return None
+
+    return _build_home_match(
+        user_controls.get("selected_groq_model"),
+        api_key_hash(api_key),
+        ChromaStore().current_index_version(),
+        _user_controls=user_controls,
+    )
+
+
+# the leading underscore keeps the sidebar values (and the raw key) out of the cache key
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _build_home_match(
+    model_name: str, key_hash: str, index_version: str, _user_controls: Dict[str, Any]
+) -> HomeMatch:
+    model = GroqLLM(_user_controls).get_llm_model()
+    home_match = HomeMatch(model)
+    home_match.rag.chroma_store = _open_chroma_store(index_version)
+    logger.info(
+        f"📦 HomeMatch built for {model_name} (key {key_hash}, index {index_version[:12]})"
+    )
+    return home_match
+
+
+@st.cache_resource(max_entries=2, show_spinner="Loading the listings index...")
+def _open_chroma_store(index_version: str) -> ChromaStore:
+    chroma_store = ChromaStore()
+    # sync the index and load the vector store, table and bm25 index now
+    chroma_store.build_retriever()
+    logger.info(f"📦 listings index {index_version[:12]} opened")
+    return chroma_store
@@ -1,15 +1,32 @@
 from pathlib import Path
+import asyncio
+import os
+import warnings
 import json, time
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 import json, time
 from langchain_groq import ChatGroq
 from langchain.docstore.document import Document
+from langchain_core.utils.json_schema import dereference_refs
 from loguru import logger
+from pydantic import ValidationError
 from tqdm import tqdm
 
 from src.config import settings
-from src.llm_parsers.listing_parser import Listing
-from src.prompt_templates.listing_prompt import listing_prompt
+from src.listings.listing_jsonl import (
+    ListingJsonlWriter,
+    iter_listing_items,
+    read_listings_jsonl,
+)
+from src.llm_parsers.listing_parser import Listing, ListingBatch
+from src.prompt_templates.listing_prompt import listing_batch_prompt, listing_prompt
+from src.tools.dedup.near_duplicates import NearDuplicateIndex
+from src.tools.rate_limit.rate_limiter import (
+    RateLimiter,
+    backoff_delay,
+    is_rate_limit_error,
+    retry_after_seconds,
+)
 
 
 class GenerateListings:
@@ -24,7 +41,9 @@ class GenerateListings:
         model_name="gemma2-9b-it",  # or another Groq model
         temperature=0.8,
         max_tokens=512,  # plenty for one JSON listing
+        max_retries=0,  # 429s are retried by the generator, which knows the quota
     )
+    tokens_per_listing = 512  # completion budget per generated listing
 
     def __init__(self, saving_path):
 
@@ -40,52 +59,344 @@ class GenerateListings:
 
         return listing_chain
 
+    @classmethod
+    def listing_batch_chain(cls, batch_size: int):
+        """
+        This method will build the chain that generates up to `batch_size` listings per call.
+        The llm fills the `ListingBatch` schema, but the output is returned as plain json so
+        that each listing can be validated on its own (see `validate_batch`)
+        """
+        # inline the nested Listing definition: not every provider resolves $ref
+        schema = dereference_refs(ListingBatch.model_json_schema())
+        schema.pop("$defs", None)
+
+        batch_llm = cls.llm_groq.model_copy(
+            update={"max_tokens": cls.tokens_per_listing * batch_size}
+        ).with_structured_output(schema)
+        listing_batch_chain = listing_batch_prompt | batch_llm
+
+        return listing_batch_chain
+
     # ---------------------------------------------------------------------
-    # Generate N listings with retry / pacing
+    # Generate N listings concurrently, paced by the provider quota
     # ---------------------------------------------------------------------
     def generate_listings(
         self,
         n: int,
         chain,
-        pause: float = 0.3,  # polite delay between calls in seconds
-        max_retries: int = 2,  # how many times to retry on an error
+        pause: Optional[float] = None,  # deprecated: calls are paced by `limiter`
+        max_retries: int = 5,  # how many times to retry a failed call
+        max_concurrency: Optional[int] = None,  # calls in flight at once
+        limiter: Optional[RateLimiter] = None,
+        batch_size: int = 1,  # listings per call, >1 needs `listing_batch_chain`
+        on_listing: Optional[Callable[[Listing], None]] = None,  # called per listing
+        dedup_index: Optional[NearDuplicateIndex] = None,  # listings to stay apart from
+        deduplicate: bool = True,  # reject and regenerate near-duplicate listings
+    ) -> List[Listing]:
+        """
+        Generate *n* real-estate listings via the Groq chain (see `agenerate_listings`).
+        Runs its own event loop: from async code or a notebook, await
+        `agenerate_listings` instead.
+        """
+        if pause is not None:
+            warnings.warn(
+                "`pause` is deprecated and ignored: generation is paced by the rate "
+                "limiter (LISTINGS_REQUESTS_PER_MINUTE / LISTINGS_TOKENS_PER_MINUTE)",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        return self._run_sync(
+            "generate_listings",
+            "agenerate_listings",
+            self.agenerate_listings(
+                n,
+                chain,
+                max_concurrency,
+                max_retries,
+                limiter,
+                batch_size,
+                on_listing,
+                dedup_index,
+                deduplicate,
+            ),
+        )
+
+    @staticmethod
+    def _run_sync(name: str, async_name: str, coroutine):
+        """Run `coroutine` to completion, unless an event loop is already running here."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        coroutine.close()  # never awaited
+        raise RuntimeError(
+            f"{name}() cannot run inside a running event loop (async code, Jupyter): "
+            f"use `await {async_name}(...)` instead"
+        )
+
+    def generate_to_jsonl(
+        self,
+        n: int,
+        chain,
+        fsync_every: int = 50,  # listings between two fsyncs
+        corpus_dir: Optional[str] = "./src/listings/docs",  # existing listings
+        **kwargs,
+    ) -> int:
+        """
+        Generate listings until `saving_path` (a JSONL file) holds *n* of them. Each
+        listing is appended as soon as it is generated, so an interrupted run resumes
+        where it stopped. New listings must not duplicate the ones already in
+        `corpus_dir`. Extra keyword arguments go to `agenerate_listings`.
+        Returns the number of listings in the file.
+        """
+        return self._run_sync(
+            "generate_to_jsonl",
+            "agenerate_to_jsonl",
+            self.agenerate_to_jsonl(n, chain, fsync_every, corpus_dir, **kwargs),
+        )
+
+    async def agenerate_to_jsonl(
+        self,
+        n: int,
+        chain,
+        fsync_every: int = 50,
+        corpus_dir: Optional[str] = "./src/listings/docs",
+        **kwargs,
+    ) -> int:
+        """Async version of `generate_to_jsonl`."""
+        # previous runs' listings count against the target and against duplicates,
+        # and the indexed corpus against duplicates only
+        dedup_index = NearDuplicateIndex()
+        if corpus_dir and os.path.isdir(corpus_dir):
+            for item in iter_listing_items(corpus_dir):
+                dedup_index.add(item["neighborhood"], item["description"])
+        existing = 0
+        for item in read_listings_jsonl(self.saving_path):
+            dedup_index.add(item["neighborhood"], item["description"])
+            existing += 1
+        kwargs.setdefault("dedup_index", dedup_index)
+        remaining = n - existing
+        if remaining <= 0:
+            logger.info(f"✅ {self.saving_path} already holds {existing} listings")
+            return existing
+        if existing:
+            logger.info(
+                f"↪️ resuming: {existing} listings already in {self.saving_path}, "
+                f"generating {remaining} more"
+            )
+
+        with ListingJsonlWriter(self.saving_path, fsync_every=fsync_every) as writer:
+            await self.agenerate_listings(
+                remaining, chain, on_listing=writer.write, **kwargs
+            )
+
+        logger.info(
+            f"✅ Saved {writer.written} new listings → {self.saving_path} "
+            f"({existing + writer.written} in total)"
+        )
+        return existing + writer.written
+
+    async def agenerate_listings(
+        self,
+        n: int,
+        chain,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 5,
+        limiter: Optional[RateLimiter] = None,
+        batch_size: int = 1,
+        on_listing: Optional[Callable[[Listing], None]] = None,
+        dedup_index: Optional[NearDuplicateIndex] = None,
+        deduplicate: bool = True,
     ) -> List[Listing]:
-        """Generate *n* real-estate listings via the Groq chain."""
-
-        listings: List[Listing] = []
-
-        for i in tqdm(range(n), desc="Generating listings"):
-            attempts = 0
-            while attempts <= max_retries:
-                try:
-                    listing = chain.invoke({})
-                    listings.append(listing)
-                    break  # success → exit retry loop
-                except Exception as e:
-                    # Check if it's a 403 access denied error
-                    if "403" in str(e) and "Access denied" in str(e):
-                        logger.error(
-                            "🚫 API Access Denied - Please check your API key and network settings"
-                        )
-                        logger.error("This might be due to:")
-                        logger.error("  - Invalid or expired API key")
-                        logger.error("  - Network/firewall restrictions")
-                        logger.error("  - API quota exceeded")
-                        logger.error("  - VPN/proxy blocking the connection")
+        """
+        Generate *n* listings with up to `max_concurrency` calls in flight. Every call
+        first takes one request and its estimated tokens from the rate limiter; a 429
+        pauses all callers for the provider's retry-after (or an exponential backoff
+        with jitter) before the call is retried.
+
+        With `batch_size` > 1 each call asks `listing_batch_chain(batch_size)` for several
+        listings; invalid items are dropped and only the shortfall is requested again.
+
+        Listings whose neighborhood was already used, or whose description is a near
+        duplicate (MinHash/LSH) of an accepted one, are rejected and regenerated; pass a
+        pre-filled `dedup_index` to also stay apart from existing listings.
+
+        `on_listing` is called with every accepted listing as soon as it arrives.
+        """
+        limiter = limiter or RateLimiter(
+            settings.LISTINGS_REQUESTS_PER_MINUTE, settings.LISTINGS_TOKENS_PER_MINUTE
+        )
+        semaphore = asyncio.Semaphore(
+            max_concurrency or settings.LISTINGS_MAX_CONCURRENCY
+        )
+        progress = tqdm(total=n, desc="Generating listings")
+        stats = {"requests": 0, "invalid": 0, "duplicates": 0}
+        if deduplicate and dedup_index is None:
+            dedup_index = NearDuplicateIndex()
+
+        async def generate_slot(i: int, size: int) -> List[Listing]:
+            produced: List[Listing] = []
+            empty_calls = 0
+            async with semaphore:
+                while len(produced) < size and empty_calls <= max_retries:
+                    need = size - len(produced)
+                    if batch_size == 1:
+                        inputs = {}
                     else:
-                        logger.error(f"❌ Unexpected error: {str(e)}")
+                        inputs = {
+                            "n": need,
+                            "avoid": ", ".join(l.neighborhood for l in produced)
+                            or "none",
+                        }
 
-                    # Exit gracefully or return empty data
-                    # exit(1)  # or return [] if you want to continue with empty data
-                    attempts += 1
-                    if attempts > max_retries:
-                        print(f"[{i}] failed after {max_retries} retries → {e}")
+                    stats["requests"] += 1
+                    result = await self._ainvoke_with_backoff(
+                        chain, inputs, limiter, need, max_retries, label=i
+                    )
+                    if result is None:
+                        break  # out of retries, or access denied
+
+                    if batch_size == 1:
+                        valid = [result]
+                    else:
+                        valid, invalid = self.validate_batch(result, produced)
+                        stats["invalid"] += invalid
+                    if deduplicate:
+                        # only the `need` listings that are kept enter the index
+                        valid = self._drop_duplicates(valid, dedup_index, stats, need)
                     else:
-                        print(f"[{i}] error, retrying ({attempts}) → {e}")
-                        time.sleep(pause)
-            time.sleep(pause)  # pacing to avoid rate limits
+                        valid = valid[:need]
+                    empty_calls = 0 if valid else empty_calls + 1
+
+                    produced.extend(valid)
+                    progress.update(len(valid))
+                    if on_listing is not None:
+                        for listing in valid:
+                            on_listing(listing)
+            return produced
+
+        sizes = [min(batch_size, n - start) for start in range(0, n, batch_size)]
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(generate_slot(i, size) for i, size in enumerate(sizes))
+        )
+        progress.close()
+        listings = [listing for produced in results for listing in produced]
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"✅ generated {len(listings)}/{n} listings in {elapsed:.1f}s "
+            f"({60 * len(listings) / max(elapsed, 1e-9):.1f} listings/min, "
+            f"{len(listings) / max(stats['requests'], 1):.2f} listings/request over "
+            f"{stats['requests']} requests, {stats['invalid']} invalid items dropped, "
+            f"{stats['duplicates']} duplicates rejected, "
+            f"{limiter.rate_limited} rate-limit responses, "
+            f"{limiter.waited_seconds:.1f}s waiting on the rate limiter)"
+        )
+
         return listings
 
+    async def _ainvoke_with_backoff(
+        self,
+        chain,
+        inputs: Dict,
+        limiter: RateLimiter,
+        n_listings: int,
+        max_retries: int,
+        label,
+    ):
+        """
+        This method will run one generation call under the rate limiter, retrying with
+        backoff on errors. Returns None when every attempt failed
+        """
+        tokens = self.estimate_call_tokens(n_listings)
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(tokens)
+            try:
+                return await chain.ainvoke(inputs)
+            except Exception as e:
+                if "403" in str(e) and "Access denied" in str(e):
+                    logger.error(
+                        "🚫 API Access Denied - Please check your API key and network settings"
+                    )
+                    return None  # retrying will not help
+                if is_rate_limit_error(e):
+                    delay = retry_after_seconds(e) or backoff_delay(attempt)
+                    limiter.pause(delay)
+                    logger.warning(f"[{label}] rate limited, backing off {delay:.1f}s")
+                else:
+                    delay = backoff_delay(attempt)
+                    logger.error(f"❌ [{label}] unexpected error: {str(e)}")
+
+                if attempt == max_retries:
+                    logger.error(f"[{label}] failed after {max_retries} retries → {e}")
+                    return None
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _drop_duplicates(
+        listings: List[Listing],
+        dedup_index: NearDuplicateIndex,
+        stats: Dict,
+        limit: int,
+    ) -> List[Listing]:
+        """
+        Keep the first `limit` listings that are neither a repeated neighborhood nor a
+        near-duplicate; the listings after those are neither checked nor indexed
+        """
+        kept = []
+        for listing in listings:
+            if len(kept) == limit:
+                break
+            reason = dedup_index.check_and_add(
+                listing.neighborhood, listing.description
+            )
+            if reason is None:
+                kept.append(listing)
+            else:
+                stats["duplicates"] += 1
+                logger.debug(f"♻️ rejected {listing.neighborhood}: duplicate {reason}")
+        return kept
+
+    @staticmethod
+    def validate_batch(
+        raw: Any, produced: Sequence[Listing] = ()
+    ) -> Tuple[List[Listing], int]:
+        """
+        Validate each item of a `ListingBatch` json output on its own. Returns the valid
+        listings (skipping neighborhoods already used in `produced` or earlier in the
+        batch) and the number of items that were dropped
+        """
+        items = raw.get("listings", []) if isinstance(raw, dict) else []
+        seen = {listing.neighborhood.strip().lower() for listing in produced}
+
+        valid: List[Listing] = []
+        for item in items:
+            try:
+                listing = Listing.model_validate(item)
+            except ValidationError:
+                continue
+            key = listing.neighborhood.strip().lower()
+            if key not in seen:
+                seen.add(key)
+                valid.append(listing)
+
+        return valid, len(items) - len(valid)
+
+    @classmethod
+    def estimate_call_tokens(cls, n_listings: int = 1) -> int:
+        """
+        Tokens one call is charged against the tokens-per-minute quota: the prompt and
+        the structured-output schema (~4 characters per token) plus the completion budget
+        """
+        if n_listings == 1:
+            prompt, schema = listing_prompt.format(), Listing.model_json_schema()
+        else:
+            prompt = listing_batch_prompt.format(n=n_listings, avoid="none")
+            schema = ListingBatch.model_json_schema()
+        prompt_chars = len(prompt) + len(json.dumps(schema))
+        return prompt_chars // 4 + cls.tokens_per_listing * n_listings
+
     def listings_to_documents(self, raw_listings: List[Listing]) -> List[Document]:
         """
         this method will convert generated listings from json to langchain Document
@@ -117,6 +428,25 @@ class GenerateListings:
 
         return docs
 
+    def publish(self, listings_dir: str = "./src/listings/docs") -> str:
+        """
+        Copy the finished JSONL file into `listings_dir`, the directory ChromaStore
+        indexes. The copy is written beside that directory and renamed into it, so a
+        sync never sees a half-written file. Returns the published path.
+        """
+        target = os.path.join(listings_dir, os.path.basename(self.saving_path))
+        staging = os.path.join(
+            os.path.dirname(os.path.abspath(listings_dir)),
+            f".{os.path.basename(target)}.tmp",
+        )
+        with open(self.saving_path, "rb") as src, open(staging, "wb") as dst:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(staging, target)
+        logger.info(f"📤 Published {self.saving_path} → {target}")
+        return target
+
     # ---------------------------------------------------------------------
     # Optional helper: save to JSON
     # ---------------------------------------------------------------------
@@ -124,10 +454,20 @@ class GenerateListings:
         self,
         listings: List[Listing] | List[Document],
     ):
-        """Serialize listing objects to pretty-printed JSON."""
+        """Serialize listing objects to pretty-printed JSON (or JSONL for a .jsonl path)."""
         Path(self.saving_path).parent.mkdir(parents=True, exist_ok=True)
         with open(self.saving_path, "w") as fp:
-            if listings and isinstance(listings[0], Document):
+            if self.saving_path.endswith(".jsonl"):
+                for listing in listings:
+                    if isinstance(listing, Document):
+                        record = {
+                            "page_content": listing.page_content,
+                            "metadata": listing.metadata,
+                        }
+                    else:
+                        record = listing.model_dump()
+                    fp.write(json.dumps(record) + "\n")
+            elif listings and isinstance(listings[0], Document):
                 # Handle Document objects
                 json.dump(
                     [
@@ -145,15 +485,16 @@ class GenerateListings:
 
 if __name__ == "__main__":
 
-    # instantiate the listing class
+    # instantiate the listing class; the jsonl file is written outside the indexed
+    # docs directory so that a half-finished run never becomes part of the index
     listing = GenerateListings(
-        saving_path="./src/listings/docs/listings.json",
+        saving_path="./src/listings/generated/generated_listings.jsonl",
     )
 
-    # generate 50 listings in json format
+    # generate 50 listings, appended to the jsonl file as they arrive
+    # (re-running after an interruption only generates the missing ones)
 
     # This is where your API call is happening
-    data_json = listing.generate_listings(50, listing.listing_chain())
-
-    # save the generated listings to the
-    listing.save_listings(data_json)
+    if listing.generate_to_jsonl(50, listing.listing_chain()) >= 50:
+        # complete: hand the file over to the listings index
+        listing.publish("./src/listings/docs")
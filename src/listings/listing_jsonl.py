@@ -0,0 +1,162 @@
+"""
+listing_jsonl.py
+~~~~~~~~~~~~~~~~
+Append-only JSONL storage for generated listings (one JSON object per line).
+
+• `ListingJsonlWriter` appends each listing as soon as it is generated and
+  flushes + fsyncs every `fsync_every` listings or `fsync_interval` seconds,
+  so a crash loses at most the last few listings.
+• A line cut short by a crash is dropped by the reader and truncated away
+  before the next run appends, so a run can resume from the file as it is.
+• `iter_listing_items` streams the listing dicts of a whole docs directory
+  (JSONL files line by line, JSON arrays item by item) in constant memory.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import IO, Any, Dict, Iterator, List
+
+from loguru import logger
+
+from src.llm_parsers.listing_parser import Listing
+
+
+def read_listings_jsonl(path: str) -> Iterator[Dict]:
+    """Yield the listing dicts of a JSONL file, skipping blank and truncated lines."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ skipping unreadable line {line_number} of {path}")
+
+
+def iter_json_array(f: IO[str], chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array while reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+
+    while True:
+        chunk = f.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(
+                        f"{getattr(f, 'name', 'file')} is not a JSON array"
+                    )
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # the item continues in the next chunk
+            if chunk and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                break  # e.g. a number ("1." + "5") that may continue in the next chunk
+            yield item
+            pos = end
+
+        if not chunk:
+            # the closing bracket returns above, so reaching the end means it is missing
+            raise ValueError(f"{getattr(f, 'name', 'file')}: truncated JSON array")
+
+
+def iter_listing_items(path: str) -> Iterator[Dict]:
+    """Stream the listing dicts of every .json / .jsonl file in the `path` directory."""
+    for filename in sorted(os.listdir(path)):
+        file_path = os.path.join(path, filename)
+        if filename.endswith(".jsonl"):
+            # one listing per line, as streamed out by the listing generator
+            yield from read_listings_jsonl(file_path)
+        else:
+            with open(file_path, "r") as f:
+                yield from iter_json_array(f)
+
+
+def load_listings_jsonl(path: str) -> List[Listing]:
+    return [Listing(**item) for item in read_listings_jsonl(path)]
+
+
+class ListingJsonlWriter:
+    """Durable, append-only JSONL writer for listings."""
+
+    def __init__(
+        self, path: str, fsync_every: int = 50, fsync_interval: float = 5.0
+    ) -> None:
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._drop_partial_line()
+        self._file = open(path, "a")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self.written = 0
+
+    def _drop_partial_line(self) -> None:
+        """A crash mid-write leaves a line without its newline: cut it off before appending."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            # walk back from the end, a block at a time, to the last complete line
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            f.truncate(position)
+        logger.warning(
+            f"⚠️ dropped a partially written listing at the end of {self.path}"
+        )
+
+    def write(self, listing: Listing) -> None:
+        self._file.write(json.dumps(listing.model_dump()) + "\n")
+        self.written += 1
+        self._pending += 1
+        if (
+            self._pending >= self.fsync_every
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "ListingJsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,128 @@
+"""
+form_parser.py
+~~~~~~~~~~~~~~
+Build `BuyerPreferences` locally, without an LLM call, when the query comes
+from the sidebar form: either from the structured sidebar values or from
+text that matches the sentence template the form generates.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+
+# sidebar keys that describe the home (the sidebar dict also holds the API key)
+FORM_FIELDS = (
+    "bedrooms",
+    "bathrooms",
+    "house_size",
+    "price_range",
+    "amenities",
+    "transportation",
+    "neighborhood_traits",
+    "lifestyle",
+)
+
+_FORM_QUERY = re.compile(
+    r"^Looking for a (?P<bedrooms>\d+)-bedroom, (?P<bathrooms>\d+)-bathroom home, "
+    r"around (?P<house_size>\d+) sqft, priced at (?P<price_range>.*?), "
+    r"with amenities like (?P<amenities>.*?), in a (?P<neighborhood_traits>.*?) neighborhood, "
+    r"near (?P<transportation>.*?)\. Ideal for someone with a (?P<lifestyle>.*?) lifestyle\.$"
+)
+
+
+def build_form_query(user_inputs: Dict[str, Any]) -> str:
+    """Generate the natural language query for the sidebar values."""
+    return (
+        f"Looking for a {user_inputs['bedrooms']}-bedroom, "
+        f"{user_inputs['bathrooms']}-bathroom home, "
+        f"around {user_inputs['house_size']} sqft, "
+        f"priced at {user_inputs['price_range']}, "
+        f"with amenities like {', '.join(user_inputs['amenities'])}, "
+        f"in a {', '.join(user_inputs['neighborhood_traits'])} neighborhood, "
+        f"near {', '.join(user_inputs['transportation'])}. "
+        f"Ideal for someone with a {user_inputs['lifestyle']} lifestyle."
+    )
+
+
+def preferences_from_form(user_inputs: Dict[str, Any]) -> BuyerPreferences:
+    """BuyerPreferences straight from the sidebar dict."""
+    amenities = _as_list(user_inputs.get("amenities"))
+    transportation = _as_list(user_inputs.get("transportation"))
+    traits = _as_list(user_inputs.get("neighborhood_traits"))
+    lifestyle = (user_inputs.get("lifestyle") or "").strip() or None
+    bedrooms = int(user_inputs["bedrooms"]) if user_inputs.get("bedrooms") else None
+    bathrooms = int(user_inputs["bathrooms"]) if user_inputs.get("bathrooms") else None
+    house_size = (
+        f"{int(user_inputs['house_size'])} sqft"
+        if user_inputs.get("house_size")
+        else None
+    )
+
+    # a compact sentence in the shape the LLM cleaner produces, for the vector search
+    parts = []
+    if bedrooms or bathrooms:
+        rooms = [
+            f"{bedrooms}-bedroom" if bedrooms else "",
+            f"{bathrooms}-bathroom" if bathrooms else "",
+        ]
+        parts.append(", ".join(r for r in rooms if r) + " home")
+    else:
+        parts.append("Home")
+    if house_size:
+        parts.append(f"around {house_size}")
+    if amenities:
+        parts.append(f"with {', '.join(a.lower() for a in amenities)}")
+    if traits:
+        parts.append(f"in a {', '.join(t.lower() for t in traits)} neighborhood")
+    if transportation:
+        parts.append(f"near {', '.join(t.lower() for t in transportation)}")
+    if lifestyle:
+        parts.append(f"suited to {lifestyle.lower()}")
+
+    return BuyerPreferences(
+        bedrooms=bedrooms,
+        bathrooms=bathrooms,
+        house_size=house_size,
+        amenities=amenities or None,
+        transportation=transportation or None,
+        neighborhood_traits=traits or None,
+        price_range=(user_inputs.get("price_range") or "").strip() or None,
+        lifestyle=lifestyle,
+        query=" ".join(parts) + ".",
+    )
+
+
+def preferences_from_template(text: str) -> Optional[BuyerPreferences]:
+    """BuyerPreferences from text generated by `build_form_query`, else None."""
+    match = _FORM_QUERY.match(text.strip())
+    if match is None:
+        return None
+
+    fields = match.groupdict()
+    for name in ("amenities", "transportation", "neighborhood_traits"):
+        fields[name] = [item for item in fields[name].split(", ") if item.strip()]
+    return preferences_from_form(fields)
+
+
+def local_preferences(inputs: Dict[str, Any]) -> Optional[BuyerPreferences]:
+    """
+    Preferences that can be built without the cleaning LLM: from the structured
+    `form` values when present, or from a query that matches the form template.
+    """
+    if inputs.get("form"):
+        return preferences_from_form(inputs["form"])
+    raw_query = inputs.get("raw_query")
+    if isinstance(raw_query, str):
+        return preferences_from_template(raw_query)
+    return None
+
+
+def _as_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return [str(item).strip() for item in value if str(item).strip()]
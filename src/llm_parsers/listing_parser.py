@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
@@ -14,3 +16,10 @@ class Listing(BaseModel):
     neighborhood_description: str = Field(
         ..., description="3–4 sentences describing the neighborhood"
     )
+
+
+# wrapper to generate several listings in a single llm call
+class ListingBatch(BaseModel):
+    listings: List[Listing] = Field(
+        ..., description="The generated listings, each in a different neighborhood"
+    )
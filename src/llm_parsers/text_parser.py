@@ -0,0 +1,125 @@
+"""
+text_parser.py
+~~~~~~~~~~~~~~
+Build `BuyerPreferences` from a free-form buyer query without an LLM call,
+for the "local-clean" pipeline mode.
+
+• Rooms, living area and budget are read with regexes ("3-bedroom",
+  "2 baths", "2,000 sqft", "under $600k", "$400k-$550k", "budget of 700k").
+• Amenities, transportation, neighborhood traits and lifestyle are matched
+  against a small vocabulary (the sidebar options plus common synonyms) and
+  reported with their canonical names.
+• The vector search query is the buyer's own text, whitespace-normalized:
+  unlike the LLM summary it keeps every descriptor, at no extra cost.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+
+_BEDROOMS = re.compile(r"\b(\d+)\s*-?\s*(?:bed(?:room)?s?|br|bd)\b", re.IGNORECASE)
+_BATHROOMS = re.compile(r"\b(\d+)\s*-?\s*(?:bath(?:room)?s?|ba)\b", re.IGNORECASE)
+_SIZE = re.compile(
+    r"\b(\d+(?:,\d{3})*)\s*(?:sq\.?\s*ft\.?|sqft|square\s+feet|sf)\b", re.IGNORECASE
+)
+_AMOUNT = r"\$?\s*\d+(?:,\d{3})*(?:\.\d+)?\s*(?:k|m|mm|million|thousand)?(?![a-z])"
+_PRICE = re.compile(
+    r"(?:(?:under|below|less than|up to|no more than|max(?:imum)?|at most|"
+    r"over|above|at least|min(?:imum)?|more than|from|around|about|between)\s+)?"
+    rf"(?:{_AMOUNT}\s*(?:-|–|to|and)\s*)?{_AMOUNT}",
+    re.IGNORECASE,
+)
+# an amount is a budget when it has a currency sign or a k / m suffix,
+# or follows one of these words
+_BUDGET_WORDS = re.compile(
+    r"\b(?:budget|price[ds]?|priced|afford|spend|cost)\b", re.IGNORECASE
+)
+
+# canonical name → phrases that mean it
+AMENITIES: Dict[str, Tuple[str, ...]] = {
+    "backyard": ("backyard", "back yard", "yard"),
+    "solar panels": ("solar",),
+    "pool": ("pool",),
+    "garage": ("garage",),
+    "fireplace": ("fireplace",),
+    "energy-efficient appliances": ("energy-efficient", "energy efficient"),
+    "garden": ("garden",),
+    "home office": ("home office", "office", "study"),
+    "modern kitchen": ("modern kitchen", "updated kitchen", "chef's kitchen"),
+    "balcony": ("balcony", "terrace"),
+}
+TRANSPORTATION: Dict[str, Tuple[str, ...]] = {
+    "public transit": ("public transit", "transit", "bus", "subway", "metro"),
+    "bike paths": ("bike path", "bike lane", "cycling", "bikeable"),
+    "highway access": ("highway", "freeway"),
+    "train station": ("train", "rail"),
+    "walk to work": ("walk to work", "walking distance"),
+}
+NEIGHBORHOOD_TRAITS: Dict[str, Tuple[str, ...]] = {
+    "quiet": ("quiet", "peaceful", "calm"),
+    "family-friendly": ("family-friendly", "family friendly", "good schools"),
+    "walkable": ("walkable", "pedestrian"),
+    "river view": ("river view", "riverside", "waterfront"),
+    "downtown": ("downtown", "city center", "city centre"),
+    "vibrant": ("vibrant", "lively"),
+    "green": ("green", "leafy", "parks"),
+    "safe": ("safe",),
+}
+LIFESTYLES: Dict[str, Tuple[str, ...]] = {
+    "remote work": ("remote work", "work from home", "working from home", "wfh"),
+    "young family": ("young family", "kids", "children"),
+    "retirement": ("retirement", "retired", "retiree"),
+    "outdoor enthusiast": ("outdoor", "hiking"),
+}
+
+
+def preferences_from_text(text: str) -> BuyerPreferences:
+    """BuyerPreferences extracted from free text with regexes and a vocabulary."""
+    bedrooms = _BEDROOMS.search(text)
+    bathrooms = _BATHROOMS.search(text)
+    size = _SIZE.search(text)
+    lifestyles = _vocabulary_matches(text, LIFESTYLES)
+
+    return BuyerPreferences(
+        bedrooms=int(bedrooms.group(1)) if bedrooms else None,
+        bathrooms=int(bathrooms.group(1)) if bathrooms else None,
+        house_size=f"{size.group(1).replace(',', '')} sqft" if size else None,
+        amenities=_vocabulary_matches(text, AMENITIES) or None,
+        transportation=_vocabulary_matches(text, TRANSPORTATION) or None,
+        neighborhood_traits=_vocabulary_matches(text, NEIGHBORHOOD_TRAITS) or None,
+        price_range=_price_range(text),
+        lifestyle=", ".join(lifestyles) or None,
+        query=" ".join(text.split()),
+    )
+
+
+def _price_range(text: str) -> Optional[str]:
+    # sizes are amounts too: blank them out first
+    text = _SIZE.sub(" ", text)
+    for match in _PRICE.finditer(text):
+        phrase = match.group(0).strip()
+        if _BEDROOMS.match(text, match.start()) or _BATHROOMS.match(
+            text, match.start()
+        ):
+            continue
+        before = text[max(0, match.start() - 30) : match.start()]
+        if (
+            "$" in phrase
+            or re.search(r"\d\s*(?:k|m|mm|million|thousand)$", phrase, re.I)
+            or _BUDGET_WORDS.search(before)
+        ):
+            return phrase
+    return None
+
+
+def _vocabulary_matches(text: str, vocabulary: Dict[str, Tuple[str, ...]]) -> List[str]:
+    """Canonical names whose phrases occur in `text`, in vocabulary order."""
+    lowered = text.lower()
+    return [
+        name
+        for name, phrases in vocabulary.items()
+        if any(re.search(rf"\b{re.escape(p)}(?:e?s)?\b", lowered) for p in phrases)
+    ]
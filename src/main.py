@@ -13,7 +13,6 @@ from __future__ import annotations
 import streamlit as st
 from loguru import logger
 
-from src.frontend.streamlit.load_streamlit_ui import ui
 from src.llms.groqllm import GroqLLM
 from src.frontend.streamlit.display_streamlit import HomeMatchDisplay
 
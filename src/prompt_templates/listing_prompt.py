@@ -8,3 +8,15 @@ listing_prompt = PromptTemplate(
         "• Keep data plausible and coherent.\n\n"
     ),
 )
+
+listing_batch_prompt = PromptTemplate(
+    template=(
+        "You are an expert real-estate copywriter.\n\n"
+        "Generate exactly {n} **fictional but realistic** property listings that follow this brief:\n"
+        "• Every listing must describe a different neighborhood.\n"
+        "• Do not reuse these neighborhoods: {avoid}.\n"
+        "• Vary prices, sizes and styles across the listings.\n"
+        "• Keep data plausible and coherent.\n\n"
+    ),
+    input_variables=["n", "avoid"],
+)
@@ -1,5 +1,10 @@
 from langchain.prompts import ChatPromptTemplate
 
+# how the compact context builder renders each listing (a partial of the rag prompt
+# when RAG_CONTEXT_TOKEN_BUDGET > 0; the full listing texts need no explanation)
+compact_context_format = """Each listing starts with a line "[number] price | bedrooms (bd) | bathrooms (ba) | size | neighborhood", followed by an excerpt of its description.
+
+"""
 
 # defining the rag prompt template
 rag_prompt = ChatPromptTemplate.from_messages(
@@ -19,9 +24,9 @@ Your task:
 
 Only use information found in the listings. Do not invent properties or add extra features.
 
-"Listings:\n{context}",
+{context_format}"Listings:\n{context}",
 """,
         ),
         ("human", "{input}"),
     ]
-)
+).partial(context_format="")
@@ -0,0 +1,62 @@
+"""
+conftest.py
+~~~~~~~~~~~
+Offline defaults for the test suite: a placeholder GROQ key (no call ever
+reaches the provider), the deterministic hashing embeddings and a throwaway
+embedding cache. Set before `src.config` is imported by any test module.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_CACHE_DIR = tempfile.mkdtemp(prefix="homematch-tests-")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ["EMBEDDING_BACKEND"] = "hashing"
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_CACHE_DIR, "embeddings.sqlite3")
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+LISTINGS_JSON = os.path.join(
+    os.path.dirname(__file__), "..", "listings", "docs", "listings.json"
+)
+
+
+@pytest.fixture
+def sample_listings():
+    """The sample listings, as the dicts stored in listings.json."""
+    with open(LISTINGS_JSON) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def listings_dir(tmp_path):
+    """A docs directory holding a copy of the sample listings."""
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    shutil.copy(LISTINGS_JSON, docs / "listings.json")
+    return str(docs)
+
+
+@pytest.fixture
+def store_dirs(listings_dir, tmp_path, monkeypatch):
+    """Point ChromaStore at temporary listings and index directories."""
+    from src.tools.chromadb.chroma_store import ChromaStore
+
+    monkeypatch.setattr(ChromaStore, "listings_dir", listings_dir)
+    monkeypatch.setattr(ChromaStore, "persist_dir", str(tmp_path / "index"))
+    return ChromaStore
+
+
+@pytest.fixture
+def recorded_spans(monkeypatch):
+    """An InMemorySink attached to the process-wide tracer for one test."""
+    from src.tools.tracing.metrics_sinks import InMemorySink
+    from src.tools.tracing.spans import tracer
+
+    sink = InMemorySink()
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "sinks", [*tracer.sinks, sink])
+    return sink
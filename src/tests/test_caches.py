@@ -0,0 +1,121 @@
+import time
+from typing import List
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from src.tools.cache.semantic_cache import SemanticAnswerCache
+from src.tools.embeddings.cached_embeddings import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Fake embeddings that record every text the model actually embeds."""
+
+    def __init__(self) -> None:
+        self.model = DeterministicFakeEmbedding(size=32)
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return self.model.embed_query(text)
+
+
+@pytest.fixture
+def cached(tmp_path):
+    def make(**kwargs):
+        model = CountingEmbeddings()
+        cache = CachedEmbeddings(
+            model, "counting", str(tmp_path / "cache.sqlite3"), **kwargs
+        )
+        return model, cache
+
+    return make
+
+
+def test_each_distinct_text_is_embedded_once(cached):
+    model, cache = cached()
+    first = cache.embed_documents(["a quiet house", "a pool", "a  quiet house"])
+    assert model.embedded == ["a quiet house", "a pool"]
+    assert first[0] == first[2]
+
+    assert cache.embed_query("a pool") == first[1]
+    assert cache.embed_documents(["a pool", "a quiet house"]) == first[1::-1]
+    assert len(model.embedded) == 2
+    assert cache.stats()["memory_hits"] >= 3
+
+
+def test_vectors_survive_a_restart(cached):
+    _, cache = cached()
+    vector = cache.embed_query("garden and garage")
+
+    model, reopened = cached()
+    assert reopened.embed_query("garden and garage") == pytest.approx(vector)
+    assert model.embedded == []
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_lookup_and_put(cached):
+    model, cache = cached()
+    assert cache.lookup(["one", "two"]) == [None, None]
+    cache.put(["one"], [[1.0, 0.0]])
+    assert cache.lookup(["one", "two"]) == [[1.0, 0.0], None]
+    assert model.embedded == []
+
+
+def test_memory_lru_and_disk_budget(cached):
+    _, cache = cached(lru_size=2, max_bytes=3 * 32 * 4)
+    for text in ["one", "two", "three", "four", "five"]:
+        cache.embed_query(text)
+    assert len(cache._lru) == 2
+    assert cache.stats()["disk_bytes"] <= 3 * 32 * 4
+    # the oldest rows were evicted from the file, the newest are still there
+    cache._lru.clear()
+    assert cache.lookup(["one"]) == [None]
+    assert cache.lookup(["five"])[0] is not None
+
+
+def test_models_do_not_share_keys(cached):
+    _, cache = cached()
+    other = CachedEmbeddings(
+        DeterministicFakeEmbedding(size=32), "other", cache.cache_path
+    )
+    assert cache.cache_key("x") != other.cache_key("x")
+
+
+def test_answer_cache_hits_within_the_threshold():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store([1.0, 0.0], "key", {"answer": "A"}, latency=2.0, index_version="v1")
+
+    assert cache.lookup([1.0, 0.05], "key", "v1") == {"answer": "A"}
+    assert cache.lookup([0.6, 0.8], "key", "v1") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.stats()["latency_saved_seconds"] == 2.0
+
+
+def test_answer_cache_keys_and_index_version():
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], ("model", "full"), {"answer": "A"}, 1.0, "v1")
+    assert cache.lookup([1.0, 0.0], ("model", "direct"), "v1") is None
+    assert cache.lookup([1.0, 0.0], ("model", "full"), "v1") == {"answer": "A"}
+
+    # a new listing index clears every answer
+    assert cache.lookup([1.0, 0.0], ("model", "full"), "v2") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answer_cache_ttl_and_lru():
+    cache = SemanticAnswerCache(ttl_seconds=0.2, max_entries=2)
+    cache.store([1.0, 0.0, 0.0], "k", {"answer": "x"}, 1.0, "v")
+    cache.store([0.0, 1.0, 0.0], "k", {"answer": "y"}, 1.0, "v")
+    cache.lookup([1.0, 0.0, 0.0], "k", "v")  # x is now the most recently used
+    cache.store([0.0, 0.0, 1.0], "k", {"answer": "z"}, 1.0, "v")
+    assert cache.lookup([0.0, 1.0, 0.0], "k", "v") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "k", "v") == {"answer": "x"}
+
+    time.sleep(0.25)
+    assert cache.lookup([0.0, 0.0, 1.0], "k", "v") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from src.config import settings
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", request.param)
+    return request.param
+
+
+def _write_listings(listings_dir, listings):
+    path = os.path.join(listings_dir, "listings.json")
+    with open(path, "w") as f:
+        json.dump(listings, f)
+    # bump the mtime explicitly: two writes can land within the same timestamp tick
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_sync_embeds_only_what_changed(
+    store_dirs, listings_dir, sample_listings, backend, monkeypatch
+):
+    embedded = []
+    model = store_dirs.embedding_model
+    original = model.embed_documents
+    monkeypatch.setattr(
+        model,
+        "embed_documents",
+        lambda texts: embedded.append(len(texts)) or original(texts),
+    )
+
+    store = store_dirs()
+    version = store.sync_index(listings_dir)
+    assert sum(embedded) == len(sample_listings)
+    assert store.open_vector_store().count() == len(sample_listings)
+
+    # unchanged files: nothing is read or embedded, same version
+    assert store.sync_index(listings_dir) == version
+    assert sum(embedded) == len(sample_listings)
+
+    # one listing edited, one removed
+    changed = [dict(sample_listings[0], price=123_456)] + sample_listings[2:]
+    _write_listings(listings_dir, changed)
+    embedded.clear()
+    assert store.sync_index(listings_dir) != version
+    assert sum(embedded) == 1
+    assert store.open_vector_store().count() == len(changed)
+    assert len(store.listing_table) == len(changed)
+    assert len(store.lexical_index) == len(changed)
+
+
+def test_store_reloads_after_an_external_resync(
+    store_dirs, listings_dir, sample_listings, backend
+):
+    serving = store_dirs()
+    serving.build_retriever()
+    assert len(serving.listing_table) == len(sample_listings)
+
+    # another store (e.g. another process) syncs a smaller listing set
+    _write_listings(listings_dir, sample_listings[:10])
+    store_dirs().sync_index(listings_dir)
+
+    serving.sync_index(listings_dir)
+    assert len(serving.listing_table) == 10
+    assert len(serving.lexical_index) == 10
+    assert serving.open_vector_store().count() == 10
+
+
+def test_current_index_version_matches_sync(store_dirs, listings_dir, backend):
+    store = store_dirs()
+    assert store.current_index_version() == store.sync_index(listings_dir)
@@ -0,0 +1,90 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.tools.context.context_builder import build_context, excerpt, listing_line
+from src.tools.tracing.spans import estimate_tokens
+
+
+@pytest.fixture
+def docs(sample_listings):
+    return [
+        Document(
+            page_content=f"{listing['description']} {listing['neighborhood_description']}",
+            metadata={
+                "price": listing["price"],
+                "bedrooms": listing["bedrooms"],
+                "bathrooms": listing["bathrooms"],
+                "house_size": listing["house_size"],
+                "neighborhood": listing["neighborhood"],
+            },
+        )
+        for listing in sample_listings[:5]
+    ]
+
+
+def test_listing_line():
+    line = listing_line(
+        2,
+        {
+            "price": 600000,
+            "bedrooms": 3,
+            "bathrooms": 2,
+            "house_size_sqft": 2000,
+            "neighborhood": "Maple Heights",
+        },
+    )
+    assert line == "[2] $600,000 | 3 bd | 2 ba | 2,000 sqft | Maple Heights"
+    assert listing_line(1, {"house_size": "900 sqft"}) == "[1] 900 sqft"
+
+
+@pytest.mark.parametrize("budget", [60, 150, 600])
+def test_context_stays_within_the_budget(docs, budget):
+    context, stats = build_context(
+        docs, "quiet house with a garden", token_budget=budget
+    )
+    assert stats.tokens <= budget
+    assert stats.tokens == estimate_tokens(context)
+    assert stats.saved_tokens == stats.full_tokens - stats.tokens
+    assert stats.listings + stats.dropped == len(docs)
+
+
+def test_listings_keep_the_retrieval_order(docs):
+    context, stats = build_context(docs, "family home", token_budget=600)
+    assert stats.dropped == 0
+    positions = [context.index(f"[{i}] ") for i in range(1, len(docs) + 1)]
+    assert positions == sorted(positions)
+    assert docs[0].metadata["neighborhood"] in context.split("\n\n")[0]
+
+
+def test_last_listings_are_dropped_when_the_lines_do_not_fit(docs):
+    one_line = estimate_tokens(listing_line(1, docs[0].metadata)) + 1
+    context, stats = build_context(docs, "garden", token_budget=2 * one_line + 1)
+    assert stats.listings == 2 and stats.dropped == len(docs) - 2
+    assert "[3] " not in context
+
+
+def test_excerpt_prefers_sentences_sharing_query_terms():
+    text = (
+        "A bright apartment downtown. The kitchen was renovated last year. "
+        "A private garden with a pool sits behind the house. Parking is on the street."
+    )
+    short = excerpt(text, {"garden", "pool"}, budget=15)
+    assert "garden" in short
+    assert estimate_tokens(short) <= 15
+    assert excerpt(text, {"garden"}, budget=1000) == text
+    assert excerpt(text, {"garden"}, budget=0) == ""
+
+
+def test_excerpt_cuts_a_long_sentence_at_a_word_boundary():
+    text = "word " * 200 + "end. " + "other " * 100 + "end."
+    cut = excerpt(text, {"word"}, budget=10)
+    assert cut.startswith("word") and cut.endswith(" …")
+    assert estimate_tokens(cut) <= 10
+
+
+def test_amenities_count_as_query_terms(docs):
+    preferences = BuyerPreferences(query="a home", amenities=["solar panels"])
+    with_amenities, _ = build_context(docs, "a home", preferences, token_budget=120)
+    without, _ = build_context(docs, "a home", token_budget=120)
+    assert with_amenities.lower().count("solar") >= without.lower().count("solar")
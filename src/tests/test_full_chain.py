@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from src.benchmarks.stub_llm import StubChatModel
+from src.chains.full_chain import HomeMatch
+from src.config import settings
+from src.tools.cache.semantic_cache import SemanticAnswerCache
+
+QUERY = (
+    "I'd like a 4-bedroom house with a backyard in a family-friendly area, under $600k"
+)
+
+
+@pytest.fixture
+def offline(store_dirs, monkeypatch):
+    """HomeMatch settings for an offline run on the sample listings."""
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "dense")
+    monkeypatch.setattr(settings, "RERANK_ENABLED", False)
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL", False)
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(HomeMatch, "answer_cache", SemanticAnswerCache())
+
+
+def _home_match(mode):
+    return HomeMatch(StubChatModel(latency=0, answer_words=8), mode=mode)
+
+
+def _end_to_end(spans):
+    return [span for span in spans.spans if span.name == "end_to_end"][-1]
+
+
+@pytest.mark.parametrize(
+    "mode, llm_calls", [("full", 2), ("direct", 1), ("local-clean", 1)]
+)
+def test_pipeline_modes(offline, recorded_spans, mode, llm_calls):
+    result = _home_match(mode).invoke_full_chain(QUERY)
+
+    assert len(result["context"]) == 5
+    assert result["answer"]
+    assert _end_to_end(recorded_spans).counts["llm_calls"] == llm_calls
+    if mode != "direct":
+        assert result["preferences"].bedrooms == 4
+
+
+def test_stream_yields_context_before_the_answer(offline):
+    chunks = list(_home_match("full").stream_full_chain(QUERY))
+    keys = [next(iter(chunk)) for chunk in chunks if len(chunk) == 1]
+    assert keys.index("context") < keys.index("answer")
+    assert "".join(c["answer"] for c in chunks if "answer" in c)
+
+
+def test_closing_the_stream_early_ends_its_trace(offline, recorded_spans):
+    stream = _home_match("full").stream_full_chain(QUERY)
+    assert "context" in next(chunk for chunk in stream if "context" in chunk)
+    stream.close()
+
+    # the trace is recorded when the stream is closed, not left open
+    assert _end_to_end(recorded_spans).counts["documents"] == 5
+
+
+def test_answer_cache_is_keyed_by_mode(offline, monkeypatch):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    cache = HomeMatch.answer_cache
+
+    full = _home_match("full")
+    first = full.invoke_full_chain(QUERY)
+    assert full.invoke_full_chain(QUERY)["answer"] == first["answer"]
+    assert cache.stats()["hits"] == 1
+
+    # the same cleaned query in another mode is not served the "full" answer
+    _home_match("local-clean").invoke_full_chain(QUERY)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_answer_cache_misses_after_a_listing_file_changes(
+    offline, monkeypatch, listings_dir, sample_listings
+):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    cache = HomeMatch.answer_cache
+    home_match = _home_match("full")
+    home_match.invoke_full_chain(QUERY)
+
+    # the listings change between two identical queries, with no sync in between
+    path = os.path.join(listings_dir, "listings.json")
+    with open(path, "w") as f:
+        json.dump([dict(sample_listings[0], price=99_000)] + sample_listings[1:], f)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    home_match.invoke_full_chain(QUERY)
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 2
+
+    # the answer stored after the miss is served for the new listings
+    home_match.invoke_full_chain(QUERY)
+    assert cache.stats()["hits"] == 1
+
+
+def test_speculative_search_is_reused(offline, monkeypatch, recorded_spans):
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL", True)
+    # the hashing embeddings score a raw query and its cleaned summary ~0.5-0.6
+    monkeypatch.setattr(settings, "SPECULATIVE_REUSE_SIMILARITY", 0.4)
+
+    result = _home_match("full").invoke_full_chain(QUERY)
+
+    assert len(result["context"]) == 5
+    assert [s.name for s in recorded_spans.spans].count("speculative_search") == 1
+    search = [s for s in recorded_spans.spans if s.name == "vector_search"][-1]
+    assert search.counts["reused_speculation"] == 1
+    assert search.counts["searches"] == 0
+
+
+def test_speculation_shares_one_retriever(offline, monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL", True)
+    home_match = _home_match("full")
+    builds = []
+    build_retriever = home_match.rag.chroma_store.build_retriever
+    monkeypatch.setattr(
+        home_match.rag.chroma_store,
+        "build_retriever",
+        lambda: builds.append(1) or build_retriever(),
+    )
+
+    home_match.invoke_full_chain(QUERY)
+    list(home_match.stream_full_chain(QUERY))
+    assert len(builds) == 2
+
+
+def test_no_speculation_in_hybrid_mode(offline, monkeypatch, recorded_spans):
+    monkeypatch.setattr(settings, "SPECULATIVE_RETRIEVAL", True)
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "hybrid")
+
+    _home_match("full").invoke_full_chain(QUERY)
+
+    assert "speculative_search" not in [s.name for s in recorded_spans.spans]
+
+
+def test_abatch_keeps_order_and_returns_exceptions(offline):
+    home_match = _home_match("local-clean")
+    queries = [QUERY, {"form": None}, "a quiet 4-bedroom home with a garden"]
+
+    results = asyncio.run(
+        home_match.abatch(queries, max_concurrency=2, return_exceptions=True)
+    )
+
+    assert len(results) == 3
+    assert isinstance(results[1], Exception)
+    assert results[0]["input"] != results[2]["input"]
+    assert all(len(result["context"]) == 5 for result in (results[0], results[2]))
+
+    with pytest.raises(Exception):
+        asyncio.run(home_match.abatch(queries))
@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+import json
+import random
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src.listings.generate_listings import GenerateListings
+from src.listings.listing_jsonl import read_listings_jsonl
+from src.llm_parsers.listing_parser import Listing
+from src.tools.dedup.near_duplicates import NearDuplicateIndex
+from src.tools.rate_limit.rate_limiter import RateLimiter
+
+_WORDS = (
+    "sunlit airy cozy renovated spacious charming elegant rustic modern quiet "
+    "vaulted hardwood granite marble skylight patio orchard creek hillside loft "
+    "porch library cellar studio workshop greenhouse veranda atrium courtyard"
+).split()
+
+
+def _unlimited():
+    return RateLimiter(requests_per_minute=10**6, tokens_per_minute=10**9)
+
+
+def _listing(i):
+    rng = random.Random(i)
+    return {
+        "neighborhood": f"Neighborhood {i}",
+        "price": 400_000 + i,
+        "bedrooms": 3,
+        "bathrooms": 2,
+        "house_size": "1800 sqft",
+        "description": " ".join(rng.sample(_WORDS, 20)) + f" listing {i}.",
+        "neighborhood_description": "A calm place.",
+    }
+
+
+def _chain(start=0):
+    """A listing chain that returns a new listing on every call."""
+    counter = itertools.count(start)
+
+    async def generate(_inputs):
+        return Listing.model_validate(_listing(next(counter)))
+
+    return RunnableLambda(lambda _: None, afunc=generate)
+
+
+def test_generate_listings_concurrently():
+    generator = GenerateListings("unused.jsonl")
+    listings = generator.generate_listings(
+        6, _chain(), max_concurrency=3, limiter=_unlimited()
+    )
+    assert len(listings) == 6
+    assert len({listing.neighborhood for listing in listings}) == 6
+
+
+def test_duplicates_are_rejected_and_regenerated():
+    repeated = itertools.cycle([0, 0, 1, 1, 2])
+
+    async def generate(_inputs):
+        return Listing.model_validate(_listing(next(repeated)))
+
+    chain = RunnableLambda(lambda _: None, afunc=generate)
+    listings = GenerateListings("unused.jsonl").generate_listings(
+        3, chain, max_concurrency=1, limiter=_unlimited()
+    )
+    assert sorted(listing.neighborhood for listing in listings) == [
+        "Neighborhood 0",
+        "Neighborhood 1",
+        "Neighborhood 2",
+    ]
+
+
+def test_surplus_batch_items_are_not_indexed():
+    async def generate(_inputs):
+        return {"listings": [_listing(i) for i in range(4)]}
+
+    chain = RunnableLambda(lambda _: None, afunc=generate)
+    dedup_index = NearDuplicateIndex()
+    listings = GenerateListings("unused.jsonl").generate_listings(
+        2, chain, batch_size=2, dedup_index=dedup_index, limiter=_unlimited()
+    )
+    assert len(listings) == 2
+    # the two surplus listings can still be generated later
+    assert len(dedup_index) == 2
+
+
+def test_generate_to_jsonl_resumes(tmp_path):
+    path = str(tmp_path / "generated.jsonl")
+    generator = GenerateListings(path)
+    assert (
+        generator.generate_to_jsonl(3, _chain(), corpus_dir=None, limiter=_unlimited())
+        == 3
+    )
+
+    # an interrupted run leaves a truncated last line behind
+    with open(path, "a") as f:
+        f.write('{"neighborhood": "Half')
+    assert (
+        generator.generate_to_jsonl(
+            5, _chain(100), corpus_dir=None, limiter=_unlimited()
+        )
+        == 5
+    )
+
+    rows = list(read_listings_jsonl(path))
+    assert len(rows) == 5
+    assert [row["neighborhood"] for row in rows[:3]] == [
+        f"Neighborhood {i}" for i in range(3)
+    ]
+    # already complete: no call at all
+    assert generator.generate_to_jsonl(5, None, corpus_dir=None) == 5
+
+
+def test_generate_to_jsonl_stays_apart_from_the_corpus(tmp_path):
+    corpus = tmp_path / "docs"
+    corpus.mkdir()
+    (corpus / "listings.json").write_text(json.dumps([_listing(0), _listing(1)]))
+
+    path = str(tmp_path / "generated.jsonl")
+    total = GenerateListings(path).generate_to_jsonl(
+        2, _chain(), corpus_dir=str(corpus), limiter=_unlimited(), max_concurrency=1
+    )
+    assert total == 2
+    assert [row["neighborhood"] for row in read_listings_jsonl(path)] == [
+        "Neighborhood 2",
+        "Neighborhood 3",
+    ]
+
+
+def test_publish_replaces_the_indexed_file(tmp_path):
+    path = tmp_path / "generated" / "generated_listings.jsonl"
+    path.parent.mkdir()
+    path.write_text(json.dumps(_listing(0)) + "\n")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+
+    target = GenerateListings(str(path)).publish(str(docs))
+    assert target == str(docs / "generated_listings.jsonl")
+    assert list(read_listings_jsonl(target))[0]["neighborhood"] == "Neighborhood 0"
+    assert sorted(p.name for p in docs.iterdir()) == ["generated_listings.jsonl"]
+
+
+def test_sync_entry_points_refuse_a_running_loop():
+    generator = GenerateListings("unused.jsonl")
+
+    async def main():
+        with pytest.raises(RuntimeError, match="agenerate_listings"):
+            generator.generate_listings(1, _chain(), limiter=_unlimited())
+        # the async version is the way to call it from here
+        return await generator.agenerate_listings(1, _chain(), limiter=_unlimited())
+
+    assert len(asyncio.run(main())) == 1
+
+
+def test_pause_is_deprecated():
+    generator = GenerateListings("unused.jsonl")
+    with pytest.warns(DeprecationWarning, match="pause"):
+        listings = generator.generate_listings(
+            1, _chain(), pause=2.0, limiter=_unlimited()
+        )
+    assert len(listings) == 1
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+def test_rate_limited_calls_are_retried():
+    calls = []
+
+    async def generate(_inputs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise _RateLimited()
+        return Listing.model_validate(_listing(len(calls)))
+
+    limiter = _unlimited()
+    chain = RunnableLambda(lambda _: None, afunc=generate)
+    listings = GenerateListings("unused.jsonl").generate_listings(
+        1, chain, limiter=limiter
+    )
+    assert len(listings) == 1 and len(calls) == 2
+    assert limiter.rate_limited == 1
+
+
+def test_validate_batch():
+    produced = [Listing.model_validate(_listing(0))]
+    raw = {
+        "listings": [
+            _listing(1),
+            {"neighborhood": "Broken"},  # missing fields
+            dict(_listing(2), neighborhood="neighborhood 1 "),  # repeated in the batch
+            _listing(0),  # already produced
+            _listing(3),
+        ]
+    }
+    valid, dropped = GenerateListings.validate_batch(raw, produced)
+    assert [listing.neighborhood for listing in valid] == [
+        "Neighborhood 1",
+        "Neighborhood 3",
+    ]
+    assert dropped == 3
+    assert GenerateListings.validate_batch("not json") == ([], 0)
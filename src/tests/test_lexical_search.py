@@ -0,0 +1,69 @@
+import hashlib
+
+from src.tools.columnar.listing_table import ListingTable
+from src.tools.lexical.bm25_index import BM25Index, tokenize
+from src.tools.retrievers.rank_fusion import reciprocal_rank_fusion
+
+
+def _index():
+    index = BM25Index()
+    index.add("pool", "A sunny house with a large pool and solar panels.")
+    index.add("garden", "Cottage with a garden, solar lights and a panel fence.")
+    index.add("loft", "Downtown loft close to the train station.")
+    return index
+
+
+def test_tokenize_adds_bigrams_and_drops_stopwords():
+    assert tokenize("The solar panels") == ["solar", "panels", "solar_panels"]
+
+
+def test_phrase_outranks_scattered_words():
+    hits = _index().search("solar panels", k=3)
+    assert [doc_id for doc_id, _ in hits][:2] == ["pool", "garden"]
+    assert hits[0][1] > hits[1][1]
+
+
+def test_allowed_ids_restrict_the_search():
+    hits = _index().search("solar", k=3, allowed_ids=["garden", "loft"])
+    assert [doc_id for doc_id, _ in hits] == ["garden"]
+
+
+def test_table_hex_ids_line_up_with_rows():
+    hashes = [hashlib.sha256(name.encode()).hexdigest() for name in "abc"]
+    table = ListingTable.from_metadata([{"content_hash": h} for h in hashes])
+
+    assert table.hex_ids[[2, 0]].tolist() == [hashes[2], hashes[0]]
+    assert [table.id_at(row) for row in range(3)] == table.hex_ids.tolist()
+    assert table.rows_for_ids([hashes[1], "unknown"]).tolist() == [1]
+
+
+def test_remove_and_re_add():
+    index = _index()
+    index.remove("pool")
+    assert "pool" not in index and len(index) == 2
+    assert all(doc_id != "pool" for doc_id, _ in index.search("pool solar", k=5))
+    assert "pool" not in {d for docs in index.postings.values() for d in docs}
+
+    index.add("loft", "Loft with a rooftop pool")  # replaces the old text
+    assert [doc_id for doc_id, _ in index.search("train", k=5)] == []
+    assert index.search("rooftop pool", k=1)[0][0] == "loft"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index()
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert loaded.search("garden fence", k=3) == index.search("garden fence", k=3)
+    loaded.remove("garden")  # doc_terms were rebuilt on load
+    assert "garden" not in loaded
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+    # b is the only listing both rankers found
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d", "e"}
+    assert fused.index("a") < fused.index("c")
+    assert reciprocal_rank_fusion([["x", "y"]]) == ["x", "y"]
@@ -0,0 +1,89 @@
+import pytest
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.tools.filters.listing_filter import (
+    ListingFilter,
+    parse_amounts,
+    parse_price_range,
+    parse_sqft,
+    relaxation_ladder,
+)
+
+
+@pytest.mark.parametrize(
+    "text, amounts",
+    [
+        ("$600k", [600_000]),
+        ("$1.2m", [1_200_000]),
+        ("2-3k", [2_000, 3_000]),
+        ("600-700k", [600_000, 700_000]),
+        ("1.5-2m", [1_500_000, 2_000_000]),
+        ("5 to 6k", [5_000, 6_000]),
+        ("$2-$3M", [2_000_000, 3_000_000]),
+        ("between 2 and 3 million", [2_000_000, 3_000_000]),
+        ("$400k-$550k", [400_000, 550_000]),
+        ("500000-700k", [500_000, 700_000]),
+        ("2 bed, under 600k", [2, 600_000]),
+        ("2,150 sqft", [2_150]),
+        ("", []),
+        (None, []),
+    ],
+)
+def test_parse_amounts(text, amounts):
+    assert parse_amounts(text) == amounts
+
+
+def test_parse_price_range_reads_floors_and_ceilings():
+    assert parse_price_range("under $600k") == (None, 600_000)
+    assert parse_price_range("at least $400k") == (400_000, None)
+    assert parse_price_range("$550k-$400k") == (400_000, 550_000)
+    assert parse_price_range("no idea") == (None, None)
+    assert parse_sqft("about 2,000 sqft") == 2_000
+
+
+def test_relaxation_ladder_loosens_step_by_step(sample_listings):
+    prefs = BuyerPreferences(
+        bedrooms=3,
+        bathrooms=2,
+        house_size="2000 sqft",
+        price_range="$600k",
+        query="family home",
+    )
+    ladder = relaxation_ladder(prefs)
+
+    assert ladder[0] == ListingFilter(
+        max_price=630_000,
+        min_bedrooms=3,
+        min_bathrooms=2,
+        min_sqft=1_700,
+        max_sqft=2_300,
+    )
+    assert ladder[-1].is_empty()
+    assert len(set(ladder)) == len(ladder)
+
+    # every step lets through at least the listings of the step before
+    listings = sample_listings
+    for listing in listings:
+        listing["house_size_sqft"] = parse_sqft(listing["house_size"])
+    passing = [
+        {i for i, listing in enumerate(listings) if step.matches(listing)}
+        for step in ladder
+    ]
+    for stricter, looser in zip(passing, passing[1:]):
+        assert stricter <= looser
+    assert passing[-1] == set(range(len(listings)))
+
+
+def test_relaxation_ladder_without_preferences_is_unfiltered():
+    assert relaxation_ladder(None) == [ListingFilter()]
+    assert relaxation_ladder(BuyerPreferences(query="anything")) == [ListingFilter()]
+
+
+def test_filter_matches_agrees_with_chroma_where():
+    listing_filter = ListingFilter(max_price=500_000, min_bedrooms=3)
+    assert listing_filter.to_chroma_where() == {
+        "$and": [{"price": {"$lte": 500_000}}, {"bedrooms": {"$gte": 3}}]
+    }
+    assert listing_filter.matches({"price": 450_000, "bedrooms": 3})
+    assert not listing_filter.matches({"price": 550_000, "bedrooms": 4})
+    assert not listing_filter.matches({"price": 450_000})
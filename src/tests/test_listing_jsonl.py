@@ -0,0 +1,73 @@
+import io
+import json
+import os
+
+import pytest
+
+from src.listings.listing_jsonl import (
+    ListingJsonlWriter,
+    iter_json_array,
+    iter_listing_items,
+    load_listings_jsonl,
+    read_listings_jsonl,
+)
+from src.llm_parsers.listing_parser import Listing
+
+
+def _listings(sample_listings, n):
+    return [Listing(**item) for item in sample_listings[:n]]
+
+
+def test_writer_appends_and_reader_reads_back(tmp_path, sample_listings):
+    path = str(tmp_path / "out" / "generated.jsonl")
+    with ListingJsonlWriter(path, fsync_every=2) as writer:
+        for listing in _listings(sample_listings, 3):
+            writer.write(listing)
+    assert writer.written == 3
+    assert load_listings_jsonl(path) == _listings(sample_listings, 3)
+
+
+def test_resume_drops_a_truncated_last_line(tmp_path, sample_listings):
+    path = str(tmp_path / "generated.jsonl")
+    with ListingJsonlWriter(path) as writer:
+        for listing in _listings(sample_listings, 2):
+            writer.write(listing)
+    # a crash in the middle of the third listing
+    with open(path, "a") as f:
+        f.write(json.dumps(sample_listings[2])[:40])
+
+    assert len(list(read_listings_jsonl(path))) == 2  # the reader skips it
+
+    with ListingJsonlWriter(path) as writer:  # the writer cuts it off
+        writer.write(Listing(**sample_listings[3]))
+    neighborhoods = [item["neighborhood"] for item in read_listings_jsonl(path)]
+    assert neighborhoods == [sample_listings[i]["neighborhood"] for i in (0, 1, 3)]
+
+
+def test_reader_of_a_missing_file_is_empty(tmp_path):
+    assert list(read_listings_jsonl(str(tmp_path / "missing.jsonl"))) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_json_array_in_chunks(chunk_size):
+    items = [{"a": 1, "b": [1, 2, {"c": "]"}]}, 12345, "x, y", [], 1.5]
+    stream = io.StringIO(json.dumps(items, indent=2))
+    assert list(iter_json_array(stream, chunk_size=chunk_size)) == items
+
+
+def test_iter_json_array_rejects_broken_files():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"not": "an array"}')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1}, {"b": 2}')))
+
+
+def test_iter_listing_items_reads_json_and_jsonl(tmp_path, sample_listings):
+    with open(tmp_path / "a.json", "w") as f:
+        json.dump(sample_listings[:3], f)
+    with open(tmp_path / "b.jsonl", "w") as f:
+        f.writelines(json.dumps(item) + "\n" for item in sample_listings[3:5])
+
+    items = list(iter_listing_items(str(tmp_path)))
+    assert items == sample_listings[:5]
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "b.jsonl"]
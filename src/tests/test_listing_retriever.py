@@ -0,0 +1,115 @@
+import pytest
+
+from src.config import settings
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.tools.filters.listing_filter import relaxation_ladder
+
+
+@pytest.fixture(params=["dense", "hybrid"])
+def retriever(request, store_dirs, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", request.param)
+    monkeypatch.setattr(settings, "RERANK_ENABLED", False)
+    return store_dirs().build_retriever()
+
+
+def _vector_search(spans):
+    return [span for span in spans.spans if span.name == "vector_search"]
+
+
+def test_returns_k_listings(retriever):
+    docs = retriever.retrieve("family home with a backyard near good schools")
+    assert len(docs) == retriever.k
+    assert len({doc.id for doc in docs}) == retriever.k
+
+
+def test_stricter_filter_steps_rank_first(retriever):
+    # a single sample listing costs $800k or more: the filter has to be relaxed
+    preferences = BuyerPreferences(query="cozy home", price_range="at least $800k")
+    docs, tiers = retriever._candidates("cozy home", preferences, retriever.k)
+
+    assert len(docs) == retriever.k
+    assert tiers == sorted(tiers)
+    assert tiers[0] == 0 and docs[0].metadata["price"] == 850_000
+    assert tiers[1] == 1 and tiers[-1] > 1
+
+    ladder = relaxation_ladder(preferences)
+    for doc, tier in zip(docs, tiers):
+        assert ladder[tier].matches(doc.metadata)
+
+
+def test_price_filter_is_applied_in_the_search(retriever):
+    # six sample listings are within 5% of the budget
+    preferences = BuyerPreferences(query="modern home", price_range="under $490k")
+    docs = retriever.retrieve("modern home", preferences)
+    strict = relaxation_ladder(preferences)[0]
+    assert len(docs) == retriever.k
+    assert all(strict.matches(doc.metadata) for doc in docs)
+
+
+def test_relaxed_search_is_traced(store_dirs, monkeypatch, recorded_spans):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "dense")
+    retriever = store_dirs().build_retriever()
+    preferences = BuyerPreferences(query="cozy home", price_range="at least $800k")
+    docs = retriever.retrieve("cozy home", preferences)
+
+    assert "embed_query" in [span.name for span in recorded_spans.spans]
+    span = _vector_search(recorded_spans)[-1]
+    assert span.counts["documents"] == len(docs)
+    assert span.counts["searches"] > 1  # the budget filter had to be relaxed
+
+
+def test_identical_speculation_is_reused(store_dirs, monkeypatch, recorded_spans):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "dense")
+    retriever = store_dirs().build_retriever()
+    query = "4-bedroom home with a backyard in a family-friendly neighborhood"
+
+    speculation = retriever.speculate(query)
+    docs = retriever.retrieve(query, BuyerPreferences(query=query), speculation)
+
+    assert [doc.id for doc in docs] == [doc.id for doc in speculation.docs[:5]]
+    span = _vector_search(recorded_spans)[-1]
+    assert span.counts["reused_speculation"] == 1
+    assert span.counts["searches"] == 0
+    assert span.counts["speculation_similarity"] == pytest.approx(1.0)
+
+
+def test_dissimilar_speculation_is_fused_with_a_fresh_search(
+    store_dirs, monkeypatch, recorded_spans
+):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "dense")
+    retriever = store_dirs().build_retriever()
+    preferences = BuyerPreferences(query="cozy home", price_range="at least $800k")
+
+    speculation = retriever.speculate("penthouse with a rooftop pool downtown")
+    docs = retriever.retrieve("cozy home", preferences, speculation)
+
+    span = _vector_search(recorded_spans)[-1]
+    assert span.counts["reused_speculation"] == 0
+    assert span.counts["searches"] >= 1
+    assert span.counts["speculation_similarity"] < retriever.reuse_similarity
+    # the fresh, filtered search still puts the only listing in budget first
+    assert docs[0].metadata["price"] == 850_000 and len(docs) == retriever.k
+
+
+def test_speculation_with_too_few_matches_is_not_reused(
+    store_dirs, monkeypatch, recorded_spans
+):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "dense")
+    retriever = store_dirs().build_retriever()
+    query = "cozy home"
+    speculation = retriever.speculate(query)
+
+    # same query, but a single speculative listing passes the strict filter
+    preferences = BuyerPreferences(query=query, price_range="at least $800k")
+    docs, tiers = retriever._candidates(query, preferences, retriever.k, speculation)
+
+    span = _vector_search(recorded_spans)[-1]
+    assert span.counts["speculation_similarity"] == pytest.approx(1.0)
+    assert span.counts["reused_speculation"] == 0
+    assert tiers[0] == 0 and tiers == sorted(tiers)
+    assert docs[0].metadata["price"] == 850_000
@@ -0,0 +1,43 @@
+from src.tools.dedup.near_duplicates import NearDuplicateIndex
+
+DESCRIPTION = (
+    "Charming three bedroom craftsman home with an updated kitchen, hardwood "
+    "floors throughout, a sunny backyard with mature oak trees and a detached "
+    "two car garage, just minutes from the farmers market and the river trail."
+)
+
+
+def test_repeated_neighborhood_is_rejected():
+    index = NearDuplicateIndex()
+    assert index.check_and_add("Maple Heights", DESCRIPTION) is None
+    assert index.check_and_add("  maple   HEIGHTS ", "Any other text") == "neighborhood"
+    assert len(index) == 1
+
+
+def test_near_duplicate_description_is_rejected():
+    index = NearDuplicateIndex()
+    index.check_and_add("Maple Heights", DESCRIPTION)
+    reworded = DESCRIPTION.replace("farmers market", "farmers' market").replace(
+        "sunny", "bright"
+    )
+    assert index.check_and_add("Oak Park", reworded) == "description"
+
+
+def test_different_listings_are_accepted():
+    index = NearDuplicateIndex()
+    index.check_and_add("Maple Heights", DESCRIPTION)
+    other = (
+        "Sleek downtown condo on the 12th floor with floor to ceiling windows, "
+        "a rooftop pool, concierge service and a short walk to the light rail."
+    )
+    assert index.check_and_add("Riverside", other) is None
+    assert len(index) == 2
+
+
+def test_index_grows_past_its_initial_capacity():
+    index = NearDuplicateIndex(check_neighborhood=False)
+    for i in range(1500):
+        index.add(f"n{i}", f"listing number {i} with words w{i} x{i} y{i} z{i}")
+    assert len(index) == 1500
+    reason, _ = index.find_duplicate("n0", "listing number 7 with words w7 x7 y7 z7")
+    assert reason == "description"
@@ -0,0 +1,181 @@
+import hashlib
+import threading
+
+import numpy as np
+import pytest
+
+from src.tools.embeddings.hashing_embeddings import HashingEmbeddings
+from src.tools.vectorindex.numpy_index import NumpyVectorStore, quantize_int8
+
+DIM = 64
+
+
+def _listing(i):
+    content_hash = hashlib.sha256(f"listing {i}".encode()).hexdigest()
+    metadata = {
+        "content_hash": content_hash,
+        "neighborhood": ["Green Oaks", "Riverside", "Downtown"][i % 3],
+        "price": 300_000 + 10_000 * i,
+        "bedrooms": 1 + i % 4,
+        "bathrooms": 1 + i % 2,
+        "house_size": f"{1000 + 50 * i} sqft",
+    }
+    return content_hash, metadata
+
+
+def _store(n=200, quantization="none", path=None, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    ids, metadatas = zip(*(_listing(i) for i in range(n)))
+    records = [
+        {"page_content": f"listing {i}", "metadata": m} for i, m in enumerate(metadatas)
+    ]
+    store = NumpyVectorStore.from_embeddings(
+        HashingEmbeddings(DIM), ids, vectors, records, quantization, path=path
+    )
+    return store, vectors
+
+
+def _brute_force(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_exact_top_k_matches_brute_force():
+    store, vectors = _store()
+    query = np.random.default_rng(1).normal(size=DIM).astype(np.float32)
+    rows = [row for row, _ in store.search_rows(query, 10)]
+    assert rows == _brute_force(vectors, query, 10)
+
+    scores = [score for _, score in store.search_rows(query, 10)]
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_quantized_recall(quantization):
+    store, vectors = _store(quantization=quantization)
+    assert store.nbytes() < _store()[0].nbytes()
+
+    rng = np.random.default_rng(2)
+    recall = []
+    for _ in range(20):
+        query = rng.normal(size=DIM).astype(np.float32)
+        found = {row for row, _ in store.search_rows(query, 10)}
+        recall.append(len(found & set(_brute_force(vectors, query, 10))) / 10)
+    assert np.mean(recall) >= 0.9
+
+
+def test_int8_quantization_round_trips():
+    vectors = np.random.default_rng(3).normal(size=(5, DIM)).astype(np.float32)
+    quantized, scales = quantize_int8(vectors)
+    assert quantized.dtype == np.int8
+    np.testing.assert_allclose(quantized * scales[:, None], vectors, atol=scales.max())
+
+
+def test_where_filters_restrict_the_rows():
+    store, _ = _store()
+    query = np.ones(DIM, dtype=np.float32)
+    where = {"$and": [{"price": {"$lte": 500_000}}, {"bedrooms": {"$gte": 3}}]}
+    docs = store.search(query, 50, where=where)
+    assert docs
+    assert all(
+        d.metadata["price"] <= 500_000 and d.metadata["bedrooms"] >= 3 for d in docs
+    )
+
+    neighborhood = store.search(query, 50, where={"neighborhood": "Riverside"})
+    assert {d.metadata["neighborhood"] for d in neighborhood} == {"Riverside"}
+    assert store.search(query, 5, where={"price": {"$gt": 10**9}}) == []
+
+    with pytest.raises(ValueError):
+        store.search(query, 5, where={"colour": "red"})
+
+
+def test_scores_leave_the_query_untouched():
+    store, _ = _store(quantization="int8")
+    query = [3.0] * DIM
+    store.scores(query)
+    store.search(query, 5)
+    assert query == [3.0] * DIM
+
+    array_query = np.full(DIM, 3.0, dtype=np.float32)
+    store.scores(array_query)
+    assert np.all(array_query == 3.0)
+
+
+def test_upsert_and_delete_are_merged_before_reads():
+    store, vectors = _store(n=10)
+    ids = list(store.ids)
+
+    store.delete([ids[0]])
+    assert store.count() == 9
+    assert store.get([ids[0]])["ids"] == []
+
+    # re-insert the deleted id with a new text, then overwrite it again
+    store.upsert(
+        [ids[0]], [vectors[0]], ["first"], [store.get([ids[1]])["metadatas"][0]]
+    )
+    store.upsert([ids[0]], [vectors[0]], ["second"], [{"content_hash": ids[0]}])
+    assert store.count() == 10
+    assert store.get([ids[0]], include=("documents",))["documents"] == ["second"]
+
+    hit = store.search(vectors[0], 1)[0]
+    assert hit.id == ids[0] and hit.page_content == "second"
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_persist_and_open_round_trip(tmp_path, quantization):
+    path = str(tmp_path / "vectors.bin")
+    store, vectors = _store(n=50, quantization=quantization, path=path)
+    store.persist()
+
+    reopened = NumpyVectorStore.open(path, HashingEmbeddings(DIM), quantization)
+    assert reopened.count() == 50
+    assert list(reopened.ids) == list(store.ids)
+    query = vectors[7]
+    assert reopened.search_rows(query, 5) == pytest.approx(store.search_rows(query, 5))
+    assert reopened.search(query, 1)[0].metadata == store.search(query, 1)[0].metadata
+
+    # opened with another precision: re-encoded, same ranking
+    as_float = NumpyVectorStore.open(path, HashingEmbeddings(DIM), "none")
+    assert as_float.quantization == "none"
+    assert as_float.search(query, 1)[0].id == store.search(query, 1)[0].id
+
+
+def test_open_without_a_file_starts_empty(tmp_path):
+    store = NumpyVectorStore.open(str(tmp_path / "missing.bin"), HashingEmbeddings(DIM))
+    assert store.count() == 0
+    assert store.search(np.ones(DIM), 5) == []
+
+
+def test_concurrent_search_during_merges():
+    store, vectors = _store(n=100)
+    extra_ids = [hashlib.sha256(f"extra {i}".encode()).hexdigest() for i in range(200)]
+    errors = []
+
+    def search():
+        try:
+            for _ in range(200):
+                for doc in store.search(vectors[3], 5):
+                    # a document is never paired with another row's record
+                    assert doc.metadata.get("content_hash", doc.id) == doc.id
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    def write():
+        for i, doc_id in enumerate(extra_ids):
+            store.upsert(
+                [doc_id], [vectors[i % 100]], ["extra"], [{"content_hash": doc_id}]
+            )
+            if i % 3 == 0:
+                store.delete([doc_id])
+            store.count()
+
+    threads = [threading.Thread(target=search) for _ in range(3)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.count() == 100 + len([i for i in range(200) if i % 3])
@@ -0,0 +1,25 @@
+from src.config import settings
+from src.tools.ingestion.parallel_ingest import ParallelIngestion
+
+
+def test_parallel_ingest_leaves_nothing_to_embed(
+    store_dirs, listings_dir, sample_listings, monkeypatch
+):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    store = store_dirs()
+    embedded = []
+    model = store.embedding_model
+    original = model.embed_documents
+    monkeypatch.setattr(
+        model,
+        "embed_documents",
+        lambda texts: embedded.append(len(texts)) or original(texts),
+    )
+
+    report = ParallelIngestion(store, batch_size=4, workers=1).run(listings_dir)
+
+    assert report["embedded"] == len(sample_listings)
+    # the closing sync found every listing stored under the current model
+    assert embedded == []
+    assert store.open_vector_store().count() == len(sample_listings)
+    assert len(store.indexed_ids()) == len(sample_listings)
@@ -0,0 +1,23 @@
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src.chains.rag_chain import Rag
+from src.config import settings
+
+
+@pytest.mark.parametrize("budget, described", [(600, True), (0, False)])
+def test_context_format_is_only_described_for_the_compact_context(
+    store_dirs, monkeypatch, budget, described
+):
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(settings, "RETRIEVER_MODE", "dense")
+    monkeypatch.setattr(settings, "RERANK_ENABLED", False)
+    monkeypatch.setattr(settings, "RAG_CONTEXT_TOKEN_BUDGET", budget)
+    prompts = []
+    llm = RunnableLambda(lambda prompt: prompts.append(prompt) or "answer")
+
+    Rag(llm).get_rag_chain().invoke({"input": "a house with a garden"})
+
+    system = prompts[0].to_messages()[0].content
+    assert ("[number] price | bedrooms (bd)" in system) == described
+    assert "Listings:" in system
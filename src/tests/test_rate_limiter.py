@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from groq import RateLimitError
+
+from src.tools.rate_limit import rate_limiter
+from src.tools.rate_limit.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    backoff_delay,
+    is_rate_limit_error,
+    retry_after_seconds,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake)
+    return fake
+
+
+def test_token_bucket_refills_continuously(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+    assert bucket.wait_time(10) == 0
+    bucket.take(10)
+    assert bucket.wait_time(4) == pytest.approx(2.0)
+    clock.now += 1
+    assert bucket.wait_time(4) == pytest.approx(1.0)
+    clock.now += 100
+    assert bucket.available <= 10 and bucket.wait_time(10) == 0
+
+
+def test_oversized_call_waits_for_a_full_bucket_only(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+    bucket.take(10)
+    assert bucket.wait_time(50) == pytest.approx(10.0)
+
+
+def test_rate_limiter_paces_requests():
+    # 1200 requests per minute: a burst of 1200, then one every 50 ms
+    limiter = RateLimiter(requests_per_minute=1200, tokens_per_minute=10**9)
+    limiter.requests.available = 0
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(4):
+            await limiter.acquire(tokens=10)
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.15 <= elapsed < 1.0
+    assert limiter.waited_seconds > 0
+
+
+def test_pause_holds_every_caller_back():
+    limiter = RateLimiter(requests_per_minute=10**6, tokens_per_minute=10**9)
+    limiter.pause(0.2)
+    start = time.perf_counter()
+    asyncio.run(limiter.acquire(tokens=1))
+    assert time.perf_counter() - start >= 0.19
+    assert limiter.rate_limited == 1
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    delays = [backoff_delay(attempt, base=1.0, cap=8.0) for attempt in range(10)]
+    assert all(0 <= delay <= 8.0 for delay in delays)
+    assert all(backoff_delay(0, base=1.0) <= 1.0 for _ in range(50))
+
+
+_REQUEST = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+
+
+class _Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _ProviderError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+def test_rate_limit_errors_and_retry_after():
+    limited = _ProviderError("slow down", _Response(429, {"retry-after": "3.5"}))
+    assert is_rate_limit_error(limited)
+    assert retry_after_seconds(limited) == 3.5
+
+    assert is_rate_limit_error(
+        RateLimitError(
+            "slow down", response=httpx.Response(429, request=_REQUEST), body=None
+        )
+    )
+    # the message alone does not make a rate-limit error
+    assert not is_rate_limit_error(Exception("listing 429 is over the rate limit"))
+    assert not is_rate_limit_error(_ProviderError("bad", _Response(500)))
+    assert retry_after_seconds(Exception("no response")) is None
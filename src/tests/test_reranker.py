@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+
+from src.tools.rerank.cross_encoder_reranker import CrossEncoderReranker
+
+
+class _LengthModel:
+    """Scores a pair by the length of the listing text."""
+
+    def predict(self, pairs, **_kwargs):
+        return [len(text) for _query, text in pairs]
+
+
+def _docs():
+    return [
+        Document(page_content="x" * size, metadata={"content_hash": str(size)})
+        for size in (10, 30, 20)
+    ]
+
+
+def test_rerank_orders_by_score_within_a_tier():
+    reranker = CrossEncoderReranker(_LengthModel(), budget_ms=5_000)
+    ranked = reranker.rerank("query", _docs(), k=3, tiers=[1, 1, 0])
+    assert [doc.metadata["content_hash"] for doc in ranked] == ["20", "30", "10"]
+
+
+def test_counters_add_up_across_threads():
+    reranker = CrossEncoderReranker(_LengthModel(), budget_ms=5_000)
+    queries = [f"query {i % 10}" for i in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda query: reranker.rerank(query, _docs(), k=2), queries))
+
+    stats = reranker.stats()
+    assert stats["hits"] + stats["misses"] == 3 * len(queries)
+    assert stats["fallbacks"] == 0
+    # every pass scored at least one new pair, and the 10 queries have 30 pairs
+    assert stats["entries"] == 30 and stats["batches"] <= stats["misses"]
@@ -0,0 +1,44 @@
+from src.llm_parsers.text_parser import preferences_from_text
+
+
+def test_rooms_size_and_budget():
+    prefs = preferences_from_text(
+        "Looking for a 3-bedroom, 2 bath house of about 2,000 sqft under $650k"
+    )
+    assert prefs.bedrooms == 3
+    assert prefs.bathrooms == 2
+    assert prefs.house_size == "2000 sqft"
+    assert prefs.price_range == "under $650k"
+
+
+def test_budget_word_without_currency_sign():
+    prefs = preferences_from_text("4 bedrooms, budget of 700,000, near a park")
+    assert prefs.price_range == "700,000"
+
+
+def test_room_counts_are_not_budgets():
+    prefs = preferences_from_text("2 bedrooms and 1 bathroom please")
+    assert prefs.price_range is None
+
+
+def test_vocabulary_is_reported_with_canonical_names():
+    prefs = preferences_from_text(
+        "Quiet street, a big back yard and solar, close to the subway; "
+        "we work from home with two kids"
+    )
+    assert prefs.amenities == ["backyard", "solar panels"]
+    assert prefs.transportation == ["public transit"]
+    assert prefs.neighborhood_traits == ["quiet"]
+    assert prefs.lifestyle == "remote work, young family"
+
+
+def test_words_match_whole_words_only():
+    # "business" starts with "bus"
+    prefs = preferences_from_text("a business district home")
+    assert prefs.transportation is None
+
+
+def test_query_is_the_normalized_text():
+    prefs = preferences_from_text("  modern   loft\nwith a view ")
+    assert prefs.query == "modern loft with a view"
+    assert prefs.bedrooms is None and prefs.amenities is None
@@ -0,0 +1,94 @@
+import os
+import stat
+import threading
+
+from src.tools.tracing.metrics_sinks import InMemorySink, PrometheusSink
+from src.tools.tracing.spans import Tracer, estimate_tokens
+
+
+def test_spans_join_the_query_trace():
+    sink = InMemorySink()
+    tracer = Tracer(sinks=[sink])
+
+    with tracer.trace(mode="direct") as root:
+        with tracer.span("embed_query", tokens=3):
+            pass
+        with tracer.span("generate_answer", llm_calls=1, prompt_tokens=120) as span:
+            span.add(completion_tokens=30)
+
+    names = [span.name for span in sink.spans]
+    assert names == ["embed_query", "generate_answer", "end_to_end"]
+    assert root.trace.labels == {"mode": "direct"}
+    assert [span.name for span in root.trace.spans] == names
+    # per-query totals are rolled up into the end_to_end span
+    assert root.counts == {
+        "llm_calls": 1,
+        "prompt_tokens": 120,
+        "completion_tokens": 30,
+    }
+    assert len(sink.durations("end_to_end")) == 1
+
+
+def test_disabled_tracer_records_nothing():
+    sink = InMemorySink()
+    tracer = Tracer(sinks=[sink], enabled=False)
+    with tracer.trace():
+        with tracer.span("vector_search") as span:
+            span.add(documents=5)
+    assert list(sink.spans) == []
+
+
+def test_prometheus_render_has_labels_and_buckets():
+    sink = PrometheusSink()
+    tracer = Tracer(sinks=[sink])
+    for mode in ("full", "direct"):
+        with tracer.trace(mode=mode):
+            with tracer.span("vector_search", documents=5):
+                pass
+
+    text = sink.render()
+    assert "# TYPE homematch_stage_duration_seconds histogram" in text
+    assert (
+        'homematch_stage_duration_seconds_count{stage="vector_search",mode="full"} 1'
+        in text
+    )
+    assert (
+        'homematch_stage_documents_bucket{stage="vector_search",mode="direct",le="5"} 1'
+        in text
+    )
+    assert (
+        'homematch_stage_documents_bucket{stage="vector_search",mode="direct",le="2"} 0'
+        in text
+    )
+    assert 'le="+Inf"' in text
+
+
+def test_prometheus_flush_is_atomic_and_readable(tmp_path):
+    path = tmp_path / "metrics" / "homematch.prom"
+    sink = PrometheusSink(str(path))
+    tracer = Tracer(sinks=[sink])
+
+    def query():
+        for _ in range(20):
+            with tracer.trace(mode="full"):
+                with tracer.span("clean_query"):
+                    pass
+
+    threads = [threading.Thread(target=query) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert os.listdir(path.parent) == ["homematch.prom"]  # no temp file left behind
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert (
+        'homematch_stage_duration_seconds_count{stage="end_to_end",mode="full"} 80'
+        in path.read_text()
+    )
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
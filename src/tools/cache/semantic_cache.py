@@ -0,0 +1,133 @@
+"""
+semantic_cache.py
+~~~~~~~~~~~~~~~~~
+Answer cache keyed on the embedding of the cleaned buyer query.
+
+• A lookup hits when a stored query is within a cosine threshold of the new
+  one (and shares the same exact-match key, e.g. model + hard filters).
+• Entries expire after a TTL; the least recently used entry is evicted once
+  the cache is full.
+• Everything is dropped when the listing index version changes.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+
+@dataclass
+class CacheEntry:
+    vector: np.ndarray  # unit-normalized query embedding
+    key: Hashable
+    result: Dict[str, Any]
+    latency: float  # seconds it took to produce `result`
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of pipeline answers, looked up by cosine similarity."""
+
+    def __init__(
+        self, threshold: float = 0.97, ttl_seconds: float = 3600, max_entries: int = 512
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[int, CacheEntry] = OrderedDict()
+        self._next_id = 0
+        self._index_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def lookup(
+        self, vector: List[float], key: Hashable, index_version: str
+    ) -> Optional[Dict[str, Any]]:
+        """Return the stored result of the closest matching query, or None."""
+        query = self._normalize(vector)
+
+        with self._lock:
+            self._check_version(index_version)
+            self._expire()
+
+            best_id, best_score = None, self.threshold
+            for entry_id, entry in self._entries.items():
+                if entry.key != key:
+                    continue
+                score = float(entry.vector @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.latency_saved += entry.latency
+
+        logger.info(
+            f"⚡ answer cache hit (cosine {best_score:.3f}, saved {entry.latency:.2f}s)"
+        )
+        return entry.result
+
+    def store(
+        self,
+        vector: List[float],
+        key: Hashable,
+        result: Dict[str, Any],
+        latency: float,
+        index_version: str,
+    ) -> None:
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[self._next_id] = CacheEntry(
+                vector=self._normalize(vector), key=key, result=result, latency=latency
+            )
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "latency_saved_seconds": self.latency_saved,
+        }
+
+    def _check_version(self, index_version: str) -> None:
+        """Answers cite listings: a new listing index makes every entry stale."""
+        if index_version != self._index_version:
+            if self._entries:
+                logger.info("🧹 listing index changed, clearing the answer cache")
+            self._entries.clear()
+            self._index_version = index_version
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for entry_id in [i for i, e in self._entries.items() if e.created_at < cutoff]:
+            del self._entries[entry_id]
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / max(float(np.linalg.norm(array)), 1e-12)
@@ -1,20 +1,25 @@
-import json, os
-from typing import List
-import json
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import hashlib
 import json
 import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Tuple
+
 from langchain.schema import Document
-from typing import List
+from langchain_groq import ChatGroq
 from loguru import logger
 
 # from src.llms import groqllm
 from src.prompt_templates.rag_prompt import rag_prompt
 from src.config import settings
+from src.listings.listing_jsonl import iter_listing_items
 from src.llm_parsers.listing_parser import Listing
-import os, json
+from src.tools.columnar.listing_table import ListingTable
+from src.tools.embeddings.embedding_model import get_embedding_model
+from src.tools.filters.listing_filter import parse_sqft
+from src.tools.lexical.bm25_index import BM25Index
+from src.tools.rerank.cross_encoder_reranker import get_reranker
+from src.tools.retrievers.listing_retriever import ListingRetriever
+from src.tools.vectorindex.backend import VectorBackend, open_backend
 
 
 class ChromaStore:
@@ -31,97 +36,441 @@ class ChromaStore:
         max_tokens=512,  # plenty for one JSON listing
     )
 
-    embedding_model = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        model_kwargs={"device": "cpu"},  # or "cuda" if GPU is available
-    )
+    embedding_model = get_embedding_model()  # shared, cache-backed bge model
 
     rag_prompt = rag_prompt
 
+    # where the listings live and where the persisted index is written
+    listings_dir = "./src/listings/docs"
+    persist_dir = "./src/tools/chromadb"
+    collection_name = "listings"
+    manifest_name = "index_manifest.json"  # remembers what the index was built from
+    table_name = "listing_table.npz"  # columnar copy of the listing metadata
+    lexical_index_name = "bm25_index.json"  # inverted index over the listing text
+
+    # concurrent searches (threads, or async queries run in worker threads) all sync
+    # the same persisted index, so only one of them may do it at a time
+    _sync_lock = threading.Lock()
+
     def __init__(self):
 
-        pass
+        self.vector_store = None  # opened lazily, then reused across searches
+        self.listing_table = None  # ListingTable, rebuilt whenever the index changes
+        self.lexical_index = None  # BM25Index, updated alongside the vector store
+        self.index_version = None  # changes whenever the indexed listings change
+        self.loaded_version = None  # index version the structures above were loaded for
 
     @classmethod
     def load_listings(cls, path: str = "./src/listings/docs") -> List[Document]:
         """
         This method is responsible of loading the generted listings in langchain documents format
         """
-
-        raw_listings = []
-
-        for filename in os.listdir(path):
-            with open(os.path.join(path, filename), "r") as f:
-                data = json.load(f)
-
-            for item in data:
-                listing_object = Listing(**item)
-                raw_listings.append(listing_object)
-            # breakpoint()s
-        # convert to langchain documents
-        documents = cls.listings_to_documents(raw_listings)
+        documents = [doc for batch in cls.iter_document_batches(path) for doc in batch]
+        logger.info(f"✅ Converted {len(documents)} listings to LangChain Documents")
 
         return documents
 
+    @classmethod
+    def iter_document_batches(
+        cls, path: str = "./src/listings/docs", batch_size: int = 256
+    ) -> Iterator[List[Document]]:
+        """
+        This method will stream the listings of `path` as batches of at most `batch_size`
+        documents: files are parsed incrementally and each batch is validated and
+        converted on its own, so memory stays flat however large the corpus is
+        """
+        batch: List[Document] = []
+        for item in iter_listing_items(path):
+            batch.append(cls.listing_to_document(Listing(**item)))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     @staticmethod
     def listings_to_documents(raw_listings: List[Listing]) -> List[Document]:
         """
         this method will convert generated listings from json to langchain Document
         """
-        docs: list[Document] = []
-
-        for item in raw_listings:
-            # Combine the prose fields into the text that will be embedded
-            text_block = "\n\n".join(
-                [
-                    item.description.strip(),
-                    item.neighborhood_description.strip(),
-                ]
-            ).strip()
-
-            # Everything else becomes structured metadata for filtering/ranking later
-            item_dict = item.model_dump()  # For Pydantic v2
-            # item_dict = item.dict()      # For Pydantic v1
-
-            metadata = {
-                k: v
-                for k, v in item_dict.items()
-                if k not in ("description", "neighborhood_description")
-            }
-
-            docs.append(Document(page_content=text_block, metadata=metadata))
+        docs = [ChromaStore.listing_to_document(item) for item in raw_listings]
 
         logger.info(f"✅ Converted {len(docs)} listings to LangChain Documents")
 
         return docs
 
-    def build_retriever(self):
+    @staticmethod
+    def listing_to_document(item: Listing) -> Document:
         """
-        This method will create a chromadb vector
+        this method will convert one listing to a langchain Document keyed by its content hash
         """
+        # Combine the prose fields into the text that will be embedded
+        text_block = "\n\n".join(
+            [
+                item.description.strip(),
+                item.neighborhood_description.strip(),
+            ]
+        ).strip()
+
+        # Everything else becomes structured metadata for filtering/ranking later
+        item_dict = item.model_dump()  # For Pydantic v2
+        # item_dict = item.dict()      # For Pydantic v1
+
+        metadata = {
+            k: v
+            for k, v in item_dict.items()
+            if k not in ("description", "neighborhood_description")
+        }
 
-        # build the vectorestore
-        PERSIST_DIR = "./src/tools/chromadb"
-        os.makedirs(PERSIST_DIR, exist_ok=True)
+        # numeric living area so the retriever can range-filter on it
+        metadata["house_size_sqft"] = parse_sqft(item.house_size) or 0
 
-        vector_store = Chroma.from_documents(
-            documents=self.load_listings("./src/listings/docs"),
-            embedding=self.embedding_model,
-            collection_name="listings",
-            persist_directory=PERSIST_DIR,
+        # the content hash doubles as the document id inside the vector store
+        metadata["content_hash"] = ChromaStore.content_hash(text_block, metadata)
+
+        return Document(
+            id=metadata["content_hash"],
+            page_content=text_block,
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def content_hash(page_content: str, metadata: Dict) -> str:
+        """
+        Hash a listing from exactly what gets stored in the vector store (text + metadata),
+        so entries written by older versions of the store can be hashed the same way.
+        """
+        payload = json.dumps(
+            {
+                "page_content": page_content,
+                "metadata": {k: v for k, v in metadata.items() if k != "content_hash"},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
         )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def open_vector_store(self) -> VectorBackend:
+        """
+        Open (or create) the persisted listings index of the configured backend
+        (VECTOR_BACKEND) without embedding anything
+        """
+        if self.vector_store is None:
+            self.vector_store = open_backend(
+                settings.VECTOR_BACKEND,
+                self.persist_dir,
+                self.embedding_model,
+                collection_name=self.collection_name,
+                quantization=settings.VECTOR_QUANTIZATION,
+            )
+
+        return self.vector_store
 
-        vector_store.persist()  # writes the DB files to disk
-        logger.info(f"💾 Stored & persisted to {PERSIST_DIR}")
+    @staticmethod
+    def backend_namespace() -> str:
+        """The configured vector backend (and its storage precision)."""
+        if settings.VECTOR_BACKEND == "numpy":
+            return f"numpy:{settings.VECTOR_QUANTIZATION}"
+        return settings.VECTOR_BACKEND
+
+    def sync_index(
+        self, path: str = "./src/listings/docs", batch_size: int = 256
+    ) -> str:
+        """
+        Bring the persisted index in line with the listings on disk: only new or changed
+        listings are embedded, removed ones are deleted and duplicates left behind by
+        older builds are compacted. Does nothing when the listing files did not change.
+        Returns the index version (listing files + embedding model).
+        """
+        with self._sync_lock:
+            return self._sync_index(path, batch_size)
+
+    def indexed_ids(self, batch_size: int = 256) -> set:
+        """
+        Ids already stored with vectors of the current embedding model (none when the
+        model changed since the index was built)
+        """
+        with self._sync_lock:
+            manifest = self._read_manifest()
+            namespace = self.embedding_namespace()
+            if manifest.get("embedding_model", namespace) != namespace:
+                return set()  # stale vectors: everything is embedded again
+            self.open_vector_store()
+            indexed, _ = self._scan_index(batch_size)
+            return indexed
+
+    def ingest_embedded(
+        self, batches: Iterable[Tuple[List[Document], List[List[float]]]]
+    ) -> None:
+        """
+        Upsert listings embedded elsewhere (e.g. by worker processes) under the sync
+        lock; `batches` yields (documents, embeddings). Every listing that is not
+        yielded must already be stored with the current model's vectors (see
+        `indexed_ids`): the model is recorded, so the next `sync_index` rebuilds the
+        table, BM25 index and manifest without embedding anything
+        """
+        with self._sync_lock:
+            vector_store = self.open_vector_store()
+            for docs, embeddings in batches:
+                vector_store.upsert(
+                    ids=[doc.id for doc in docs],
+                    embeddings=embeddings,
+                    documents=[doc.page_content for doc in docs],
+                    metadatas=[doc.metadata for doc in docs],
+                )
+            vector_store.persist()
 
-        # cast the vectorestore as a retriever
-        retriever = vector_store.as_retriever(
-            search_kwargs={
-                "k": 5  # number of listings to return on each query (tweak as you like)
-                # you can also add a metadata filter later, e.g.:
-                # "filter": {"bedrooms": 3}
+            manifest = self._read_manifest()
+            if manifest.get("embedding_model") != self.embedding_namespace():
+                # no fingerprint: the next sync still runs
+                manifest.update(
+                    fingerprint=None, embedding_model=self.embedding_namespace()
+                )
+                self._write_manifest(manifest)
+
+    def current_index_version(self, path: str = None) -> str:
+        """
+        The version `sync_index` would return for the listings in `path` (listings_dir
+        by default), computed from the file stats alone: nothing is read or embedded
+        """
+        fingerprint = self._listings_fingerprint(path or self.listings_dir)
+        return f"{fingerprint}:{self.embedding_namespace()}"
+
+    def _sync_index(self, path: str, batch_size: int) -> str:
+        fingerprint = self._listings_fingerprint(path)
+        manifest = self._read_manifest()
+        embedding_namespace = self.embedding_namespace()
+        self.index_version = f"{fingerprint}:{embedding_namespace}"
+        if self.loaded_version != self.index_version:
+            # the index was synced elsewhere (another process or store) since the table,
+            # BM25 index and vector store were loaded: read them again from disk
+            self._unload()
+        if (
+            manifest.get("fingerprint") == fingerprint
+            and manifest.get("embedding_model", embedding_namespace)
+            == embedding_namespace
+            and manifest.get("vector_backend", "chroma") == self.backend_namespace()
+        ):
+            logger.info(
+                f"✅ listings index is up to date ({manifest.get('count')} listings)"
+            )
+            self._load_listing_table()
+            self._load_lexical_index()
+            self.loaded_version = self.index_version
+            return self.index_version
+
+        vector_store = self.open_vector_store()
+        indexed, legacy_ids = self._scan_index(batch_size)
+
+        # vectors from another embedding model/backend cannot be mixed with new ones
+        model_changed = (
+            manifest.get("embedding_model", embedding_namespace) != embedding_namespace
+        )
+
+        # 1️⃣  entries from older builds are stored under random ids: keep their vectors
+        # by content hash so the listings they hold are re-keyed instead of re-embedded
+        reusable = {}
+        if legacy_ids and not model_changed:
+            reusable = self._legacy_embeddings(legacy_ids, batch_size)
+        if legacy_ids:
+            vector_store.delete(legacy_ids)
+
+        if model_changed:
+            logger.info(
+                f"🔁 Embedding model changed to {embedding_namespace}, re-embedding"
+            )
+        previously_indexed = indexed
+        if model_changed:
+            indexed = set()  # every listing is upserted again below
+
+        self.lexical_index = BM25Index.open_or_create(
+            os.path.join(self.persist_dir, self.lexical_index_name)
+        )
+
+        # 2️⃣  stream the listings batch by batch: embed and upsert only what is new or
+        # changed, and grow the columnar table / BM25 index as the batches go by
+        wanted, tables = set(), []
+        embedded = compacted = 0
+        for batch in self.iter_document_batches(path, batch_size):
+            batch = [doc for doc in batch if doc.id not in wanted]  # repeated listings
+            wanted.update(doc.id for doc in batch)
+            tables.append(ListingTable.from_metadata(doc.metadata for doc in batch))
+
+            new_docs = [doc for doc in batch if doc.id not in indexed]
+            rekeyed = [doc for doc in new_docs if doc.id in reusable]
+            rekeyed_ids = {doc.id for doc in rekeyed}
+            if rekeyed:
+                vector_store.upsert(
+                    ids=[doc.id for doc in rekeyed],
+                    embeddings=[reusable.pop(doc.id) for doc in rekeyed],
+                    documents=[doc.page_content for doc in rekeyed],
+                    metadatas=[doc.metadata for doc in rekeyed],
+                )
+                compacted += len(rekeyed)
+            to_embed = [doc for doc in new_docs if doc.id not in rekeyed_ids]
+            if to_embed:
+                texts = [doc.page_content for doc in to_embed]
+                vector_store.upsert(
+                    ids=[doc.id for doc in to_embed],
+                    embeddings=self.embedding_model.embed_documents(texts),
+                    documents=texts,
+                    metadatas=[doc.metadata for doc in to_embed],
+                )
+                embedded += len(to_embed)
+
+            for doc in batch:
+                if doc.id not in self.lexical_index:
+                    self.lexical_index.add(doc.id, doc.page_content)
+
+        # 3️⃣  drop listings that no longer exist on disk
+        removed = [doc_id for doc_id in previously_indexed if doc_id not in wanted]
+        if removed:
+            for start in range(0, len(removed), batch_size):
+                vector_store.delete(removed[start : start + batch_size])
+        for doc_id in [d for d in self.lexical_index.doc_lengths if d not in wanted]:
+            self.lexical_index.remove(doc_id)
+
+        vector_store.persist()
+
+        # normalized, columnar metadata for fast filtering
+        self.listing_table = ListingTable.concat(tables)
+        self.listing_table.save(os.path.join(self.persist_dir, self.table_name))
+        self.lexical_index.save(os.path.join(self.persist_dir, self.lexical_index_name))
+
+        self._write_manifest(
+            {
+                "fingerprint": fingerprint,
+                "count": len(wanted),
+                "embedding_model": embedding_namespace,
+                "vector_backend": self.backend_namespace(),
             }
         )
+        self.loaded_version = self.index_version
+        logger.info(
+            f"💾 Synced listings index in {self.persist_dir}: {embedded} embedded, "
+            f"{len(removed)} removed, {len(legacy_ids)} legacy entries compacted "
+            f"({compacted} vectors reused)"
+        )
+        return self.index_version
+
+    def embedding_namespace(self) -> str:
+        """Name of the embedding model/backend the stored vectors come from."""
+        return getattr(
+            self.embedding_model, "model_name", type(self.embedding_model).__name__
+        )
+
+    def _scan_index(self, page_size: int):
+        """
+        Page through the stored entries: ids keyed by their content hash, and the
+        legacy ids (random ids written by Chroma.from_documents)
+        """
+        indexed, legacy_ids = set(), []
+        offset = 0
+        while True:
+            page = self.vector_store.get(
+                include=["metadatas"], limit=page_size, offset=offset
+            )
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                if (metadata or {}).get("content_hash") == doc_id:
+                    indexed.add(doc_id)
+                else:
+                    legacy_ids.append(doc_id)
+            if len(page["ids"]) < page_size:
+                return indexed, legacy_ids
+            offset += page_size
+
+    def _legacy_embeddings(self, legacy_ids: List[str], page_size: int) -> Dict:
+        """Embeddings of legacy entries, keyed by the content hash of what they hold."""
+        reusable = {}
+        for start in range(0, len(legacy_ids), page_size):
+            legacy = self.vector_store.get(
+                ids=legacy_ids[start : start + page_size],
+                include=["embeddings", "documents", "metadatas"],
+            )
+            for text, metadata, embedding in zip(
+                legacy["documents"], legacy["metadatas"], legacy["embeddings"]
+            ):
+                reusable.setdefault(self.content_hash(text, metadata or {}), embedding)
+        return reusable
+
+    def _unload(self):
+        """Drop the in-memory vector store, listing table and BM25 index."""
+        self.vector_store = None
+        self.listing_table = None
+        self.lexical_index = None
+        self.loaded_version = None
+
+    def _load_listing_table(self):
+        """Load the saved columnar table, rebuilding it from the index if it is missing."""
+        if self.listing_table is not None:
+            return
+        table_path = os.path.join(self.persist_dir, self.table_name)
+        if os.path.exists(table_path):
+            self.listing_table = ListingTable.load(table_path)
+        else:
+            stored = self.open_vector_store().get(include=["metadatas"])
+            self.listing_table = ListingTable.from_metadata(stored["metadatas"])
+            self.listing_table.save(table_path)
+
+    def _load_lexical_index(self):
+        """Load the saved BM25 index, rebuilding it from the index if it is missing."""
+        if self.lexical_index is not None:
+            return
+        index_path = os.path.join(self.persist_dir, self.lexical_index_name)
+        if os.path.exists(index_path):
+            self.lexical_index = BM25Index.load(index_path)
+        else:
+            stored = self.open_vector_store().get(include=["documents"])
+            self.lexical_index = BM25Index()
+            for doc_id, text in zip(stored["ids"], stored["documents"]):
+                self.lexical_index.add(doc_id, text)
+            self.lexical_index.save(index_path)
+
+    @staticmethod
+    def _listings_fingerprint(path: str) -> str:
+        """Cheap fingerprint of the listing files (name, size, mtime) to skip no-op syncs."""
+        entries = []
+        for filename in sorted(os.listdir(path)):
+            stat = os.stat(os.path.join(path, filename))
+            entries.append([filename, stat.st_size, stat.st_mtime_ns])
+        return hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()
+
+    def _read_manifest(self) -> Dict:
+        manifest_path = os.path.join(self.persist_dir, self.manifest_name)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict):
+        with open(os.path.join(self.persist_dir, self.manifest_name), "w") as f:
+            json.dump(manifest, f)
+
+    def build_retriever(self):
+        """
+        This method will open the persisted chromadb vector store, sync it with the listings
+        and return it as a retriever
+        """
+
+        # sync the vectorestore (chromadb >= 0.4 persists every write automatically)
+        self.sync_index(self.listings_dir)
+        vector_store = self.open_vector_store()
+        if settings.VECTOR_BACKEND == "numpy":
+            # filter on the synced table instead of decoding every stored record
+            vector_store.attach_listing_table(self.listing_table)
+
+        # wrap the vectorestore in a retriever that can filter on buyer preferences
+        retriever = ListingRetriever(
+            vector_store=vector_store,
+            listing_table=self.listing_table,
+            lexical_index=self.lexical_index,
+            mode=settings.RETRIEVER_MODE,
+            k=5,  # number of listings to return on each query (tweak as you like)
+            reranker=get_reranker() if settings.RERANK_ENABLED else None,
+            rerank_candidates=settings.RERANK_CANDIDATES,
+            speculative_candidates=settings.SPECULATIVE_CANDIDATES,
+            reuse_similarity=settings.SPECULATIVE_REUSE_SIMILARITY,
+        )
 
         logger.info(f"✅ listings retriever has been successfully created")
 
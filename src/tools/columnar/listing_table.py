@@ -0,0 +1,237 @@
+"""
+listing_table.py
+~~~~~~~~~~~~~~~~
+Typed, column-oriented copy of the listing metadata.
+
+• One NumPy array per attribute (int32 prices / sizes, int8 rooms), plus a
+  dictionary-encoded neighborhood column.
+• Sorted indexes on price and size answer range queries with two
+  `searchsorted` calls; the remaining bounds are vectorized comparisons.
+• Rows line up with the listing ids (content hashes) used by the vector store.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.tools.filters.listing_filter import ListingFilter, parse_sqft
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+class ListingTable:
+    """Columnar listing metadata with sorted indexes for range filters."""
+
+    # metadata key -> column dtype
+    numeric_columns: Dict[str, np.dtype] = {
+        "price": np.int32,
+        "bedrooms": np.int8,
+        "bathrooms": np.int8,
+        "house_size_sqft": np.int32,
+    }
+    indexed_columns = ("price", "house_size_sqft")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        neighborhood_codes: np.ndarray,
+        neighborhoods: List[str],
+    ) -> None:
+        self.ids = ids  # (n, 32) uint8: raw SHA-256 content hashes
+        self.columns = columns
+        self.neighborhood_codes = neighborhood_codes
+        self.neighborhoods = neighborhoods
+
+        # sorted indexes: row order and the column values in that order
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for name in self.indexed_columns:
+            order = np.argsort(columns[name], kind="stable").astype(np.int32)
+            self._sorted[name] = (order, columns[name][order])
+
+        self._hex_ids: Optional[np.ndarray] = None
+        self._row_by_id: Optional[Dict[str, int]] = None
+
+    # ------------------------------------------------------------------ #
+    # Construction / persistence                                         #
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_metadata(cls, metadatas: Iterable[Dict]) -> "ListingTable":
+        """Build the table from per-listing metadata dicts (as stored in the index)."""
+        metadatas = list(metadatas)
+        vocabulary: Dict[str, int] = {}
+
+        ids = np.frombuffer(
+            b"".join(bytes.fromhex(m["content_hash"]) for m in metadatas),
+            dtype=np.uint8,
+        ).reshape(len(metadatas), 32)
+        columns = {
+            name: np.fromiter(
+                (cls._numeric_value(m, name) for m in metadatas),
+                dtype=dtype,
+                count=len(metadatas),
+            )
+            for name, dtype in cls.numeric_columns.items()
+        }
+        codes = np.fromiter(
+            (
+                vocabulary.setdefault(m.get("neighborhood", ""), len(vocabulary))
+                for m in metadatas
+            ),
+            dtype=np.int32,
+            count=len(metadatas),
+        )
+
+        return cls(ids, columns, codes, list(vocabulary))
+
+    @classmethod
+    def concat(cls, tables: List["ListingTable"]) -> "ListingTable":
+        """Stack tables built chunk by chunk, merging their neighborhood vocabularies."""
+        if not tables:
+            return cls.from_metadata([])
+
+        vocabulary: Dict[str, int] = {}
+        codes = []
+        for table in tables:
+            remap = np.array(
+                [
+                    vocabulary.setdefault(n, len(vocabulary))
+                    for n in table.neighborhoods
+                ],
+                dtype=np.int32,
+            )
+            codes.append(remap[table.neighborhood_codes])
+
+        return cls(
+            np.concatenate([table.ids for table in tables]),
+            {
+                name: np.concatenate([table.columns[name] for table in tables])
+                for name in cls.numeric_columns
+            },
+            np.concatenate(codes),
+            list(vocabulary),
+        )
+
+    @staticmethod
+    def _numeric_value(metadata: Dict, name: str) -> int:
+        value = metadata.get(name)
+        if value is None and name == "house_size_sqft":
+            value = parse_sqft(metadata.get("house_size"))
+        return int(value or 0)
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            ids=self.ids,
+            neighborhood_codes=self.neighborhood_codes,
+            neighborhoods=np.array(self.neighborhoods, dtype=str),
+            **{f"column_{name}": values for name, values in self.columns.items()},
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ListingTable":
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[f"column_{name}"] for name in cls.numeric_columns}
+            return cls(
+                data["ids"],
+                columns,
+                data["neighborhood_codes"],
+                data["neighborhoods"].tolist(),
+            )
+
+    # ------------------------------------------------------------------ #
+    # Queries                                                            #
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def range_rows(
+        self, column: str, low: Optional[int] = None, high: Optional[int] = None
+    ) -> np.ndarray:
+        """Rows with `low <= column <= high`, answered from the sorted index."""
+        order, values = self._sorted[column]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = len(values) if high is None else np.searchsorted(values, high, "right")
+        return order[start:stop]
+
+    def filter_rows(self, listing_filter: ListingFilter) -> np.ndarray:
+        """Sorted row numbers of the listings that satisfy `listing_filter`."""
+        bounds = listing_filter.column_bounds()
+
+        # seed candidates from the most selective sorted index, if any applies
+        rows = None
+        for column in self.indexed_columns:
+            if column in bounds:
+                candidates = self.range_rows(column, *bounds[column])
+                if rows is None or len(candidates) < len(rows):
+                    rows, seeded_by = candidates, column
+        if rows is None:
+            rows, seeded_by = np.arange(len(self), dtype=np.int32), None
+
+        # check every other bound with one vectorized comparison per column
+        for column, (low, high) in bounds.items():
+            if column == seeded_by:
+                continue
+            values = self.columns[column][rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            rows = rows[keep]
+
+        return np.sort(rows)
+
+    def count(self, listing_filter: ListingFilter) -> int:
+        return len(self.filter_rows(listing_filter))
+
+    def neighborhood_rows(self, neighborhood: str) -> np.ndarray:
+        """Rows in a given neighborhood (one integer comparison over the code column)."""
+        if neighborhood not in self.neighborhoods:
+            return np.empty(0, dtype=np.int32)
+        code = self.neighborhoods.index(neighborhood)
+        return np.flatnonzero(self.neighborhood_codes == code)
+
+    @property
+    def hex_ids(self) -> np.ndarray:
+        """Listing ids (hex content hashes) of every row, indexable with row arrays."""
+        if self._hex_ids is None:
+            # two hex digits per byte, looked up for the whole (n, 32) array at once
+            digits = np.empty((len(self), 64), dtype=np.uint8)
+            digits[:, 0::2] = _HEX_DIGITS[self.ids >> 4]
+            digits[:, 1::2] = _HEX_DIGITS[self.ids & 0x0F]
+            self._hex_ids = digits.view("S64").ravel().astype(str)
+        return self._hex_ids
+
+    def rows_for_ids(self, ids: Iterable[str]) -> np.ndarray:
+        """Row numbers for listing ids (unknown ids are skipped)."""
+        if self._row_by_id is None:
+            self._row_by_id = {i: row for row, i in enumerate(self.hex_ids.tolist())}
+        rows = [self._row_by_id[i] for i in ids if i in self._row_by_id]
+        return np.array(rows, dtype=np.int32)
+
+    def id_at(self, row: int) -> str:
+        """Listing id (hex content hash) of a row."""
+        return self.ids[row].tobytes().hex()
+
+    def metadata(self, row: int) -> Dict:
+        """Rebuild the metadata dict of a single row, e.g. for a search hit."""
+        sqft = int(self.columns["house_size_sqft"][row])
+        return {
+            "content_hash": self.id_at(row),
+            "neighborhood": self.neighborhoods[self.neighborhood_codes[row]],
+            "price": int(self.columns["price"][row]),
+            "bedrooms": int(self.columns["bedrooms"][row]),
+            "bathrooms": int(self.columns["bathrooms"][row]),
+            "house_size": f"{sqft} sqft",
+            "house_size_sqft": sqft,
+        }
+
+    def nbytes(self) -> int:
+        """Memory held by the arrays (columns, codes, ids and sorted indexes)."""
+        total = self.ids.nbytes + self.neighborhood_codes.nbytes
+        total += sum(values.nbytes for values in self.columns.values())
+        total += sum(o.nbytes + v.nbytes for o, v in self._sorted.values())
+        return total + sum(len(name) for name in self.neighborhoods)
@@ -0,0 +1,130 @@
+"""
+context_builder.py
+~~~~~~~~~~~~~~~~~~
+Token-budgeted listings context for the RAG prompt, instead of pasting the
+full description and neighborhood description of every retrieved listing.
+
+• Each listing is one compact structured line (price, beds, baths, size,
+  neighborhood) plus an excerpt made of its sentences that share the most
+  terms with the buyer's query and amenities, kept in their original order.
+• The budget (RAG_CONTEXT_TOKEN_BUDGET) covers the whole context: the
+  structured lines come first, then the remaining tokens are shared between
+  the excerpts, and whatever a short listing leaves unused goes to the next.
+• Listings keep the retrieval order; when even the structured lines do not
+  fit, the last listings are dropped.
+• `ContextStats` reports the tokens the context used and the tokens saved
+  against the full text.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.tools.lexical.bm25_index import tokenize
+from src.tools.tracing.spans import estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class ContextStats:
+    listings: int  # listings rendered
+    dropped: int  # listings left out because the structured lines did not fit
+    tokens: int  # estimated tokens of the built context
+    full_tokens: int  # estimated tokens of the full listing texts
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_tokens - self.tokens
+
+
+def listing_line(index: int, metadata: dict) -> str:
+    """e.g. '[1] $600,000 | 3 bd | 2 ba | 2,000 sqft | Maple Heights'"""
+    fields = []
+    if metadata.get("price"):
+        fields.append(f"${int(metadata['price']):,}")
+    if metadata.get("bedrooms"):
+        fields.append(f"{metadata['bedrooms']} bd")
+    if metadata.get("bathrooms"):
+        fields.append(f"{metadata['bathrooms']} ba")
+    if metadata.get("house_size_sqft"):
+        fields.append(f"{int(metadata['house_size_sqft']):,} sqft")
+    elif metadata.get("house_size"):
+        fields.append(str(metadata["house_size"]))
+    if metadata.get("neighborhood"):
+        fields.append(str(metadata["neighborhood"]))
+    return f"[{index}] " + " | ".join(fields)
+
+
+def excerpt(text: str, query_terms: set, budget: int) -> str:
+    """The sentences of `text` most relevant to the query, within `budget` tokens."""
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text.strip()
+
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    # most query terms first, earlier sentences (the summary) break ties
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(query_terms.intersection(tokenize(sentences[i]))), i),
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+
+    if not chosen:
+        # not even one whole sentence fits: cut the best one at a word boundary
+        words, kept = sentences[ranked[0]].split(), []
+        for word in words:
+            if estimate_tokens(" ".join(kept + [word]) + " …") > budget:
+                break
+            kept.append(word)
+        return " ".join(kept) + " …" if kept else ""
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def build_context(
+    docs: Sequence[Document],
+    query: str,
+    preferences: Optional[BuyerPreferences] = None,
+    token_budget: int = 600,
+) -> Tuple[str, ContextStats]:
+    """Render `docs` for the prompt within `token_budget` (estimated) tokens."""
+    amenities = (preferences and preferences.amenities) or []
+    query_terms = set(tokenize(" ".join([query, *amenities])))
+
+    lines = [listing_line(i + 1, doc.metadata) for i, doc in enumerate(docs)]
+    # the structured lines are the part the llm cannot do without
+    kept, used = 0, 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        kept, used = kept + 1, used + cost
+
+    blocks = []
+    remaining = token_budget - used
+    for i in range(kept):
+        allowance = remaining // (kept - i)
+        text = excerpt(docs[i].page_content, query_terms, allowance - 1)
+        cost = estimate_tokens(text) + 1 if text else 0
+        remaining -= cost
+        blocks.append(f"{lines[i]}\n{text}" if text else lines[i])
+
+    context = "\n\n".join(blocks)
+    full_text = "\n\n".join(doc.page_content for doc in docs)
+    return context, ContextStats(
+        listings=kept,
+        dropped=len(docs) - kept,
+        tokens=estimate_tokens(context),
+        full_tokens=estimate_tokens(full_text),
+    )
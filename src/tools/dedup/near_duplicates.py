@@ -0,0 +1,129 @@
+"""
+near_duplicates.py
+~~~~~~~~~~~~~~~~~~
+Online near-duplicate detection for generated listings.
+
+• Exact match on the normalized neighborhood name (a set lookup).
+• MinHash signatures of the description's word shingles, indexed with LSH
+  banding: a new description is only compared with the listings that share
+  at least one band bucket, so a check costs the same for 100 or 100k
+  listings already accepted.
+• A candidate is a near duplicate when the estimated Jaccard similarity of
+  the shingle sets reaches `threshold`.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+
+
+def normalize_neighborhood(name: str) -> str:
+    return " ".join(_WORD.findall(name.lower()))
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over descriptions plus an exact neighborhood set."""
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 3,
+        check_neighborhood: bool = True,
+        seed: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.check_neighborhood = check_neighborhood
+
+        # h(x) = (a * x + b) mod p; a < 2**31 keeps a * x + b inside uint64
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+        self.neighborhoods: Set[str] = set()
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)  # grown x2
+        self._count = 0
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32 values) of the text's word shingles."""
+        words = _WORD.findall(text.lower())
+        size = min(self.shingle_size, max(len(words), 1))
+        shingles = {
+            zlib.crc32(" ".join(words[i : i + size]).encode("utf-8"))
+            for i in range(max(len(words) - size + 1, 1))
+        }
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def find_duplicate(
+        self, neighborhood: str, text: str
+    ) -> Tuple[Optional[str], np.ndarray]:
+        """
+        Reason the listing duplicates an accepted one ("neighborhood" or "description"),
+        or None; also returns the description's signature so `add` can reuse it.
+        """
+        signature = self.signature(text)
+        if (
+            self.check_neighborhood
+            and normalize_neighborhood(neighborhood) in self.neighborhoods
+        ):
+            return "neighborhood", signature
+
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        if candidates:
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self._signatures[rows] == signature).mean(axis=1)
+            if similarity.max() >= self.threshold:
+                return "description", signature
+
+        return None, signature
+
+    def add(
+        self, neighborhood: str, text: str, signature: Optional[np.ndarray] = None
+    ) -> None:
+        if signature is None:
+            signature = self.signature(text)
+        row = self._count
+        if row == len(self._signatures):
+            grown = np.empty((2 * row, self.num_perm), dtype=np.uint32)
+            grown[:row] = self._signatures
+            self._signatures = grown
+        self._signatures[row] = signature
+        self._count += 1
+        self.neighborhoods.add(normalize_neighborhood(neighborhood))
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(row)
+
+    def check_and_add(self, neighborhood: str, text: str) -> Optional[str]:
+        """Add the listing unless it is a duplicate; returns the rejection reason, if any."""
+        reason, signature = self.find_duplicate(neighborhood, text)
+        if reason is None:
+            self.add(neighborhood, text, signature)
+        return reason
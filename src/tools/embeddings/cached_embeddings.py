@@ -0,0 +1,213 @@
+"""
+cached_embeddings.py
+~~~~~~~~~~~~~~~~~~~~
+Disk-backed embedding cache shared by listing ingestion and buyer queries.
+
+• Vectors are keyed by model name + SHA-256 of the normalized text.
+• An in-memory LRU sits in front of a SQLite file; the file is trimmed
+  (least recently used first) once it grows past a byte budget.
+• Hit / miss counters are exposed through `stats()`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap any LangChain embedding model with a two-level (memory + SQLite) cache."""
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        model_name: str,
+        cache_path: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        lru_size: int = 10_000,
+    ) -> None:
+        self.embedding_model = embedding_model
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.lru_size = lru_size
+
+        self._lru: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()  # Streamlit serves sessions from several threads
+
+        # counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, nbytes INTEGER, last_access REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+        )
+        self._db.commit()
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    # ------------------------------------------------------------------ #
+    # Embeddings interface                                               #
+    # ------------------------------------------------------------------ #
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch, running the model only on texts that are not cached yet."""
+        keys = [self.cache_key(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        # embed every distinct missing text exactly once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if missing:
+            computed = self.embedding_model.embed_documents(list(missing.values()))
+            vectors.update(self._store(dict(zip(missing, computed))))
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a (cleaned) buyer query through the same cache."""
+        key = self.cache_key(text)
+        vectors = self._lookup([key])
+
+        if key not in vectors:
+            computed = self.embedding_model.embed_query(text)
+            vectors.update(self._store({key: computed}))
+
+        return vectors[key]
+
+    def lookup(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vector of each text, None for the texts that were never embedded."""
+        keys = [self.cache_key(text) for text in texts]
+        vectors = self._lookup(keys)
+        return [vectors.get(key) for key in keys]
+
+    def put(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Cache vectors computed outside this wrapper (e.g. by worker processes)."""
+        self._store({self.cache_key(t): v for t, v in zip(texts, vectors)})
+
+    # ------------------------------------------------------------------ #
+    # Cache helpers                                                      #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Unicode-normalize and collapse whitespace so trivially different texts share a key."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(self.normalize(text).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def stats(self) -> Dict[str, float]:
+        """Hit / miss counters since the process started."""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Resolve keys from the LRU first, then from SQLite, counting hits and misses."""
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                    self.memory_hits += 1
+
+            pending = list(dict.fromkeys(key for key in keys if key not in found))
+            if pending:
+                now = time.time()
+                # chunked to stay under SQLite's bound-variable limit
+                for start in range(0, len(pending), 500):
+                    chunk = pending[start : start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array("f", blob).tolist()
+                        self._remember(key, found[key])
+                    if rows:
+                        self._db.executemany(
+                            "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                            [(now, key) for key, _ in rows],
+                        )
+                self._db.commit()
+                self.disk_hits += sum(1 for key in pending if key in found)
+
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return found
+
+    def _store(self, computed: Dict[str, List[float]]) -> Dict[str, List[float]]:
+        """Write freshly computed vectors to both cache levels and enforce the byte budget."""
+        now = time.time()
+        rows = []
+        for key, vector in computed.items():
+            blob = array("f", vector).tobytes()
+            rows.append((key, self.model_name, blob, len(blob), now))
+
+        with self._lock:
+            for key, vector in computed.items():
+                self._remember(key, list(vector))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+            self._disk_bytes += sum(row[3] for row in rows)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+        return {key: list(vector) for key, vector in computed.items()}
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _evict(self) -> None:
+        """Drop least recently used rows until the file is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._disk_bytes > target:
+            rows = self._db.execute(
+                "SELECT key, nbytes FROM embeddings ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            for key, nbytes in rows:
+                if self._disk_bytes <= target:
+                    break
+                self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._disk_bytes -= nbytes
+                evicted += 1
+        self._db.commit()
+        logger.info(f"🧹 Evicted {evicted} embeddings from {self.cache_path}")
@@ -0,0 +1,107 @@
+"""
+compare_backends.py
+~~~~~~~~~~~~~~~~~~~
+Parity and throughput check of the int8 ONNX embedding backend against the
+fp32 PyTorch model, over the listings corpus.
+
+    python -m src.tools.embeddings.compare_backends --min-cosine 0.99
+
+Both models are run uncached so the timings measure real forward passes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+from loguru import logger
+
+from src.config import settings
+from src.tools.embeddings.onnx_embeddings import OnnxEmbeddings
+
+
+def load_listing_texts(path: str = "./src/listings/docs") -> List[str]:
+    """
+    The texts ChromaStore embeds, read the way it reads them (JSON and JSONL files)
+    """
+    # imported here: the store module builds its own embedding model on import
+    from src.tools.chromadb.chroma_store import ChromaStore
+
+    return [
+        doc.page_content
+        for batch in ChromaStore.iter_document_batches(path)
+        for doc in batch
+    ]
+
+
+def timed_embed(
+    embed: Callable[[List[str]], List[List[float]]], texts: List[str]
+) -> Tuple[np.ndarray, float]:
+    """Embed `texts` once for warm-up, then again timed; return vectors and texts/sec."""
+    embed(texts[: min(8, len(texts))])
+    start = time.perf_counter()
+    vectors = np.asarray(embed(texts), dtype=np.float32)
+    return vectors, len(texts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--listings", default="./src/listings/docs")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.99,
+        help="fail if the mean cosine agreement drops below this value",
+    )
+    args = parser.parse_args()
+
+    texts = load_listing_texts(args.listings)
+    logger.info(f"Comparing embedding backends on {len(texts)} listings")
+
+    fp32_model = HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": args.batch_size},
+    )
+    int8_model = OnnxEmbeddings(
+        model_name=settings.EMBEDDING_MODEL_NAME,
+        model_dir=settings.ONNX_MODEL_DIR,
+        batch_size=args.batch_size,
+    )
+
+    fp32_vectors, fp32_rate = timed_embed(fp32_model.embed_documents, texts)
+    int8_vectors, int8_rate = timed_embed(int8_model.embed_documents, texts)
+
+    # both backends return unit vectors, so the row-wise dot product is the cosine
+    fp32_vectors /= np.linalg.norm(fp32_vectors, axis=1, keepdims=True)
+    int8_vectors /= np.linalg.norm(int8_vectors, axis=1, keepdims=True)
+    cosines = np.sum(fp32_vectors * int8_vectors, axis=1)
+
+    # does the quantized model rank the corpus the same way for each listing?
+    fp32_top = np.argsort(-(fp32_vectors @ fp32_vectors.T), axis=1)[:, 1:6]
+    int8_top = np.argsort(-(int8_vectors @ int8_vectors.T), axis=1)[:, 1:6]
+    top5_overlap = np.mean(
+        [len(set(a) & set(b)) / 5 for a, b in zip(fp32_top, int8_top)]
+    )
+
+    print(f"listings            : {len(texts)}")
+    print(f"cosine mean / min   : {cosines.mean():.4f} / {cosines.min():.4f}")
+    print(f"cosine p5           : {np.percentile(cosines, 5):.4f}")
+    print(f"top-5 neighbour overlap: {top5_overlap:.2%}")
+    print(f"fp32 torch          : {fp32_rate:8.1f} texts/sec")
+    print(f"int8 onnx           : {int8_rate:8.1f} texts/sec")
+    print(f"speed-up            : {int8_rate / fp32_rate:.2f}x")
+
+    if cosines.mean() < args.min_cosine:
+        raise SystemExit(
+            f"❌ parity check failed: mean cosine {cosines.mean():.4f} < {args.min_cosine}"
+        )
+    print("✅ parity check passed")
+
+
+if __name__ == "__main__":
+    main()
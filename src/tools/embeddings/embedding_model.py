@@ -0,0 +1,56 @@
+"""
+embedding_model.py
+~~~~~~~~~~~~~~~~~~
+Single entry point for the project's embedding model, so ingestion and
+queries share one model instance and one embedding cache per process.
+"""
+
+from functools import lru_cache
+
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from src.config import settings
+from src.tools.embeddings.cached_embeddings import CachedEmbeddings
+
+
+def build_base_embedding_model(backend: str = settings.EMBEDDING_BACKEND) -> Embeddings:
+    """Build the uncached embedding model for the selected backend."""
+
+    if backend == "hashing":
+        from src.tools.embeddings.hashing_embeddings import HashingEmbeddings
+
+        return HashingEmbeddings()
+
+    if backend == "onnx-int8":
+        # imported lazily: onnxruntime is only needed when this backend is selected
+        from src.tools.embeddings.onnx_embeddings import OnnxEmbeddings
+
+        return OnnxEmbeddings(
+            model_name=settings.EMBEDDING_MODEL_NAME,
+            model_dir=settings.ONNX_MODEL_DIR,
+        )
+
+    return HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": "cpu"},  # or "cuda" if GPU is available
+    )
+
+
+@lru_cache(maxsize=None)
+def get_embedding_model() -> CachedEmbeddings:
+    """Return the process-wide, cache-backed embedding model."""
+
+    # quantized vectors are close to, but not identical with, the fp32 ones:
+    # keep them under their own cache namespace
+    cache_namespace = settings.EMBEDDING_MODEL_NAME
+    if settings.EMBEDDING_BACKEND != "torch":
+        cache_namespace = f"{cache_namespace}:{settings.EMBEDDING_BACKEND}"
+
+    return CachedEmbeddings(
+        build_base_embedding_model(),
+        model_name=cache_namespace,
+        cache_path=settings.EMBEDDING_CACHE_PATH,
+        max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+        lru_size=settings.EMBEDDING_CACHE_LRU_SIZE,
+    )
@@ -0,0 +1,46 @@
+"""
+hashing_embeddings.py
+~~~~~~~~~~~~~~~~~~~~~
+Offline, deterministic embedding model for benchmarks and local runs without
+the HuggingFace model (EMBEDDING_BACKEND=hashing).
+
+• Signed feature hashing of word unigrams and bigrams into `dim` buckets,
+  L2-normalized: texts sharing words get close vectors, so retrieval and the
+  semantic caches behave like they do with a real model.
+• No model download, microseconds per text.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words feature hashing embeddings."""
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
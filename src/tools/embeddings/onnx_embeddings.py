@@ -0,0 +1,138 @@
+"""
+onnx_embeddings.py
+~~~~~~~~~~~~~~~~~~
+Optional CPU embedding backend: bge-base exported to ONNX and dynamically
+quantized to int8, run with onnxruntime instead of fp32 PyTorch.
+
+The first use exports and quantizes the model into `model_dir`; later
+processes only load the quantized file.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class OnnxEmbeddings(Embeddings):
+    """bge-style embeddings (CLS pooling + L2 norm) from an int8 ONNX export."""
+
+    onnx_file = "model_int8.onnx"
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-base-en-v1.5",
+        model_dir: str = "./src/tools/embeddings/onnx/bge-base-en-v1.5-int8",
+        batch_size: int = 32,
+        max_length: int = 512,
+    ) -> None:
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend needs onnxruntime and transformers: "
+                "uv pip install -e '.[onnx]'"
+            ) from e
+
+        self.model_name = model_name
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        model_path = os.path.join(model_dir, self.onnx_file)
+        if not os.path.exists(model_path):
+            self.export_quantized(model_name, model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.session = ort.InferenceSession(
+            model_path, session_options, providers=["CPUExecutionProvider"]
+        )
+        self._session_inputs = {i.name for i in self.session.get_inputs()}
+        logger.info(f"✅ Loaded int8 ONNX embedding model from {model_path}")
+
+    @classmethod
+    def export_quantized(cls, model_name: str, model_dir: str) -> str:
+        """Export the HuggingFace model to ONNX and quantize its weights to int8."""
+        try:
+            import torch
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "Exporting the ONNX embedding model needs torch, transformers and onnx: "
+                "uv pip install -e '.[onnx]'"
+            ) from e
+
+        os.makedirs(model_dir, exist_ok=True)
+        fp32_path = os.path.join(model_dir, "model_fp32.onnx")
+        int8_path = os.path.join(model_dir, cls.onnx_file)
+
+        logger.info(f"📦 Exporting {model_name} to ONNX in {model_dir} ...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in cls.input_names),
+                fp32_path,
+                input_names=cls.input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    name: {0: "batch", 1: "sequence"}
+                    for name in cls.input_names + ["last_hidden_state"]
+                },
+                opset_version=17,
+                dynamo=False,
+            )
+
+        # dynamic quantization: int8 weights, activations quantized on the fly
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+        tokenizer.save_pretrained(model_dir)
+
+        logger.info(f"✅ Saved int8 ONNX model → {int8_path}")
+        return int8_path
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [
+            self._encode(texts[start : start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np",
+        )
+        feeds = {
+            name: encoded[name].astype(np.int64)
+            for name in self.input_names
+            if name in self._session_inputs and name in encoded
+        }
+        last_hidden_state = self.session.run(None, feeds)[0]
+
+        # bge uses the [CLS] token as the sentence embedding, then L2-normalizes it
+        cls_vectors = last_hidden_state[:, 0]
+        norms = np.linalg.norm(cls_vectors, axis=1, keepdims=True)
+        return cls_vectors / np.clip(norms, 1e-12, None)
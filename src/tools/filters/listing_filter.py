@@ -0,0 +1,195 @@
+"""
+listing_filter.py
+~~~~~~~~~~~~~~~~~
+Turn the structured fields of `BuyerPreferences` (bedrooms, bathrooms,
+house_size, price_range) into metadata filters for the listings index.
+
+• Free-text sizes and budgets ("2,000 sqft", "under $600k", "$400k-$550k")
+  are parsed into integers.
+• `relaxation_ladder` returns progressively looser filters (wider price and
+  size tolerances, then dropping constraints) so a search can fall back
+  gradually when a strict filter matches fewer than k listings.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Tuple
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+
+# (price tolerance, size tolerance, room tolerance) per step — None drops the constraint
+RELAXATION_STEPS: List[Dict[str, Optional[float]]] = [
+    {"price": 0.05, "size": 0.15, "rooms": 0},
+    {"price": 0.15, "size": 0.30, "rooms": 1},
+    {"price": 0.30, "size": None, "rooms": 1},
+    {"price": None, "size": None, "rooms": None},
+]
+
+_AMOUNT = re.compile(
+    r"(\d[\d,]*(?:\.\d+)?)\s*(?:(k|m|mm|million|thousand)(?![a-z]))?",
+    flags=re.IGNORECASE,
+)
+_MULTIPLIERS = {
+    "k": 1_000,
+    "thousand": 1_000,
+    "m": 1_000_000,
+    "mm": 1_000_000,
+    "million": 1_000_000,
+}
+_RANGE_SEPARATOR = re.compile(r"\s*(?:-|–|to|and)\s*\$?\s*", flags=re.IGNORECASE)
+_LOWER_BOUND_WORDS = re.compile(
+    r"\b(over|above|at least|min(imum)?|from|more than|starting)\b", flags=re.IGNORECASE
+)
+
+
+def parse_amounts(text: Optional[str]) -> List[int]:
+    """Every number in `text` as an integer, honouring k / m suffixes ("$1.2m", "600-700k")."""
+    if not text:
+        return []
+
+    matches = list(_AMOUNT.finditer(text))
+    amounts = []
+    for i, match in enumerate(matches):
+        value = float(match.group(1).replace(",", ""))
+        suffix = match.group(2)
+        following = matches[i + 1] if i + 1 < len(matches) else None
+        if (
+            not suffix
+            and following is not None
+            and following.group(2)
+            and _RANGE_SEPARATOR.fullmatch(text[match.end() : following.start()])
+            and value <= float(following.group(1).replace(",", ""))
+        ):
+            # the low end of a range borrows the unit of the high end: "2-3k", "1.5 to
+            # 2m"; other numbers of the text ("2 bed, under 600k") keep their own
+            suffix = following.group(2)
+        amounts.append(int(value * _MULTIPLIERS.get((suffix or "").lower(), 1)))
+    return amounts
+
+
+def parse_sqft(text: Optional[str]) -> Optional[int]:
+    """Living area as an integer number of square feet ("2150 sqft" -> 2150)."""
+    amounts = parse_amounts(text)
+    return amounts[0] if amounts else None
+
+
+def parse_price_range(text: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    (min_price, max_price) from a budget string. A single amount is read as a ceiling
+    ("$600k", "under 600k") unless phrased as a floor ("at least $400k").
+    """
+    amounts = parse_amounts(text)
+    if not amounts:
+        return None, None
+    if len(amounts) >= 2:
+        return min(amounts), max(amounts)
+    if _LOWER_BOUND_WORDS.search(text):
+        return amounts[0], None
+    return None, amounts[0]
+
+
+@dataclass(frozen=True)
+class ListingFilter:
+    """Numeric bounds on listing metadata; `None` means unconstrained."""
+
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    min_bedrooms: Optional[int] = None
+    min_bathrooms: Optional[int] = None
+    min_sqft: Optional[int] = None
+    max_sqft: Optional[int] = None
+
+    # metadata key and comparison operator for every bound
+    _BOUNDS = {
+        "min_price": ("price", "$gte"),
+        "max_price": ("price", "$lte"),
+        "min_bedrooms": ("bedrooms", "$gte"),
+        "min_bathrooms": ("bathrooms", "$gte"),
+        "min_sqft": ("house_size_sqft", "$gte"),
+        "max_sqft": ("house_size_sqft", "$lte"),
+    }
+
+    @classmethod
+    def from_preferences(
+        cls, prefs: BuyerPreferences, step: Dict[str, Optional[float]]
+    ) -> "ListingFilter":
+        """Build the filter for one relaxation step (see `RELAXATION_STEPS`)."""
+        bounds = {}
+
+        if step["price"] is not None:
+            min_price, max_price = parse_price_range(prefs.price_range)
+            if min_price is not None:
+                bounds["min_price"] = int(min_price * (1 - step["price"]))
+            if max_price is not None:
+                bounds["max_price"] = int(max_price * (1 + step["price"]))
+
+        if step["rooms"] is not None:
+            if prefs.bedrooms:
+                bounds["min_bedrooms"] = max(prefs.bedrooms - int(step["rooms"]), 0)
+            if prefs.bathrooms:
+                bounds["min_bathrooms"] = max(prefs.bathrooms - int(step["rooms"]), 0)
+
+        sqft = parse_sqft(prefs.house_size)
+        if step["size"] is not None and sqft:
+            bounds["min_sqft"] = int(sqft * (1 - step["size"]))
+            bounds["max_sqft"] = int(sqft * (1 + step["size"]))
+
+        return cls(**bounds)
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, f.name) is None for f in fields(self))
+
+    def column_bounds(self) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """(low, high) per metadata key that carries at least one bound."""
+        bounds: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+        for name, (key, operator) in self._BOUNDS.items():
+            value = getattr(self, name)
+            if value is None:
+                continue
+            low, high = bounds.get(key, (None, None))
+            bounds[key] = (value, high) if operator == "$gte" else (low, value)
+        return bounds
+
+    def to_chroma_where(self) -> Optional[Dict]:
+        """Chroma `where` clause, or None when there is nothing to filter on."""
+        conditions = [
+            {key: {operator: getattr(self, name)}}
+            for name, (key, operator) in self._BOUNDS.items()
+            if getattr(self, name) is not None
+        ]
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def matches(self, metadata: Dict) -> bool:
+        """Check one listing's metadata against the filter (for non-Chroma callers)."""
+        for name, (key, operator) in self._BOUNDS.items():
+            bound = getattr(self, name)
+            if bound is None:
+                continue
+            value = metadata.get(key)
+            if value is None:
+                return False
+            if operator == "$gte" and value < bound:
+                return False
+            if operator == "$lte" and value > bound:
+                return False
+        return True
+
+
+def relaxation_ladder(prefs: Optional[BuyerPreferences]) -> List[ListingFilter]:
+    """Distinct filters from strictest to unfiltered; always ends with an empty filter."""
+    ladder: List[ListingFilter] = []
+    if prefs is not None:
+        for step in RELAXATION_STEPS:
+            listing_filter = ListingFilter.from_preferences(prefs, step)
+            if listing_filter not in ladder:
+                ladder.append(listing_filter)
+
+    if not ladder or not ladder[-1].is_empty():
+        ladder.append(ListingFilter())
+    return ladder
@@ -0,0 +1,39 @@
+"""
+embed_worker.py
+~~~~~~~~~~~~~~~
+Functions run inside the embedding worker processes of the parallel
+ingestion. Kept apart from the pipeline so that a spawned worker only
+imports the embedding model, not the vector store and its dependencies.
+"""
+
+import os
+from typing import List
+
+# per worker process: the embedding model, loaded once by `init_worker`
+_worker_model = None
+
+
+def init_worker(backend: str) -> None:
+    """Load the embedding model in a worker, one intra-op thread per process."""
+    global _worker_model
+
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    try:
+        import torch
+
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    from src.tools.embeddings.embedding_model import build_base_embedding_model
+
+    _worker_model = build_base_embedding_model(backend)
+
+
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_model.embed_documents(texts)
+
+
+def ready(_: object = None) -> int:
+    """No-op task used to start every worker (and load its model) up front."""
+    return os.getpid()
@@ -0,0 +1,228 @@
+"""
+parallel_ingest.py
+~~~~~~~~~~~~~~~~~~
+Bulk ingestion of a large listings corpus into the ChromaStore index, using
+every CPU core for the embeddings.
+
+    python -m src.tools.ingestion.parallel_ingest --batch-size 256 --workers 8
+
+Three stages run at the same time, connected by bounded queues:
+
+  parse  (thread)   stream the listing files as document batches and drop
+                    the listings that are already indexed
+  embed  (processes) one embedding model per worker process, one batch per task;
+                    texts found in the embedding cache are not sent to a worker
+  upsert (main)     store the worker vectors in the embedding cache, then
+                    bulk-upsert each embedded batch through
+                    `ChromaStore.ingest_embedded`, under the store's sync lock
+
+A final `sync_index` then rebuilds the columnar table, the BM25 index and the
+manifest; by then every listing is indexed, so it embeds nothing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from loguru import logger
+from tqdm import tqdm
+
+from src.config import settings
+from src.tools.chromadb.chroma_store import ChromaStore
+from src.tools.embeddings.cached_embeddings import CachedEmbeddings
+from src.tools.ingestion.embed_worker import embed_batch, init_worker, ready
+
+_DONE = object()  # end-of-stream marker on the queues
+
+
+class ParallelIngestion:
+    """parse → process-pool embed → bulk upsert, with bounded queues in between."""
+
+    def __init__(
+        self,
+        store: Optional[ChromaStore] = None,
+        batch_size: int = 256,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        backend: Optional[str] = None,
+    ) -> None:
+        self.store = store or ChromaStore()
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        # enough batches in flight to keep every worker busy, and no more
+        self.queue_size = queue_size or 2 * self.workers
+        self.backend = backend or settings.EMBEDDING_BACKEND
+
+    def run(self, path: str = "./src/listings/docs") -> Dict[str, float]:
+        """Ingest the listings under `path`; returns the throughput report."""
+        indexed = self.store.indexed_ids(self.batch_size)
+
+        parsed: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        embedding: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stats = {"parsed": 0, "embedded": 0, "cached": 0}
+        cache = self._embedding_cache()
+        busy = {"parse": 0.0, "embed_wait": 0.0, "upsert": 0.0}
+        errors: List[BaseException] = []
+
+        def parse() -> None:
+            try:
+                start = time.perf_counter()
+                for batch in self.store.iter_document_batches(path, self.batch_size):
+                    stats["parsed"] += len(batch)
+                    batch = [doc for doc in batch if doc.id not in indexed]
+                    indexed.update(doc.id for doc in batch)  # repeated listings
+                    if batch:
+                        busy["parse"] += time.perf_counter() - start
+                        parsed.put(batch)  # blocks while the embedders are behind
+                        start = time.perf_counter()
+                busy["parse"] += time.perf_counter() - start
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                parsed.put(_DONE)
+
+        def dispatch(pool: ProcessPoolExecutor) -> None:
+            try:
+                while (batch := parsed.get()) is not _DONE:
+                    texts = [doc.page_content for doc in batch]
+                    vectors = cache.lookup(texts) if cache else [None] * len(texts)
+                    missing = [text for text, v in zip(texts, vectors) if v is None]
+                    future = pool.submit(embed_batch, missing) if missing else None
+                    embedding.put((batch, vectors, missing, future))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                embedding.put(_DONE)
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(self.backend,),
+        ) as pool:
+            # start the workers and load their models before the clock starts
+            startup = time.perf_counter()
+            list(pool.map(ready, range(self.workers)))
+            startup = time.perf_counter() - startup
+
+            progress = tqdm(desc="Ingesting listings", unit="listing")
+            start = time.perf_counter()
+            threads = [
+                threading.Thread(target=parse, daemon=True),
+                threading.Thread(target=dispatch, args=(pool,), daemon=True),
+            ]
+            for thread in threads:
+                thread.start()
+
+            def embedded():
+                while (item := embedding.get()) is not _DONE:
+                    batch, vectors, missing, future = item
+                    waited = time.perf_counter()
+                    computed = future.result() if future else []
+                    upserting = time.perf_counter()
+                    busy["embed_wait"] += upserting - waited
+
+                    if cache and computed:
+                        cache.put(missing, computed)
+                    fresh = iter(computed)
+                    vectors = [v if v is not None else next(fresh) for v in vectors]
+                    stats["cached"] += len(batch) - len(missing)
+
+                    yield batch, vectors  # upserted before the next one is taken
+                    busy["upsert"] += time.perf_counter() - upserting
+                    stats["embedded"] += len(batch)
+                    progress.update(len(batch))
+
+            self.store.ingest_embedded(embedded())
+
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        progress.close()
+        if errors:
+            raise errors[0]
+
+        report = {
+            "parsed": stats["parsed"],
+            "embedded": stats["embedded"],
+            "skipped": stats["parsed"] - stats["embedded"],
+            "cache_hits": stats["cached"],
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "worker_startup_seconds": startup,
+            "seconds": elapsed,
+            "listings_per_second": stats["embedded"] / max(elapsed, 1e-9),
+            "parse_seconds": busy["parse"],
+            "embed_wait_seconds": busy["embed_wait"],
+            "upsert_seconds": busy["upsert"],
+        }
+
+        logger.info(
+            f"✅ embedded {report['embedded']} listings in {elapsed:.1f}s "
+            f"({report['listings_per_second']:.1f} listings/sec on {self.workers} workers)"
+        )
+
+        # table, BM25 index and manifest (nothing is left to embed at this point)
+        self.store.sync_index(path, self.batch_size)
+
+        return report
+
+    def _embedding_cache(self) -> Optional[CachedEmbeddings]:
+        """
+        The store's embedding cache, when the workers run the model it caches: worker
+        results go in it and listings already in it are not embedded again
+        """
+        model = self.store.embedding_model
+        if isinstance(model, CachedEmbeddings) and self.backend == (
+            settings.EMBEDDING_BACKEND
+        ):
+            return model
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--listings", default=ChromaStore.listings_dir)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="embedding processes (default: all cores)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=None,
+        help="batches buffered between stages (default: 2 x workers)",
+    )
+    args = parser.parse_args()
+
+    report = ParallelIngestion(
+        batch_size=args.batch_size, workers=args.workers, queue_size=args.queue_size
+    ).run(args.listings)
+
+    print(f"listings parsed     : {report['parsed']}")
+    print(f"embedded / skipped  : {report['embedded']} / {report['skipped']}")
+    print(f"embedding cache hits: {report['cache_hits']}")
+    print(f"workers x batch     : {report['workers']} x {report['batch_size']}")
+    print(f"worker startup      : {report['worker_startup_seconds']:.1f}s")
+    print(f"wall time           : {report['seconds']:.1f}s")
+    print(f"throughput          : {report['listings_per_second']:.1f} listings/sec")
+    print(
+        f"stage time (parse / waiting on embeddings / upsert): "
+        f"{report['parse_seconds']:.1f}s / {report['embed_wait_seconds']:.1f}s / "
+        f"{report['upsert_seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
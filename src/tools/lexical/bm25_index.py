@@ -0,0 +1,132 @@
+"""
+bm25_index.py
+~~~~~~~~~~~~~
+In-memory inverted index with Okapi BM25 scoring over the listing text
+(description + neighborhood description).
+
+• Unigrams and adjacent bigrams are indexed, so literal phrases such as
+  "solar panels" score higher than the two words far apart.
+• Listings are added / removed one by one, so the index follows the
+  incremental sync of the vector store instead of being rebuilt.
+• Saved as a JSON file next to the vector store.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its near of on or "
+    "that the this to with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased unigrams (minus stopwords) followed by adjacent bigrams."""
+    words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class BM25Index:
+    """Incrementally updatable BM25 index keyed by listing id."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {doc_id: tf}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, List[str]] = {}  # to unlink a doc on removal
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, text: str) -> None:
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = list(counts)
+        self.total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        if doc_id not in self.doc_lengths:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            docs = self.postings[term]
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(
+        self, query: str, k: int = 5, allowed_ids: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) for `query`, optionally restricted to `allowed_ids`."""
+        if not self.doc_lengths:
+            return []
+        allowed = set(allowed_ids) if allowed_ids is not None else None
+
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        scores: Dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (
+                    1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length
+                )
+                weight = idf * tf * (self.k1 + 1) / (tf + norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "k1": self.k1,
+                    "b": self.b,
+                    "postings": self.postings,
+                    "doc_lengths": self.doc_lengths,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        index = cls(k1=data["k1"], b=data["b"])
+        index.postings = data["postings"]
+        index.doc_lengths = data["doc_lengths"]
+        index.total_length = sum(index.doc_lengths.values())
+        for term, docs in index.postings.items():
+            for doc_id in docs:
+                index.doc_terms.setdefault(doc_id, []).append(term)
+        return index
+
+    @classmethod
+    def open_or_create(cls, path: str) -> "BM25Index":
+        return cls.load(path) if os.path.exists(path) else cls()
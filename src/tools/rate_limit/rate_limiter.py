@@ -0,0 +1,115 @@
+"""
+rate_limiter.py
+~~~~~~~~~~~~~~~
+Client-side pacing for calls to a rate-limited LLM provider.
+
+• `TokenBucket`: refills continuously up to its capacity; a call takes
+  `amount` units or learns how long to wait for them.
+• `RateLimiter`: one bucket for requests per minute and one for tokens per
+  minute. `acquire` waits until both allow the call, and `pause` holds every
+  caller back after the provider answered 429.
+• `backoff_delay` / `retry_after_seconds`: exponential backoff with full
+  jitter, unless the provider said how long to wait.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Optional
+
+from groq import RateLimitError
+
+
+class TokenBucket:
+    """Continuously refilling bucket of `capacity` units."""
+
+    def __init__(self, capacity: float, refill_per_second: float) -> None:
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.available = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(
+            self.capacity,
+            self.available + (now - self._updated) * self.refill_per_second,
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 when they already are)."""
+        self._refill()
+        # a single call larger than the bucket would wait forever: cap it at a full bucket
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.refill_per_second)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by concurrent callers."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+        # counters
+        self.rate_limited = 0
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request using about `tokens` tokens is allowed."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # callers queue on the lock, so they are served in arrival order
+        async with self._lock:
+            while True:
+                wait = max(
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                    self._paused_until - time.monotonic(),
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds` (e.g. after a 429 response)."""
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for the provider's RateLimitError and other errors with an HTTP 429 status."""
+    if isinstance(error, RateLimitError):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    # not the message: "429" also shows up in ids, prices or token counts
+    return status == 429
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The provider's `retry-after` header, when the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,180 @@
+"""
+cross_encoder_reranker.py
+~~~~~~~~~~~~~~~~~~~~~~~~~
+Optional second retrieval stage (RERANK_ENABLED): the retriever fetches the
+top-N candidates and a local CPU cross-encoder reorders them.
+
+• Every uncached (query, listing) pair is scored in one batched forward pass.
+• Scores are cached per (query, listing id) pair in an in-memory LRU, so
+  repeated and refined queries only score the listings they have not seen.
+• Latency budget: scoring runs in a worker thread. When it does not finish
+  within the budget, the dense order is returned. The pass still completes in
+  the background and fills the cache for the next query. A failing model
+  falls back the same way.
+• Listings that matched a stricter filter step still rank before looser ones;
+  the cross-encoder only reorders within a step.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from src.config import settings
+from src.tools.tracing.spans import tracer
+
+
+def listing_key(doc: Document) -> str:
+    return doc.metadata.get("content_hash") or doc.id or doc.page_content
+
+
+class CrossEncoderReranker:
+    """Batched, cached, time-boxed cross-encoder reranking of retrieved listings."""
+
+    def __init__(
+        self,
+        model: Any,
+        budget_ms: float = 300.0,
+        cache_size: int = 20_000,
+    ) -> None:
+        # `model` scores pairs: model.predict([(query, text), ...]) -> scores,
+        # e.g. a sentence_transformers CrossEncoder
+        self.model = model
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+
+        self._scores: OrderedDict[Tuple[str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+        # one worker: a pass that overran its budget delays the next one, whose own
+        # budget then falls back too, instead of piling up concurrent forward passes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+        # counters, updated under `_lock` (reranks run on several retrieval threads)
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.batches = 0
+
+    def rerank(
+        self,
+        query: str,
+        docs: List[Document],
+        k: int,
+        tiers: Optional[Sequence[int]] = None,
+    ) -> List[Document]:
+        """
+        Best `k` of `docs` by cross-encoder score. `tiers` (the filter step each doc
+        was found at) keeps stricter matches first; the dense order is the tie-break
+        and the fallback.
+        """
+        tiers = list(tiers) if tiers is not None else [0] * len(docs)
+        with tracer.span("rerank", documents=len(docs)) as span:
+            scores, cached = self._cached_scores(query, docs)
+            missing = [i for i, score in enumerate(scores) if score is None]
+            span.add(cached_pairs=cached, scored_pairs=len(missing))
+
+            if missing:
+                pairs = [(query, docs[i].page_content) for i in missing]
+                keys = [(query, listing_key(docs[i])) for i in missing]
+                future = self._executor.submit(self._score, pairs, keys)
+                try:
+                    new_scores = future.result(timeout=self.budget_ms / 1000)
+                except FutureTimeout:
+                    self._count_fallback()
+                    span.add(fallbacks=1)
+                    logger.warning(
+                        f"⏳ reranking {len(missing)} listings exceeded "
+                        f"{self.budget_ms:.0f} ms, keeping the dense order"
+                    )
+                    return docs[:k]
+                except Exception as e:
+                    self._count_fallback()
+                    span.add(fallbacks=1)
+                    logger.error(f"❌ reranking failed, keeping the dense order: {e}")
+                    return docs[:k]
+                for i, score in zip(missing, new_scores):
+                    scores[i] = score
+
+            order = sorted(range(len(docs)), key=lambda i: (tiers[i], -scores[i], i))
+            return [docs[i] for i in order[:k]]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._scores),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+        }
+
+    def _count_fallback(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
+
+    def _cached_scores(
+        self, query: str, docs: List[Document]
+    ) -> Tuple[List[Optional[float]], int]:
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for doc in docs:
+                key = (query, listing_key(doc))
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+            cached = sum(score is not None for score in scores)
+            self.hits += cached
+            self.misses += len(docs) - cached
+        return scores, cached
+
+    def _score(
+        self, pairs: List[Tuple[str, str]], keys: List[Tuple[str, str]]
+    ) -> List[float]:
+        """(worker thread) One forward pass over every pair, then cache the scores."""
+        start = time.perf_counter()
+        scores = [
+            float(score)
+            for score in self.model.predict(
+                pairs, batch_size=len(pairs), show_progress_bar=False
+            )
+        ]
+        with self._lock:
+            self.batches += 1
+            for key, score in zip(keys, scores):
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+        logger.debug(
+            f"🔀 scored {len(pairs)} pairs in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+        return scores
+
+
+@lru_cache(maxsize=None)
+def get_reranker() -> CrossEncoderReranker:
+    """Return the process-wide reranker (the model is loaded once, on first use)."""
+    # imported lazily: sentence-transformers is only needed when reranking is on
+    from sentence_transformers import CrossEncoder
+
+    model = CrossEncoder(
+        settings.RERANK_MODEL_NAME,
+        device="cpu",
+        max_length=settings.RERANK_MAX_LENGTH,
+    )
+    logger.info(f"🔀 cross-encoder reranker loaded: {settings.RERANK_MODEL_NAME}")
+    return CrossEncoderReranker(
+        model,
+        budget_ms=settings.RERANK_BUDGET_MS,
+        cache_size=settings.RERANK_CACHE_SIZE,
+    )
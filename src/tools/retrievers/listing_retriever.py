@@ -0,0 +1,341 @@
+"""
+listing_retriever.py
+~~~~~~~~~~~~~~~~~~~~
+Retriever over the listings index that applies the buyer's structured
+preferences as metadata filters inside the vector search, relaxing them step
+by step when too few listings qualify. Optionally fuses the dense ranking
+with a BM25 ranking under each filter step ("hybrid" mode), and reranks the
+top candidates with a cross-encoder (see tools/rerank).
+
+Speculative retrieval (SPECULATIVE_RETRIEVAL): `speculate` embeds and
+searches the raw query, unfiltered, while the cleaning LLM call is still in
+flight. Given that `Speculation`, `retrieve` embeds the cleaned query and
+• reuses the speculative listings when both embeddings are close enough and
+  enough of them pass the strictest filter (no index search at all), or
+• runs the usual filtered search and fuses it with the speculative listings
+  that pass the same filter (reciprocal rank fusion).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from loguru import logger
+from pydantic import ConfigDict
+
+from src.llm_parsers.buyer_preferences import BuyerPreferences
+from src.tools.filters.listing_filter import ListingFilter, relaxation_ladder
+from src.tools.retrievers.rank_fusion import reciprocal_rank_fusion
+from src.tools.tracing.spans import estimate_tokens, tracer
+
+
+@dataclass
+class Speculation:
+    """Unfiltered listings for the raw query, found while it was being cleaned."""
+
+    embedding: List[float]  # of the raw query
+    docs: List[Document]  # best first
+
+
+class ListingRetriever(BaseRetriever):
+    """Filtered top-k search over a VectorBackend (+ optional BM25)."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any  # VectorBackend
+    listing_table: Optional[Any] = None  # ListingTable, to size each filtered search
+    lexical_index: Optional[Any] = None  # BM25Index, used in "hybrid" mode
+    mode: str = "dense"  # "dense" or "hybrid" (dense + BM25 with rank fusion)
+    k: int = 5  # number of listings to return on each query
+    fusion_candidates: int = 20  # per-ranker depth fed into rank fusion
+    reranker: Optional[Any] = None  # CrossEncoderReranker, reorders the candidates
+    rerank_candidates: int = 20  # candidates retrieved for the reranker (top-N)
+    speculative_candidates: int = 50  # unfiltered depth of the speculative search
+    reuse_similarity: float = 0.9  # raw / cleaned query cosine to reuse a speculation
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.retrieve(query)
+
+    def retrieve(
+        self,
+        query: str,
+        preferences: Optional[BuyerPreferences] = None,
+        speculation: Optional[Speculation] = None,
+    ) -> List[Document]:
+        """
+        Top-k listings for `query`, restricted by `preferences` when given.
+        Listings matching a stricter filter always rank before looser ones.
+        In "hybrid" mode the dense ranking is fused with a BM25 ranking. With a
+        reranker, the top `rerank_candidates` are retrieved and reranked down to k.
+        A `speculation` for the raw query is reused or fused in (dense mode only).
+        """
+        if self.reranker is None:
+            docs, _ = self._candidates(query, preferences, self.k, speculation)
+            return docs
+
+        docs, tiers = self._candidates(
+            query, preferences, max(self.k, self.rerank_candidates), speculation
+        )
+        return self.reranker.rerank(query, docs, self.k, tiers)
+
+    async def aretrieve(
+        self,
+        query: str,
+        preferences: Optional[BuyerPreferences] = None,
+        speculation: Optional[Speculation] = None,
+    ) -> List[Document]:
+        """
+        Async `retrieve`: the embedding and the local index searches are blocking calls,
+        so they run in a worker thread and leave the event loop free.
+        """
+        return await asyncio.to_thread(self.retrieve, query, preferences, speculation)
+
+    def speculate(self, query: str) -> Speculation:
+        """Unfiltered search on the raw query, before its preferences are known."""
+        depth = max(
+            self.speculative_candidates,
+            self.k,
+            self.rerank_candidates if self.reranker is not None else 0,
+        )
+        with tracer.span("speculative_search", tokens=estimate_tokens(query)) as span:
+            embedding = self.vector_store.embeddings.embed_query(query)
+            docs = self.vector_store.search(embedding, k=depth)
+            span.add(documents=len(docs))
+        return Speculation(embedding=embedding, docs=docs)
+
+    async def aspeculate(self, query: str) -> Speculation:
+        return await asyncio.to_thread(self.speculate, query)
+
+    def _candidates(
+        self,
+        query: str,
+        preferences: Optional[BuyerPreferences],
+        n: int,
+        speculation: Optional[Speculation] = None,
+    ) -> Tuple[List[Document], Optional[List[int]]]:
+        """Top `n` listings, with the filter step each one was found at."""
+        if self.mode == "hybrid" and self.lexical_index is not None:
+            return self._hybrid_search(query, preferences, n)
+
+        if speculation is not None:
+            return self._speculative_search(query, preferences, n, speculation)
+
+        docs, _, tiers = self._dense_search(query, preferences, n)
+        return docs, tiers
+
+    def _speculative_search(
+        self,
+        query: str,
+        preferences: Optional[BuyerPreferences],
+        n: int,
+        speculation: Speculation,
+    ) -> Tuple[List[Document], List[int]]:
+        """Dense search for the cleaned query that reuses or fuses in `speculation`."""
+        with tracer.span("embed_query", tokens=estimate_tokens(query)):
+            embedding = self.vector_store.embeddings.embed_query(query)
+        similarity = _cosine(embedding, speculation.embedding)
+        ladder = relaxation_ladder(preferences)
+
+        with tracer.span("vector_search") as span:
+            span.add(speculation_similarity=round(similarity, 3))
+            matching = [d for d in speculation.docs if ladder[0].matches(d.metadata)]
+            if similarity >= self.reuse_similarity and len(matching) >= n:
+                span.add(documents=n, searches=0, reused_speculation=1)
+                logger.info(
+                    f"🔮 reused the speculative search (similarity {similarity:.3f})"
+                )
+                return matching[:n], [0] * n
+
+            results, _, listing_filter, searches = self._filtered_search(
+                embedding, preferences, n
+            )
+            # the speculative listings the final filter allows, fused with the fresh ones
+            docs_by_id = {_doc_id(doc): doc for doc in results}
+            speculative_ids = []
+            for doc in speculation.docs:
+                if listing_filter.matches(doc.metadata):
+                    docs_by_id.setdefault(_doc_id(doc), doc)
+                    speculative_ids.append(_doc_id(doc))
+            fused_ids = reciprocal_rank_fusion(
+                [[_doc_id(doc) for doc in results], speculative_ids]
+            )
+            # still stricter filter steps first
+            tiers = {
+                doc_id: _filter_step(ladder, docs_by_id[doc_id]) for doc_id in fused_ids
+            }
+            fused_ids = sorted(fused_ids, key=tiers.get)[:n]
+            span.add(documents=len(fused_ids), searches=searches, reused_speculation=0)
+
+        logger.info(
+            f"🔮 speculative search not reused (similarity {similarity:.3f}), fused "
+            f"{len(speculative_ids)} of its listings with a fresh search"
+        )
+        return [docs_by_id[doc_id] for doc_id in fused_ids], [
+            tiers[doc_id] for doc_id in fused_ids
+        ]
+
+    def _dense_search(
+        self, query: str, preferences: Optional[BuyerPreferences], k: int
+    ) -> Tuple[List[Document], ListingFilter, List[int]]:
+        """
+        Filtered vector search; also returns the loosest filter it had to use and
+        the filter step each listing was found at
+        """
+        # embed once, reuse the vector for every relaxation step
+        with tracer.span("embed_query", tokens=estimate_tokens(query)):
+            embedding = self.vector_store.embeddings.embed_query(query)
+
+        with tracer.span("vector_search") as span:
+            results, tiers, listing_filter, searches = self._filtered_search(
+                embedding, preferences, k
+            )
+            span.add(documents=len(results), searches=searches)
+        return results, listing_filter, tiers
+
+    def _filtered_search(
+        self, embedding: List[float], preferences: Optional[BuyerPreferences], k: int
+    ) -> Tuple[List[Document], List[int], ListingFilter, int]:
+        """Walk the relaxation ladder until `k` listings qualify; counts index searches."""
+        results: List[Document] = []
+        tiers: List[int] = []
+        seen = set()
+        previous_count = None
+        searches = 0
+        for step, listing_filter in enumerate(relaxation_ladder(preferences)):
+            # the columnar table counts qualifying listings without touching the index:
+            # steps that match nothing, or nothing more than the step before (each step
+            # is a superset of the previous one), cost no vector search at all
+            step_k = k
+            if self.listing_table is not None and not listing_filter.is_empty():
+                count = self.listing_table.count(listing_filter)
+                if count == 0 or count == previous_count:
+                    continue
+                previous_count = count
+                step_k = min(k, count)
+
+            docs = self.vector_store.search(
+                embedding, k=step_k, where=listing_filter.to_chroma_where()
+            )
+            searches += 1
+            for doc in docs:
+                doc_id = _doc_id(doc)
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    results.append(doc)
+                    tiers.append(step)
+
+            if len(results) >= k:
+                break
+            logger.info(
+                f"🔎 filter step {step} left {len(results)}/{k} listings, relaxing"
+            )
+
+        return results[:k], tiers[:k], listing_filter, searches
+
+    def _hybrid_search(
+        self, query: str, preferences: Optional[BuyerPreferences], n: int
+    ) -> Tuple[List[Document], List[int]]:
+        """
+        Walk the relaxation ladder like `_filtered_search`, fusing the dense and BM25
+        rankings under each filter step with reciprocal rank fusion, until `n`
+        listings qualify: listings of a stricter step always rank first
+        """
+        depth = max(self.fusion_candidates, n)
+        with tracer.span("embed_query", tokens=estimate_tokens(query)):
+            embedding = self.vector_store.embeddings.embed_query(query)
+
+        # literal amenities are exactly what lexical matching is good at
+        lexical_query = " ".join(
+            [query, *((preferences and preferences.amenities) or [])]
+        )
+
+        results: List[Document] = []
+        tiers: List[int] = []
+        seen = set()
+        previous_count = None
+        for step, listing_filter in enumerate(relaxation_ladder(preferences)):
+            step_k, allowed_ids = depth, None
+            if self.listing_table is not None and not listing_filter.is_empty():
+                rows = self.listing_table.filter_rows(listing_filter)
+                count = len(rows)
+                if count == 0 or count == previous_count:
+                    continue  # nothing new qualifies at this step
+                previous_count = count
+                step_k = min(depth, count)
+                # restrict the lexical side to the listings this step allows
+                allowed_ids = self.listing_table.hex_ids[rows].tolist()
+
+            with tracer.span("vector_search") as span:
+                dense_docs = self.vector_store.search(
+                    embedding, k=step_k, where=listing_filter.to_chroma_where()
+                )
+                span.add(documents=len(dense_docs), searches=1)
+            with tracer.span("lexical_search") as span:
+                lexical_hits = self.lexical_index.search(
+                    lexical_query, k=depth, allowed_ids=allowed_ids
+                )
+                span.add(documents=len(lexical_hits))
+
+            docs_by_id = {_doc_id(doc): doc for doc in dense_docs}
+            fused_ids = reciprocal_rank_fusion(
+                [list(docs_by_id), [doc_id for doc_id, _ in lexical_hits]]
+            )
+            fused_ids = [doc_id for doc_id in fused_ids if doc_id not in seen]
+            docs_by_id.update(self._stored_documents(fused_ids, docs_by_id))
+
+            for doc_id in fused_ids:
+                doc = docs_by_id.get(doc_id)
+                # without a table the lexical side was not restricted: check it here
+                if doc is None or not listing_filter.matches(doc.metadata):
+                    continue
+                seen.add(doc_id)
+                results.append(doc)
+                tiers.append(step)
+
+            if len(results) >= n:
+                break
+            logger.info(
+                f"🔎 filter step {step} left {len(results)}/{n} listings, relaxing"
+            )
+
+        return results[:n], tiers[:n]
+
+    def _stored_documents(self, doc_ids: List[str], known: Dict) -> Dict:
+        """Text and metadata of the listings found only by BM25."""
+        missing = [doc_id for doc_id in doc_ids if doc_id not in known]
+        if not missing:
+            return {}
+        stored = self.vector_store.get(ids=missing, include=["documents", "metadatas"])
+        return {
+            doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            )
+        }
+
+
+def _doc_id(doc: Document) -> str:
+    return doc.metadata.get("content_hash", doc.page_content)
+
+
+def _filter_step(ladder: List[ListingFilter], doc: Document) -> int:
+    """Index of the strictest filter of `ladder` that `doc` passes."""
+    return next(
+        (step for step, f in enumerate(ladder) if f.matches(doc.metadata)),
+        len(ladder),
+    )
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
@@ -0,0 +1,20 @@
+"""
+rank_fusion.py
+~~~~~~~~~~~~~~
+Reciprocal rank fusion (RRF) of several ranked id lists.
+"""
+
+from typing import Dict, List, Sequence
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Merge ranked lists of ids: each id scores sum(1 / (k + rank)) over the lists it
+    appears in. `k=60` is the constant from the original RRF paper.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,188 @@
+"""
+metrics_sinks.py
+~~~~~~~~~~~~~~~~
+Where finished pipeline spans go: every sink aggregates them into one
+histogram per (metric, stage, trace labels), so tail latency can be
+attributed to a stage, and compared between pipeline modes.
+
+• `homematch_stage_duration_seconds{stage=...}`: how long each stage took.
+• `homematch_stage_<count>{stage=...}`: the counts a span carries (prompt /
+  completion tokens, llm calls, documents), one histogram each.
+• The labels of the span's trace (e.g. mode="direct") are added to the
+  stage label.
+• `InMemorySink`: also keeps the recent spans, for tests and benchmarks.
+• `PrometheusSink`: renders the Prometheus text exposition format and, given a
+  path, rewrites that file after every query (node_exporter textfile
+  collector style).
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, List, Optional, Protocol, Tuple
+
+if TYPE_CHECKING:
+    from src.tools.tracing.spans import Span
+
+METRIC_PREFIX = "homematch_stage"
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+Labels = Tuple[Tuple[str, str], ...]  # sorted (name, value) pairs of a trace
+
+
+class MetricsSink(Protocol):
+    def record(self, span: Span) -> None:
+        """Called once for every finished span."""
+        ...
+
+    def flush(self) -> None:
+        """Called when a traced query finishes."""
+        ...
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts are computed when rendering)."""
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count of observations <= le) per bucket, ending with +Inf."""
+        total, rows = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == float("inf") else f"{bound:g}", total))
+        return rows
+
+
+class HistogramSink:
+    """Aggregates spans into histograms; the base of the concrete sinks."""
+
+    def __init__(self) -> None:
+        # (metric, stage, trace labels) → histogram
+        self.histograms: Dict[Tuple[str, str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        labels = tuple(sorted(span.trace.labels.items())) if span.trace else ()
+        with self._lock:
+            self._observe("duration_seconds", span.name, labels, span.duration)
+            for name, value in span.counts.items():
+                self._observe(name, span.name, labels, value)
+
+    def flush(self) -> None:
+        pass
+
+    def _observe(self, metric: str, stage: str, labels: Labels, value: float) -> None:
+        histogram = self.histograms.get((metric, stage, labels))
+        if histogram is None:
+            buckets = (
+                DURATION_BUCKETS if metric == "duration_seconds" else COUNT_BUCKETS
+            )
+            histogram = self.histograms[(metric, stage, labels)] = Histogram(buckets)
+        histogram.observe(value)
+
+
+class InMemorySink(HistogramSink):
+    """Histograms plus the last `max_spans` spans."""
+
+    def __init__(self, max_spans: int = 10_000) -> None:
+        super().__init__()
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def record(self, span: Span) -> None:
+        super().record(span)
+        self.spans.append(span)
+
+    def durations(self, stage: str) -> List[float]:
+        """Seconds of the kept spans of `stage`, oldest first."""
+        return [span.duration for span in self.spans if span.name == stage]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.spans.clear()
+
+
+class PrometheusSink(HistogramSink):
+    """Histograms in the Prometheus text format, optionally dumped to `path`."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        super().__init__()
+        self.path = path
+        self._flush_lock = threading.Lock()  # one writer of `path` at a time
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = sorted({metric for metric, _, _ in self.histograms})
+            for metric in metrics:
+                name = f"{METRIC_PREFIX}_{metric}"
+                description = (
+                    "Duration of each HomeMatch pipeline stage."
+                    if metric == "duration_seconds"
+                    else f"{metric.replace('_', ' ').capitalize()} per HomeMatch pipeline stage."
+                )
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for (other, stage, labels), histogram in sorted(
+                    self.histograms.items()
+                ):
+                    if other != metric:
+                        continue
+                    series = f'stage="{stage}"' + "".join(
+                        f',{label}="{value}"' for label, value in labels
+                    )
+                    for le, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{series},le="{le}"}} {count}')
+                    lines.append(f"{name}_sum{{{series}}} {histogram.sum:g}")
+                    lines.append(f"{name}_count{{{series}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        # write a uniquely named file then rename it, so a scraper never reads a
+        # half-written file and concurrent flushes (threads, processes) never share one
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._flush_lock:
+            with tempfile.NamedTemporaryFile(
+                "w", dir=directory, prefix=".homematch-", suffix=".tmp", delete=False
+            ) as f:
+                f.write(self.render())
+            try:
+                # mkstemp's 0600 would hide the file from the collector
+                os.chmod(f.name, 0o644)
+                os.replace(f.name, self.path)
+            except OSError:
+                os.unlink(f.name)
+                raise
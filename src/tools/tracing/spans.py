@@ -0,0 +1,293 @@
+"""
+spans.py
+~~~~~~~~
+Structured per-stage timing of the HomeMatch pipeline. One buyer query is a
+trace made of spans:
+
+    end_to_end ⊃ clean_query, answer_cache, embed_query, vector_search,
+                 lexical_search (hybrid mode), assemble_prompt, generate_answer
+
+• `tracer.trace(**labels)`: scopes the spans of one query (a context
+  variable, so the concurrent queries of `abatch` never mix) and logs its
+  stage breakdown. Labels such as the pipeline mode are attached to every
+  span of the trace, and the end_to_end span adds up the llm calls and
+  tokens of the whole query.
+• `tracer.span(stage, **counts)`: times a block of code; counts such as
+  tokens or documents can be added to the yielded span while it runs.
+• `StageCallbackHandler`: the stages that run inside LCEL chains (cleaning,
+  prompt assembly, generation) are timed from LangChain callbacks, which also
+  carry the LLM token usage. It is attached to every chain run in a trace.
+• Finished spans are sent to the tracer's sinks (see metrics_sinks.py).
+"""
+
+from __future__ import annotations
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+from loguru import logger
+
+from src.config import settings
+
+
+@dataclass
+class Span:
+    """One timed stage; `counts` holds e.g. prompt_tokens or documents."""
+
+    name: str
+    start: float = field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    counts: Dict[str, float] = field(default_factory=dict)
+    trace: Optional["Trace"] = field(default=None, repr=False, compare=False)
+
+    def add(self, **counts: float) -> None:
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+
+@dataclass
+class Trace:
+    """The spans of one buyer query, in the order they finished."""
+
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+    labels: Dict[str, str] = field(default_factory=dict)  # e.g. {"mode": "direct"}
+
+
+# per-query totals of these counts are added to the end_to_end span
+QUERY_TOTALS = ("llm_calls", "prompt_tokens", "completion_tokens")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), for when none is reported."""
+    return (len(text) + 3) // 4
+
+
+def token_usage(response: LLMResult) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt, completion) tokens reported by the provider, or (None, None)."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage["prompt_tokens"], usage.get("completion_tokens", 0)
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None)
+            if metadata:
+                return metadata["input_tokens"], metadata["output_tokens"]
+    return None, None
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar(
+    "homematch_trace", default=None
+)
+_stage_handler: ContextVar[Optional["StageCallbackHandler"]] = ContextVar(
+    "homematch_stage_handler", default=None
+)
+# every chain run while the variable is set gets the handler as a callback
+register_configure_hook(_stage_handler, inheritable=True)
+
+
+class Tracer:
+    """Creates spans and hands the finished ones to its sinks."""
+
+    def __init__(self, sinks: Optional[List[Any]] = None, enabled: bool = True):
+        self.sinks = list(sinks or [])
+        self.enabled = enabled
+
+    def start_span(
+        self, name: str, trace: Optional[Trace] = None, **counts: float
+    ) -> Span:
+        span = Span(name=name, trace=trace or _current_trace.get())
+        span.add(**counts)
+        return span
+
+    def finish_span(self, span: Span) -> None:
+        span.duration = time.perf_counter() - span.start
+        if span.trace is not None:
+            span.trace.spans.append(span)
+        for sink in self.sinks:
+            sink.record(span)
+
+    @contextmanager
+    def span(self, name: str, **counts: float) -> Iterator[Span]:
+        """Time the enclosed block as stage `name`."""
+        if not self.enabled:
+            yield Span(name=name)  # detached: never recorded
+            return
+        span = self.start_span(name, **counts)
+        try:
+            yield span
+        finally:
+            self.finish_span(span)
+
+    @contextmanager
+    def trace(self, **labels: str) -> Iterator[Span]:
+        """Trace one query; yields its end_to_end span. Nested calls join the outer trace."""
+        if not self.enabled or _current_trace.get() is not None:
+            yield Span(name="end_to_end")
+            return
+
+        trace = Trace(trace_id=uuid.uuid4().hex[:12], labels=labels)
+        root = Span(name="end_to_end", trace=trace)
+        trace_token = _current_trace.set(trace)
+        handler_token = _stage_handler.set(StageCallbackHandler(self, trace))
+        try:
+            yield root
+        finally:
+            _stage_handler.reset(handler_token)
+            _current_trace.reset(trace_token)
+            for span in trace.spans:
+                root.add(**{n: v for n, v in span.counts.items() if n in QUERY_TOTALS})
+            self.finish_span(root)
+            tags = "".join(f" {name}={value}" for name, value in labels.items())
+            logger.info(f"⏱️ [{trace.trace_id}{tags}] {format_breakdown(trace)}")
+            for sink in self.sinks:
+                sink.flush()
+
+
+def format_breakdown(trace: Trace) -> str:
+    """e.g. 'end_to_end 1.84s · clean_query 0.41s (612 prompt_tokens, ...) · ...'"""
+    parts = []
+    for span in sorted(trace.spans, key=lambda span: span.start):
+        counts = ", ".join(f"{value:g} {name}" for name, value in span.counts.items())
+        parts.append(
+            f"{span.name} {span.duration:.3f}s" + (f" ({counts})" if counts else "")
+        )
+    return " · ".join(parts)
+
+
+class StageCallbackHandler(BaseCallbackHandler):
+    """Opens a span for each LangChain run that is a pipeline stage."""
+
+    # run in the caller's thread / task, so spans end when the stage does
+    run_inline = True
+
+    # run name → the stage it starts; the llm call inside a stage is part of it,
+    # except that calling the llm ends prompt assembly and starts generation
+    stage_runs = {
+        "parse_preferences": "clean_query",
+        "stuff_documents_chain": "assemble_prompt",
+    }
+
+    def __init__(self, tracer: Tracer, trace: Trace) -> None:
+        self.tracer = tracer
+        self.trace = trace
+        self._owner: Dict[UUID, UUID] = {}  # run → the stage run it belongs to
+        self._spans: Dict[UUID, Span] = {}  # stage run → its open span
+        self._prompt_estimates: Dict[UUID, int] = {}  # llm run → estimated tokens
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name")
+        if name in self.stage_runs:
+            self._owner[run_id] = run_id
+            span = self._spans[run_id] = self.tracer.start_span(
+                self.stage_runs[name], trace=self.trace
+            )
+            if isinstance(inputs, dict) and "context" in inputs:
+                span.add(documents=len(inputs["context"] or []))
+        elif parent_run_id in self._owner:
+            self._owner[run_id] = self._owner[parent_run_id]
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_run(run_id)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        text = " ".join(str(m.content) for batch in messages for m in batch)
+        self._start_llm(run_id, parent_run_id, estimate_tokens(text))
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, parent_run_id, estimate_tokens(" ".join(prompts)))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        estimate = self._prompt_estimates.pop(run_id, 0)
+        owner = self._owner.pop(run_id, None)
+        if owner not in self._spans:
+            return
+        prompt_tokens, completion_tokens = token_usage(response)
+        if prompt_tokens is None:
+            text = "".join(g.text for batch in response.generations for g in batch)
+            prompt_tokens, completion_tokens = estimate, estimate_tokens(text)
+        self._spans[owner].add(
+            llm_calls=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._prompt_estimates.pop(run_id, None)
+        self._owner.pop(run_id, None)
+
+    def _start_llm(
+        self, run_id: UUID, parent_run_id: Optional[UUID], prompt_tokens: int
+    ) -> None:
+        owner = self._owner.get(parent_run_id)
+        if owner is None:
+            return
+        self._owner[run_id] = owner
+        self._prompt_estimates[run_id] = prompt_tokens
+        span = self._spans[owner]
+        if span.name == "assemble_prompt":
+            # the prompt is complete once the llm is called: the rest is generation
+            self.tracer.finish_span(span)
+            generation = self._spans[owner] = self.tracer.start_span(
+                "generate_answer", trace=self.trace
+            )
+            # (streamed inputs are not known when the stage starts)
+            if "documents" in span.counts:
+                generation.add(documents=span.counts["documents"])
+
+    def _end_run(self, run_id: UUID) -> None:
+        if self._owner.pop(run_id, None) == run_id:
+            self.tracer.finish_span(self._spans.pop(run_id))
+
+
+def _default_tracer() -> Tracer:
+    from src.tools.tracing.metrics_sinks import PrometheusSink
+
+    return Tracer(
+        sinks=[PrometheusSink(settings.TRACING_PROMETHEUS_PATH)],
+        enabled=settings.TRACING_ENABLED,
+    )
+
+
+# process-wide: every chain and retriever reports to the same sinks
+tracer = _default_tracer()
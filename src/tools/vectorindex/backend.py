@@ -0,0 +1,78 @@
+"""
+backend.py
+~~~~~~~~~~
+The small interface every listing vector index implements, and the factory
+that opens the one selected by `VECTOR_BACKEND`.
+
+• upsert / delete by listing id (content hash), with precomputed embeddings:
+  embedding is the caller's job, so every backend shares the embedding cache.
+• search: filtered top-k by vector, filters written as Chroma `where` clauses
+  (what `ListingFilter.to_chroma_where` produces).
+• get: stored entries by id, or a page of them, in Chroma's dict shape.
+• persist / open: make the writes durable; reopen from the same directory.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Protocol, Sequence, runtime_checkable
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+@runtime_checkable
+class VectorBackend(Protocol):
+    """What ChromaStore, the retriever and the ingestion tools need from an index."""
+
+    embeddings: Embeddings  # embeds the queries at search time
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None: ...
+
+    def delete(self, ids: Sequence[str]) -> None: ...
+
+    def search(
+        self, embedding: Sequence[float], k: int, where: Optional[Dict] = None
+    ) -> List[Document]: ...
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        include: Sequence[str] = ("metadatas",),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, List]: ...
+
+    def count(self) -> int: ...
+
+    def persist(self) -> None: ...
+
+
+def open_backend(
+    name: str,
+    persist_dir: str,
+    embeddings: Embeddings,
+    collection_name: str = "listings",
+    quantization: str = "none",
+) -> VectorBackend:
+    """Open (or create) the `name` backend ("chroma" or "numpy") in `persist_dir`."""
+    os.makedirs(persist_dir, exist_ok=True)
+    if name == "chroma":
+        from src.tools.vectorindex.chroma_backend import ChromaBackend
+
+        return ChromaBackend.open(persist_dir, embeddings, collection_name)
+    if name == "numpy":
+        from src.tools.vectorindex.numpy_index import NumpyVectorStore
+
+        return NumpyVectorStore.open(
+            os.path.join(persist_dir, f"{collection_name}.hmv"),
+            embeddings,
+            quantization=quantization,
+        )
+    raise ValueError(f"unknown vector backend {name!r}")
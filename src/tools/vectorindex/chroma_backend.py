@@ -0,0 +1,83 @@
+"""
+chroma_backend.py
+~~~~~~~~~~~~~~~~~
+The persisted Chroma collection behind the VectorBackend interface.
+
+• chromadb >= 0.4 writes through to disk, so `persist` has nothing to do.
+• HNSW search: approximate top-k, metadata filters applied by Chroma.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class ChromaBackend:
+    """VectorBackend over a LangChain Chroma collection."""
+
+    def __init__(self, store: Chroma, embeddings: Embeddings) -> None:
+        self.store = store
+        self.embeddings = embeddings
+
+    @classmethod
+    def open(
+        cls, persist_dir: str, embeddings: Embeddings, collection_name: str = "listings"
+    ) -> "ChromaBackend":
+        store = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_dir,
+        )
+        logger.info(f"📂 Opened the persisted listings index in {persist_dir}")
+        return cls(store, embeddings)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        self.store._collection.upsert(
+            ids=list(ids),
+            embeddings=list(embeddings),
+            documents=list(documents),
+            metadatas=list(metadatas),
+        )
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if ids:
+            self.store.delete(ids=list(ids))
+
+    def search(
+        self, embedding: Sequence[float], k: int, where: Optional[Dict] = None
+    ) -> List[Document]:
+        docs = self.store.similarity_search_by_vector(embedding, k=k, filter=where)
+        for doc in docs:
+            doc.id = doc.id or doc.metadata.get("content_hash")
+        return docs
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        include: Sequence[str] = ("metadatas",),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, List]:
+        return self.store.get(
+            ids=list(ids) if ids is not None else None,
+            include=list(include),
+            limit=limit,
+            offset=offset or None,
+        )
+
+    def count(self) -> int:
+        return self.store._collection.count()
+
+    def persist(self) -> None:
+        """Every write is already on disk."""
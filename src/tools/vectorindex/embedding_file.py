@@ -0,0 +1,240 @@
+"""
+embedding_file.py
+~~~~~~~~~~~~~~~~~
+Memory-mapped file format of the numpy vector backend.
+
+• One flat file; every process opens it with `mmap` and wraps the sections
+  in NumPy views, so nothing is parsed or copied at startup and all the
+  Streamlit workers on a host share one page-cache copy.
+• Written to a temporary file that is renamed over the old one: processes
+  that still map the old file keep reading it safely.
+
+Layout (little endian, sections aligned to 64 bytes):
+
+    header      magic, format version, dtype, count, dim, id width,
+                section offsets, then a version string
+    vectors     (count, dim) float32 / float16 / int8, L2-normalized
+    scales      (count,) float32 per-vector scales (int8 only)
+    ids         (count, 32) raw SHA-256 content hashes
+    offsets     (count + 1,) uint64 offsets into the record block
+    records     one JSON object {"page_content", "metadata"} per listing
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"HMVECTOR"
+FORMAT_VERSION = 1
+ID_WIDTH = 32  # listing ids are hex SHA-256 digests, stored raw
+
+_HEADER = struct.Struct("<8sIIQIII4xQQQQQ")
+_ALIGN = 64
+_DTYPE_CODES = {np.dtype(np.float32): 0, np.dtype(np.float16): 1, np.dtype(np.int8): 2}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+class EmbeddingFileWriter:
+    """
+    Streams rows into a new embedding file: the vector, id and offset sections
+    have a known size up front, the records are appended after them as they come.
+    """
+
+    def __init__(
+        self, path: str, count: int, dim: int, dtype, version: str = ""
+    ) -> None:
+        self.path = path
+        self.count = count
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in _DTYPE_CODES:
+            raise ValueError(f"unsupported vector dtype {self.dtype}")
+        self.version = version.encode("utf-8")
+
+        self.vectors_offset = _aligned(_HEADER.size + len(self.version))
+        self.scales_offset = _aligned(
+            self.vectors_offset + count * dim * self.dtype.itemsize
+        )
+        self.ids_offset = _aligned(self.scales_offset + count * 4)
+        self.offsets_offset = _aligned(self.ids_offset + count * ID_WIDTH)
+        self.records_offset = _aligned(self.offsets_offset + (count + 1) * 8)
+
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.truncate(self.records_offset)
+        self._record_offsets = np.zeros(count + 1, dtype=np.uint64)
+        self._row = 0
+        self._record_end = 0
+
+    def append(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        records: Sequence[Dict],
+        scales: Optional[np.ndarray] = None,
+    ) -> None:
+        """Write the next rows: ids, encoded vectors (+ int8 scales) and records."""
+        start, n = self._row, len(ids)
+        if start + n > self.count:
+            raise ValueError("more rows than the embedding file was sized for")
+
+        self._write_at(
+            self.vectors_offset + start * self.dim * self.dtype.itemsize,
+            np.ascontiguousarray(vectors, dtype=self.dtype),
+        )
+        if self.dtype == np.int8:
+            self._write_at(
+                self.scales_offset + start * 4, np.asarray(scales, dtype=np.float32)
+            )
+        raw_ids = b"".join(bytes.fromhex(doc_id) for doc_id in ids)
+        if len(raw_ids) != n * ID_WIDTH:
+            raise ValueError("listing ids must be hex SHA-256 content hashes")
+        self._write_at(self.ids_offset + start * ID_WIDTH, raw_ids)
+
+        self._file.seek(self.records_offset + self._record_end)
+        for row, record in enumerate(records, start):
+            blob = json.dumps(record).encode("utf-8")
+            self._file.write(blob)
+            self._record_end += len(blob)
+            self._record_offsets[row + 1] = self._record_end
+        self._row += n
+
+    def _write_at(self, offset: int, data) -> None:
+        self._file.seek(offset)
+        self._file.write(data if isinstance(data, bytes) else data.tobytes())
+
+    def close(self) -> None:
+        """Write the offsets and the header, then move the file into place."""
+        if self._row != self.count:
+            self._file.close()
+            os.remove(self._tmp_path)
+            raise ValueError(f"expected {self.count} rows, got {self._row}")
+        self._write_at(self.offsets_offset, self._record_offsets)
+        self._write_at(
+            0,
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                _DTYPE_CODES[self.dtype],
+                self.count,
+                self.dim,
+                ID_WIDTH,
+                len(self.version),
+                self.vectors_offset,
+                self.scales_offset,
+                self.ids_offset,
+                self.offsets_offset,
+                self.records_offset,
+            )
+            + self.version,
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+
+class IdTable:
+    """Hex ids decoded on access from a (count, 32) block of raw hashes."""
+
+    def __init__(self, raw: np.ndarray) -> None:
+        self.raw = raw
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __getitem__(self, row: int) -> str:
+        return self.raw[row].tobytes().hex()
+
+    def __iter__(self):
+        return (row.tobytes().hex() for row in self.raw)
+
+
+class RecordTable:
+    """Listing records decoded on access from the mapped record block."""
+
+    def __init__(self, buffer: mmap.mmap, start: int, offsets: np.ndarray) -> None:
+        self.buffer = buffer
+        self.start = start
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> Dict:
+        begin = self.start + int(self.offsets[row])
+        end = self.start + int(self.offsets[row + 1])
+        return json.loads(self.buffer[begin:end])
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+@dataclass
+class EmbeddingFile:
+    """Zero-copy views over the sections of a mapped embedding file."""
+
+    ids: IdTable
+    vectors: np.ndarray
+    scales: Optional[np.ndarray]
+    records: RecordTable
+    version: str
+
+
+def _read_header(buffer) -> tuple:
+    header = _HEADER.unpack_from(buffer, 0)
+    if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+        raise ValueError("not a HomeMatch embedding file (or an unsupported version)")
+    return header
+
+
+def map_embedding_file(path: str) -> EmbeddingFile:
+    """Map the file read-only and return NumPy views over its sections."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (
+        _,
+        _,
+        dtype_code,
+        count,
+        dim,
+        id_width,
+        version_length,
+        vectors_offset,
+        scales_offset,
+        ids_offset,
+        offsets_offset,
+        records_offset,
+    ) = _read_header(buffer)
+    dtype = next(d for d, code in _DTYPE_CODES.items() if code == dtype_code)
+
+    vectors = np.frombuffer(
+        buffer, dtype=dtype, count=count * dim, offset=vectors_offset
+    ).reshape(count, dim)
+    scales = None
+    if dtype == np.int8:
+        scales = np.frombuffer(buffer, np.float32, count=count, offset=scales_offset)
+    ids = np.frombuffer(
+        buffer, np.uint8, count=count * id_width, offset=ids_offset
+    ).reshape(count, id_width)
+    offsets = np.frombuffer(buffer, np.uint64, count=count + 1, offset=offsets_offset)
+
+    return EmbeddingFile(
+        ids=IdTable(ids),
+        vectors=vectors,
+        scales=scales,
+        records=RecordTable(buffer, records_offset, offsets),
+        version=bytes(buffer[_HEADER.size : _HEADER.size + version_length]).decode(
+            "utf-8"
+        ),
+    )
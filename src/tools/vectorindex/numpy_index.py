@@ -0,0 +1,460 @@
+"""
+numpy_index.py
+~~~~~~~~~~~~~~
+In-process vector index: the listing embeddings as one contiguous NumPy
+matrix, searched exactly.
+
+• Vectors are L2-normalized, so a matrix-vector product gives the cosine
+  similarity of every listing; `argpartition` picks the top-k.
+• Optional float16 or int8 storage; int8 keeps one scale per vector
+  (v ≈ scale * q, q in [-127, 127]), 4x smaller than float32, and the score
+  is `scale * (q · query)`.
+• Filters use the same Chroma `where` clauses the retriever already sends,
+  evaluated with vectorized comparisons over a ListingTable whose rows line
+  up with the matrix rows.
+• Persisted as the memory-mapped file of embedding_file.py: opening it maps
+  the file instead of reading it. Upserts and deletes are buffered and
+  merged into new arrays before the next read; searches read the arrays
+  under the same lock, so a concurrent merge never mixes two versions.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.tools.columnar.listing_table import ListingTable
+from src.tools.vectorindex.embedding_file import (
+    EmbeddingFileWriter,
+    IdTable,
+    map_embedding_file,
+)
+
+_DTYPES = {"none": np.float32, "float16": np.float16, "int8": np.int8}
+_QUANTIZATIONS = {np.dtype(dtype): name for name, dtype in _DTYPES.items()}
+
+_COMPARISONS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+def quantize_int8(vectors: np.ndarray):
+    """Symmetric per-vector int8 quantization: returns (int8 matrix, float32 scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def encode_vectors(vectors: Iterable[Sequence[float]], quantization: str = "none"):
+    """L2-normalize raw embeddings and store them as `quantization`: (matrix, scales)."""
+    matrix = np.array(list(vectors), dtype=np.float32, ndmin=2)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    if quantization == "int8":
+        return quantize_int8(matrix)
+    return matrix.astype(_DTYPES[quantization], copy=False), None
+
+
+class NumpyVectorStore:
+    """Exact top-k search over an in-memory (optionally quantized) embedding matrix."""
+
+    block_rows = 16_384  # rows upcast to float32 at a time when scoring int8 / f16
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        records: Sequence[Dict[str, Any]],
+        scales: Optional[np.ndarray] = None,
+        listing_table: Optional[ListingTable] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.ids = ids
+        self.vectors = vectors  # (n, d) float32 / float16, or int8 with `scales`
+        self.scales = scales
+        self.records = records  # {"page_content", "metadata"} per row
+        self.quantization = _QUANTIZATIONS[vectors.dtype]
+        self.path = path  # where `persist` writes the embedding file
+        self._listing_table = listing_table
+        self._row_by_id: Optional[Dict[str, int]] = None
+
+        # writes since the last merge: (ids, matrix, scales, records) chunks, deleted ids
+        self._pending: List[tuple] = []
+        self._deleted: set = set()
+        self._dirty = False
+        # guards the swap of ids / vectors / scales / records done by `_merge`
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ #
+    # Construction / persistence                                         #
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_embeddings(
+        cls,
+        embeddings: Embeddings,
+        ids: Sequence[str],
+        vectors: Iterable[Sequence[float]],
+        records: Sequence[Dict[str, Any]],
+        quantization: str = "none",
+        path: Optional[str] = None,
+    ) -> "NumpyVectorStore":
+        """Normalize (and optionally quantize) raw embeddings into a store."""
+        matrix, scales = encode_vectors(vectors, quantization)
+        store = cls(embeddings, list(ids), matrix, list(records), scales, path=path)
+        store._dirty = True  # not on disk yet: the first persist writes it
+        return store
+
+    @classmethod
+    def open(
+        cls, path: str, embeddings: Embeddings, quantization: str = "none"
+    ) -> "NumpyVectorStore":
+        """Map the embedding file at `path`, or start empty if there is none yet."""
+        if not os.path.exists(path):
+            return cls(
+                embeddings,
+                [],
+                np.empty((0, 0), dtype=_DTYPES[quantization]),
+                [],
+                np.empty(0, np.float32) if quantization == "int8" else None,
+                path=path,
+            )
+
+        mapped = map_embedding_file(path)
+        store = cls(
+            embeddings,
+            mapped.ids,
+            mapped.vectors,
+            mapped.records,
+            mapped.scales,
+            path=path,
+        )
+        if store.quantization != quantization:
+            # stored with another precision: re-encode, the next persist rewrites it
+            store.vectors, store.scales = encode_vectors(
+                store._float_rows(np.arange(len(store))), quantization
+            )
+            store.quantization = quantization
+            store._dirty = True
+        return store
+
+    def persist(self) -> None:
+        """Write the embedding file (only if something changed since it was opened)."""
+        with self._lock:
+            self._merge()
+            if not self._dirty:
+                return
+            if self.path is None:
+                raise ValueError("this NumpyVectorStore has no path to persist to")
+
+            writer = EmbeddingFileWriter(
+                self.path, len(self), self.vectors.shape[1], self.vectors.dtype
+            )
+            for start in range(0, len(self), self.block_rows):
+                rows = range(start, min(start + self.block_rows, len(self)))
+                writer.append(
+                    [self.ids[row] for row in rows],
+                    self.vectors[start : rows.stop],
+                    [self.records[row] for row in rows],
+                    self.scales[start : rows.stop] if self.scales is not None else None,
+                )
+            writer.close()
+            self._dirty = False
+
+    # ------------------------------------------------------------------ #
+    # Writes                                                             #
+    # ------------------------------------------------------------------ #
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        if not len(ids):
+            return
+        matrix, scales = encode_vectors(embeddings, self.quantization)
+        records = [
+            {"page_content": text, "metadata": metadata or {}}
+            for text, metadata in zip(documents, metadatas)
+        ]
+        with self._lock:
+            if self._deleted:
+                self._merge()  # a delete followed by a re-insert must keep the new row
+            self._pending.append((list(ids), matrix, scales, records))
+            self._dirty = True
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            if self._pending:
+                self._merge()
+            self._deleted.update(ids)
+            self._dirty = True
+
+    def _merge(self) -> None:
+        """Fold the buffered upserts / deletes into new arrays (one copy per merge)."""
+        with self._lock:
+            if not self._pending and not self._deleted:
+                return
+
+            new_ids, new_records, matrices, new_scales = [], [], [], []
+            for chunk_ids, matrix, scales, records in self._pending:
+                new_ids.extend(chunk_ids)
+                new_records.extend(records)
+                matrices.append(matrix)
+                new_scales.append(scales)
+            # the same id upserted twice: the last write wins
+            last = {doc_id: i for i, doc_id in enumerate(new_ids)}
+            fresh = np.fromiter(sorted(last.values()), dtype=np.int64, count=len(last))
+
+            row_by_id = self._rows_by_id()
+            dropped = [
+                row_by_id[doc_id]
+                for doc_id in self._deleted.union(last)
+                if doc_id in row_by_id
+            ]
+            keep = np.setdiff1d(np.arange(len(self)), dropped)
+
+            ids = [self.ids[row] for row in keep] + [new_ids[i] for i in fresh]
+            records = [self.records[row] for row in keep] + [
+                new_records[i] for i in fresh
+            ]
+            vectors = [self.vectors[keep]] if len(keep) else []
+            scales = [self.scales[keep]] if self.scales is not None else []
+            if matrices:
+                vectors.append(np.concatenate(matrices)[fresh])
+                if self.scales is not None:
+                    scales.append(np.concatenate(new_scales)[fresh])
+
+            self.ids, self.records = ids, records
+            self.vectors = np.concatenate(vectors) if vectors else self.vectors[:0]
+            self.scales = np.concatenate(scales) if scales else None
+            self._pending, self._deleted = [], set()
+            self._listing_table = None
+            self._row_by_id = None
+
+    # ------------------------------------------------------------------ #
+    # Reads                                                              #
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def count(self) -> int:
+        with self._lock:
+            self._merge()
+            return len(self)
+
+    def nbytes(self) -> int:
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return self.vectors.nbytes + scales
+
+    @property
+    def listing_table(self) -> ListingTable:
+        """Filter columns, built from the records on first use unless one was attached."""
+        with self._lock:
+            self._merge()
+            if self._listing_table is None:
+                self._listing_table = ListingTable.from_metadata(
+                    record["metadata"] for record in self.records
+                )
+            return self._listing_table
+
+    def attach_listing_table(self, table: Optional[ListingTable]) -> bool:
+        """
+        Reuse an existing ListingTable of the same listings for the filters (reordered
+        to the matrix rows if needed) instead of decoding every record to build one.
+        """
+        with self._lock:
+            self._merge()
+            if table is None or len(table) != len(self):
+                return False
+            raw = self._raw_ids()
+            if not np.array_equal(table.ids, raw):
+                mine = raw.view("S32").ravel()
+                theirs = table.ids.view("S32").ravel()
+                my_order, their_order = np.argsort(mine), np.argsort(theirs)
+                if not np.array_equal(mine[my_order], theirs[their_order]):
+                    return False
+                rows = np.empty(len(self), dtype=np.int64)
+                rows[my_order] = their_order  # table row of each matrix row
+                table = ListingTable(
+                    table.ids[rows],
+                    {name: column[rows] for name, column in table.columns.items()},
+                    table.neighborhood_codes[rows],
+                    table.neighborhoods,
+                )
+            self._listing_table = table
+            return True
+
+    def _raw_ids(self) -> np.ndarray:
+        if isinstance(self.ids, IdTable):
+            return self.ids.raw
+        raw = b"".join(bytes.fromhex(doc_id) for doc_id in self.ids)
+        return np.frombuffer(raw, dtype=np.uint8).reshape(len(self), 32)
+
+    def _rows_by_id(self) -> Dict[str, int]:
+        if self._row_by_id is None:
+            self._row_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return self._row_by_id
+
+    def _float_rows(self, rows: np.ndarray) -> np.ndarray:
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def scores(self, query: Sequence[float], rows: Optional[np.ndarray] = None):
+        """Cosine similarity of the query with every row (or with `rows` only)."""
+        with self._lock:
+            self._merge()
+            vectors, scales = self.vectors, self.scales
+        return self._scores(query, vectors, scales, rows)
+
+    def _scores(
+        self,
+        query: Sequence[float],
+        vectors: np.ndarray,
+        scales: Optional[np.ndarray],
+        rows: Optional[np.ndarray],
+    ) -> np.ndarray:
+        # a new array: the caller's query vector is left untouched
+        query = np.array(query, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        vectors = vectors if rows is None else vectors[rows]
+        if vectors.dtype == np.float32:
+            scores = vectors @ query
+        else:
+            # upcast block by block instead of copying the whole matrix per query
+            scores = np.empty(len(vectors), dtype=np.float32)
+            for start in range(0, len(vectors), self.block_rows):
+                block = vectors[start : start + self.block_rows].astype(np.float32)
+                scores[start : start + len(block)] = block @ query
+
+        if scales is not None:
+            scores *= scales if rows is None else scales[rows]
+        return scores
+
+    def search_rows(
+        self, query: Sequence[float], k: int, where: Optional[Dict] = None
+    ) -> List[tuple]:
+        """Exact top-k (row, score) pairs, best first, among the rows matching `where`."""
+        return self._search(query, k, where)[0]
+
+    def search(
+        self, embedding: Sequence[float], k: int, where: Optional[Dict] = None
+    ) -> List[Document]:
+        pairs, ids, records = self._search(embedding, k, where)
+        return [self._document(ids, records, row) for row, _ in pairs]
+
+    def _search(self, query: Sequence[float], k: int, where: Optional[Dict]) -> tuple:
+        """Top-k (row, score) pairs plus the ids / records those rows index into."""
+        with self._lock:
+            # the arrays are read together, so a concurrent merge cannot pair the
+            # matrix of one version with the ids of another; scoring runs unlocked
+            self._merge()
+            ids, records = self.ids, self.records
+            vectors, scales = self.vectors, self.scales
+            rows = np.flatnonzero(self._where_mask(where)) if where else None
+        if len(ids) == 0 or (rows is not None and len(rows) == 0):
+            return [], ids, records
+        scores = self._scores(query, vectors, scales, rows)
+
+        k = min(k, len(scores))
+        if k == 0:
+            return [], ids, records
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in top], ids, records
+        return [(int(i), float(scores[i])) for i in top], ids, records
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        include: Sequence[str] = ("metadatas",),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, List]:
+        """Stored entries by id (or a page of them), in the shape Chroma's `get` returns."""
+        with self._lock:
+            self._merge()
+            if ids is not None:
+                row_by_id = self._rows_by_id()
+                rows = [row_by_id[doc_id] for doc_id in ids if doc_id in row_by_id]
+            else:
+                stop = len(self) if limit is None else min(len(self), offset + limit)
+                rows = list(range(offset, stop))
+
+            result: Dict[str, List] = {"ids": [self.ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [
+                    self.records[row]["page_content"] for row in rows
+                ]
+            if "metadatas" in include:
+                result["metadatas"] = [self.records[row]["metadata"] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = list(
+                    self._float_rows(np.asarray(rows, np.int64))
+                )
+            return result
+
+    @staticmethod
+    def _document(ids: Sequence[str], records: Sequence[Dict], row: int) -> Document:
+        record = records[row]
+        return Document(
+            id=ids[row],
+            page_content=record["page_content"],
+            metadata=record["metadata"],
+        )
+
+    # ------------------------------------------------------------------ #
+    # Filters                                                            #
+    # ------------------------------------------------------------------ #
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        """Boolean row mask for a Chroma `where` clause."""
+        mask = np.ones(len(self), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == "$or":
+                mask &= np.logical_or.reduce([self._where_mask(c) for c in condition])
+            else:
+                mask &= self._column_mask(key, condition)
+        return mask
+
+    def _column_mask(self, key: str, condition: Any) -> np.ndarray:
+        table = self.listing_table
+        if key in table.columns:
+            values = table.columns[key]
+        elif key == "neighborhood":
+            values = np.array(table.neighborhoods, dtype=object)[
+                table.neighborhood_codes
+            ]
+        else:
+            raise ValueError(f"unsupported filter field {key!r}")
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        mask = np.ones(len(values), dtype=bool)
+        for operator, operand in condition.items():
+            if operator in _COMPARISONS:
+                mask &= _COMPARISONS[operator](values, operand)
+            elif operator in ("$in", "$nin"):
+                inside = np.isin(values, list(operand))
+                mask &= inside if operator == "$in" else ~inside
+            else:
+                raise ValueError(f"unsupported filter operator {operator!r}")
+        return mask